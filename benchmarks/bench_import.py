@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the startup cost of datapackage: the time ``import datapackage``
+takes (as reported by ``python -X importtime``, Python 3.7+) and the time
+it takes a fresh interpreter to import the package and load a data
+package. Each is measured in new processes and the best run is compared
+to a budget. Unless it is given in ms, the budget for loading a package
+is relative to the same load with every deferred module imported up
+front (as the package did before imports were deferred), measured on
+the same machine, so the check doesn't depend on how fast or loaded the
+machine is. The exit status is 1 if a budget is exceeded so this can be
+used as a check in CI.
+
+Run from the repository root::
+
+    python benchmarks/bench_import.py [--import-budget MS]
+                                      [--construct-budget MS]
+                                      [--construct-ratio RATIO]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+# Benchmark the working tree rather than an installed datapackage
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONSTRUCT = """
+import timeit
+start = timeit.default_timer()
+import datapackage
+datapackage.DataPackage('tests/test.dpkg')
+print(timeit.default_timer() - start)
+"""
+
+# CONSTRUCT with the modules datapackage defers importing (and all of its
+# submodules) imported eagerly, as a reference for the construct budget
+EAGER_CONSTRUCT = """
+import timeit
+start = timeit.default_timer()
+import base64, csv, hashlib, mimetypes, tempfile
+import multiprocessing.pool
+try:
+    import urllib.request
+except ImportError:
+    import urllib2
+import datapackage
+for name in datapackage._submodules - set(['dataframe']):
+    __import__('datapackage.' + name)
+datapackage.DataPackage('tests/test.dpkg')
+print(timeit.default_timer() - start)
+"""
+
+# Cumulative import time (in microseconds) of the top-level package
+IMPORTTIME_LINE = re.compile(
+    r'^import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*datapackage$')
+
+
+def run(arguments):
+    """Run the Python interpreter in a new process and return its
+    (stdout, stderr)"""
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.Popen([sys.executable] + arguments, cwd=ROOT,
+                               env=environment, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise RuntimeError(stderr.decode('utf-8', 'replace'))
+    return stdout.decode('utf-8'), stderr.decode('utf-8')
+
+
+def import_time():
+    """Milliseconds it takes to import datapackage"""
+    stderr = run(['-X', 'importtime', '-c', 'import datapackage'])[1]
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line.strip())
+        if match:
+            return int(match.group(1)) / 1000
+    raise RuntimeError("datapackage not found in -X importtime output")
+
+
+def construct_time():
+    """Milliseconds it takes to import datapackage and load a package"""
+    return float(run(['-c', CONSTRUCT])[0]) * 1000
+
+
+def eager_construct_time():
+    """Milliseconds it takes to load a package with everything imported
+    eagerly"""
+    return float(run(['-c', EAGER_CONSTRUCT])[0]) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--import-budget', type=float, default=50,
+                        help='budget for import datapackage in ms')
+    parser.add_argument('--construct-budget', type=float, default=None,
+                        help='budget for importing and loading a data '
+                        'package in ms (instead of --construct-ratio)')
+    parser.add_argument('--construct-ratio', type=float, default=0.9,
+                        help='budget for importing and loading a data '
+                        'package as a fraction of the time it takes with '
+                        'every module imported eagerly')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of processes to take the best of')
+    args = parser.parse_args(argv)
+
+    # Warm up the bytecode cache so it isn't part of the first run
+    run(['-c', 'import datapackage.datapackage'])
+
+    benchmarks = []
+    if sys.version_info >= (3, 7):
+        benchmarks.append(('import', import_time, args.import_budget))
+    else:
+        print('-X importtime needs Python 3.7, skipping the import benchmark')
+
+    construct_budget = args.construct_budget
+    if construct_budget is None and sys.version_info >= (3, 7):
+        eager = min(eager_construct_time() for _ in range(args.repeat))
+        construct_budget = eager * args.construct_ratio
+        print('{0:<12} {1:>10.1f} ms (reference)'.format('eager', eager))
+    if construct_budget is not None:
+        benchmarks.append(('construct', construct_time, construct_budget))
+    else:
+        # Modules are only imported lazily on Python 3.7+ (PEP 562)
+        print('imports are eager before Python 3.7, skipping the relative '
+              'construct benchmark (give --construct-budget)')
+
+    exceeded = False
+    for label, benchmark, budget in benchmarks:
+        best = min(benchmark() for _ in range(args.repeat))
+        status = 'ok'
+        if best > budget:
+            status = 'OVER BUDGET'
+            exceeded = True
+        print('{0:<12} {1:>10.1f} ms (budget {2:.1f} ms) {3}'.format(
+            label, best, budget, status))
+    return 1 if exceeded else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
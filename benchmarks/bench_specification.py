@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark construction of and attribute access on Specification objects.
+
+Run from the repository root::
+
+    python benchmarks/bench_specification.py
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import sys
+import timeit
+
+# Benchmark the working tree rather than an installed datapackage
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SETUP = """
+import datapackage
+from datapackage.schema import Field, Schema
+fields = [{'name': 'field-%d' % i, 'type': 'string'} for i in range(10)]
+resource = datapackage.Resource(name='foo', path='foo.csv', bytes=100,
+                                hash='94232c5b8fc9272f6f73a1e36eb68fcf')
+field = Field(name='foo', type='integer', format='default')
+"""
+
+BENCHMARKS = [
+    ('Field()', "Field(name='foo', type='integer', format='default')"),
+    ('Schema(10 fields)', "Schema(fields=[dict(f) for f in fields])"),
+    ('Resource()', "datapackage.Resource(name='foo', path='foo.csv')"),
+    ('Field get (spec key)', "field.type"),
+    ('Field get (missing key)', "field.title"),
+    ('Resource get (property)', "resource.name"),
+    ('Field set (spec key)', "field.format = 'default'"),
+    ('Resource set (property)', "resource.bytes = 100"),
+]
+
+
+def main(number=20000, repeat=5):
+    for label, statement in BENCHMARKS:
+        best = min(timeit.repeat(statement, SETUP, number=number,
+                                 repeat=repeat))
+        print('{0:<28} {1:>10.3f} us'.format(
+            label, best / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,38 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from .datapackage import DataPackage  # flake8: noqa
-from .resource import Resource  # flake8: noqa
+import sys
+import importlib
 from . import compat
+
+# DataPackage, Resource and the submodules are imported when they are
+# first used so tools which only need e.g. datapackage.util don't pay for
+# importing all of them
+_lazy_attributes = {'DataPackage': 'datapackage',
+                    'Resource': 'resource'}
+_submodules = frozenset(['cache', 'compact', 'dataframe', 'datapackage',
+                         'fingerprints', 'hashing', 'licenses', 'location',
+                         'mediatypes', 'persons', 'pipeline', 'resource',
+                         'schema', 'sources', 'storage', 'tarstream', 'util'])
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """Import DataPackage, Resource and submodules on first access
+        (PEP 562)"""
+        if name in _submodules:
+            return importlib.import_module('.' + name, __name__)
+        if name in _lazy_attributes:
+            module = importlib.import_module(
+                '.' + _lazy_attributes[name], __name__)
+            value = getattr(module, name)
+            globals()[name] = value
+            return value
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(
+            __name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(_lazy_attributes) | _submodules)
+else:
+    # Modules can't have __getattr__ before Python 3.7
+    from .datapackage import DataPackage  # noqa: F401
+    from .resource import Resource  # noqa: F401
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import copy
+import time
+import functools
+import threading
+from collections import OrderedDict
+from .datapackage import DataPackage, _package_base
+from .util import Specification
+from .location import resolve
+
+
+class ReadOnlyView(object):
+    """
+    Read-only view of a Specification object (or a plain dict) which is
+    shared between callers of the cache. Reading works just like it does
+    on the wrapped object (attributes, keys, iteration) but every nested
+    object, including the return values of methods, is handed out as a
+    view as well and lists are handed out as tuples so the shared object
+    cannot be modified through the view.
+    """
+
+    __slots__ = ('_target',)
+
+    # Methods which modify the wrapped object in place. They are not
+    # made available through the view.
+    MUTATING_PREFIXES = ('add_', 'update_', 'bump_')
+    MUTATING_METHODS = ('clear', 'pop', 'popitem', 'setdefault', 'update',
+                        'process_object_array')
+
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, attribute):
+        if attribute == '_target':
+            raise AttributeError(attribute)
+        if attribute in self.MUTATING_METHODS or \
+                attribute.startswith(self.MUTATING_PREFIXES):
+            raise AttributeError(
+                "'{0}' is not available on a read-only view".format(
+                    attribute))
+        value = getattr(self._target, attribute)
+        if callable(value) and not isinstance(value, type):
+            return _view_method(value)
+        return _view(value)
+
+    def __setattr__(self, attribute, value):
+        raise TypeError("read-only view does not support assignment")
+
+    def __delattr__(self, attribute):
+        raise TypeError("read-only view does not support deletion")
+
+    def __getitem__(self, key):
+        return _view(self._target[key])
+
+    def __setitem__(self, key, value):
+        raise TypeError("read-only view does not support item assignment")
+
+    def __delitem__(self, key):
+        raise TypeError("read-only view does not support item deletion")
+
+    def __contains__(self, key):
+        return key in self._target
+
+    def __iter__(self):
+        return iter(self._target)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __eq__(self, other):
+        if isinstance(other, ReadOnlyView):
+            other = other._target
+        return self._target == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'ReadOnlyView({0!r})'.format(self._target)
+
+    def get(self, key, default=None):
+        return _view(self._target.get(key, default))
+
+    def keys(self):
+        return list(self._target.keys())
+
+    def values(self):
+        return [_view(v) for v in self._target.values()]
+
+    def items(self):
+        return [(k, _view(v)) for k, v in self._target.items()]
+
+    def copy(self):
+        """Return a private (mutable) deep copy of the wrapped object"""
+        return copy.deepcopy(self._target)
+
+    def as_dict(self):
+        """Output a dict of the specification (a private copy)."""
+        if isinstance(self._target, Specification):
+            return copy.deepcopy(self._target.as_dict())
+        return copy.deepcopy(dict(self._target))
+
+
+def _view(value):
+    """Wrap a value from a shared object so it can't be modified"""
+    if isinstance(value, dict):
+        return ReadOnlyView(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_view(v) for v in value)
+    return value
+
+
+def _view_method(method):
+    """Wrap a method of a shared object so it returns views"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        return _view(method(*args, **kwargs))
+    return wrapper
+
+
+class DataPackageCache(object):
+    """
+    Process-wide, bounded cache of loaded data packages keyed by their URI.
+
+    Local data packages are revalidated against the modification time and
+    size of their ``datapackage.json`` on each lookup. Remote data packages
+    are kept for ``ttl`` seconds (or until evicted if ``ttl`` is None).
+    Lookups hand out ``ReadOnlyView`` objects of the shared data package.
+
+    :param int maxsize: Maximum number of data packages kept in the cache.
+        The least recently used one is evicted when the cache is full.
+    :param float ttl: Optional default time to live (in seconds) for
+        remote data packages.
+    :param factory: Callable used to load a data package from its URI.
+    """
+
+    def __init__(self, maxsize=128, ttl=None, factory=DataPackage):
+        if maxsize < 1:
+            raise ValueError('maxsize must be a positive integer')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.factory = factory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, uri):
+        # Zip archives are keyed on the zip: URI of the package in them
+        uri = _package_base(uri)
+        location = resolve(uri)
+        if location.is_local:
+            return os.path.abspath(location.path)
+        return uri
+
+    def _stamp(self, uri):
+        """Validation stamp for a data package which isn't read over the
+        network, e.g. a local one (None for remote data packages)
+
+        """
+        location = resolve(_package_base(uri))
+        if location.backend is None or location.backend.remote:
+            return None
+        stat = location.join('datapackage.json').stat()
+        return (stat.mtime, stat.size, stat.etag)
+
+    def get(self, uri, ttl=None):
+        """
+        Get a read-only view of the data package found at the URI, loading
+        it (and caching it) if it isn't cached or the cached version is
+        stale.
+
+        :param basestring uri: URI or file path to the data package.
+        :param float ttl: Time to live for a remote data package, overrides
+            the cache's default ttl.
+        """
+        key = self._key(uri)
+        stamp = self._stamp(uri)
+        if ttl is None:
+            ttl = self.ttl
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                datapackage, entry_stamp, loaded = entry
+                fresh = (entry_stamp == stamp)
+                if stamp is None and ttl is not None:
+                    fresh = (now - loaded) < ttl
+                if fresh:
+                    # Move to the end to mark it as the most recently used
+                    del self._entries[key]
+                    self._entries[key] = entry
+                    return ReadOnlyView(datapackage)
+
+        # Load outside of the lock so slow loads don't block other lookups
+        datapackage = self.factory(uri)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (datapackage, stamp, now)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return ReadOnlyView(datapackage)
+
+    def invalidate(self, uri):
+        """Remove the data package found at the URI from the cache"""
+        with self._lock:
+            self._entries.pop(self._key(uri), None)
+
+    def clear(self):
+        """Remove all data packages from the cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, uri):
+        return self._key(uri) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# The process-wide cache used by load()
+default_cache = DataPackageCache()
+
+
+def load(uri, ttl=None):
+    """
+    Get a read-only view of the data package found at the URI from the
+    process-wide data package cache.
+
+    :param basestring uri: URI or file path to the data package.
+    :param float ttl: Optional time to live for a remote data package.
+    """
+    return default_cache.get(uri, ttl=ttl)
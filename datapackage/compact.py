@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+from .util import Specification
+from . import compat
+
+
+class CompactSpecification(object):
+    """
+    Compact, read-only representation of a Specification object for
+    holding large amounts of metadata in memory. Values for the known
+    specification keys are stored in ``__slots__`` and any other (extension)
+    keys in a small overflow dict. The order of the keys is kept in a tuple
+    which is shared between all objects with the same keys so the compact
+    objects serialize exactly like the objects they were created from.
+
+    Compact classes are created for each Specification class by
+    ``compact_class`` and instances are created with ``compact``.
+    """
+
+    __slots__ = ('_keys', '_extra')
+
+    # The Specification class this compact class represents
+    SPECIFICATION_CLASS = Specification
+
+    def __getattr__(self, attribute):
+        # Known keys which are not set on this object get the same default
+        # as on Specification objects: the one of the property getter if
+        # there is one, otherwise None
+        spec_class = self.SPECIFICATION_CLASS
+        if attribute in spec_class.SPECIFICATION or \
+                attribute in spec_class.OBJECT_ARRAYS:
+            getter = getattr(spec_class, attribute, None)
+            if isinstance(getter, property):
+                return getter.fget(self)
+            return None
+        # Class constants the getters use (e.g. DATAPACKAGE_VERSION)
+        if attribute.isupper() and hasattr(spec_class, attribute):
+            return getattr(spec_class, attribute)
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(
+            self.__class__.__name__, attribute))
+
+    def __setattr__(self, attribute, value):
+        raise TypeError("'{0}' object is read-only".format(
+            self.__class__.__name__))
+
+    def __getitem__(self, key):
+        if key in self._keys:
+            if self._extra is not None and key in self._extra:
+                return self._extra[key]
+            return object.__getattribute__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, dict(self.items()))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._keys)
+
+    def items(self):
+        return [(key, self[key]) for key in self._keys]
+
+    def as_dict(self):
+        """Output a dict of the specification."""
+
+        def nested_val(val):
+            if isinstance(val, (Specification, CompactSpecification)):
+                return val.as_dict()
+            elif isinstance(val, (list, tuple)):
+                return [nested_val(v) for v in val]
+            else:
+                return val
+
+        excludes = self.SPECIFICATION_CLASS.SERIALIZE_EXCLUDES
+        return dict((k, nested_val(v)) for k, v in self.items() if
+                    k not in excludes)
+
+    def as_json(self):
+        """Output a JSON object of the specification."""
+        return json.dumps(self.as_dict(), ensure_ascii=False, indent=4)
+
+    def expand(self):
+        """
+        Create a full (mutable and validated) Specification object from
+        the compact object.
+        """
+
+        def nested_val(val):
+            if isinstance(val, CompactSpecification):
+                return val.expand()
+            elif isinstance(val, tuple):
+                return [nested_val(v) for v in val]
+            else:
+                return val
+
+        kwargs = dict((k, nested_val(v)) for k, v in self.items())
+        return self.SPECIFICATION_CLASS(**kwargs)
+
+
+# Compact classes that have been created (keyed by Specification class)
+_compact_classes = {}
+
+# Shared key order tuples (so each object only holds a reference)
+_key_orders = {}
+
+
+def compact_class(spec_class):
+    """
+    Get (or create) the compact class for a Specification class. The
+    compact class has slots for all of the keys in the class'
+    SPECIFICATION and SERIALIZE_EXCLUDES.
+    """
+    try:
+        return _compact_classes[spec_class]
+    except KeyError:
+        pass
+
+    slots = [compat.builtin_str(key) for key in spec_class.SPECIFICATION]
+    slots.extend(compat.builtin_str(key) for key in
+                 spec_class.SERIALIZE_EXCLUDES if key not in slots)
+    cls = type(compat.builtin_str('Compact' + spec_class.__name__),
+               (CompactSpecification,),
+               {'__slots__': tuple(slots),
+                'SPECIFICATION_CLASS': spec_class})
+    _compact_classes[spec_class] = cls
+    return cls
+
+
+def compact(obj):
+    """
+    Create a compact representation of a Specification object (and of all
+    the Specification objects nested in it). Lists are turned into tuples
+    and other values are shared with the original object.
+
+    :param obj: Specification object (or a list of them) to compact.
+    """
+    if isinstance(obj, CompactSpecification):
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return tuple(compact(value) for value in obj)
+    if not isinstance(obj, Specification):
+        return obj
+
+    cls = compact_class(obj.__class__)
+    instance = object.__new__(cls)
+    slots = cls.__slots__
+    extra = None
+    keys = []
+    for (key, value) in dict.items(obj):
+        keys.append(key)
+        value = compact(value)
+        if key in slots:
+            object.__setattr__(instance, key, value)
+        else:
+            if extra is None:
+                extra = {}
+            extra[key] = value
+    keys = tuple(keys)
+    keys = _key_orders.setdefault(keys, keys)
+    object.__setattr__(instance, '_keys', keys)
+    object.__setattr__(instance, '_extra', extra)
+    return instance
@@ -4,9 +4,10 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
 import sys
 import io
-import csv
+import importlib
 
 _ver = sys.version_info
 is_py2 = (_ver[0] == 2)
@@ -18,14 +19,25 @@ is_py27 = (is_py2 and _ver[1] == 7)
 
 
 if is_py2:
+    import csv
     import urlparse as parse
-    from urllib2 import urlopen, HTTPError
+    import urllib
+    from urllib import unquote
+    from urllib2 import urlopen, Request, HTTPError  # noqa: F401
+    from collections import Mapping
     builtin_str = str
     bytes = str
     str = unicode
     basestring = basestring
     numeric_types = (int, long, float)
 
+    def quote(string, safe='/'):
+        """Percent-encode text (unicode on Py2.7) as UTF-8 like
+        urllib.parse.quote does on Python 3."""
+        if isinstance(string, str):
+            string = string.encode('utf-8')
+        return str(urllib.quote(string, safe))
+
     def csv_reader(data, dialect=csv.excel, **kwargs):
         """Read text stream (unicode on Py2.7) as CSV."""
 
@@ -37,11 +49,34 @@ if is_py2:
         for row in reader:
             yield [str(cell, 'utf-8') for cell in row]
 
+    class csv_writer(object):
+        """Write rows of text (unicode on Py2.7) as CSV to a binary
+        stream."""
+
+        def __init__(self, fh, dialect=csv.excel, **kwargs):
+            self._writer = csv.writer(fh, dialect=dialect, **kwargs)
+
+        def writerow(self, row):
+            self._writer.writerow([
+                cell.encode('utf-8') if isinstance(cell, str) else cell
+                for cell in row])
+
+        def writerows(self, rows):
+            for row in rows:
+                self.writerow(row)
+
+    def open_csv(path):
+        """Open a file to write CSV to with csv_writer"""
+        return io.open(path, 'wb')
+
 elif is_py3:
     from urllib import parse
-    from urllib.request import urlopen
-    from urllib.error import HTTPError
-    csv_reader = csv.reader
+    from urllib.parse import quote, unquote  # noqa: F401
+    try:
+        from collections.abc import Mapping
+    except ImportError:
+        # Python 3.2
+        from collections import Mapping  # noqa: F401
     builtin_str = str
     str = str
     bytes = bytes
@@ -49,7 +84,47 @@ elif is_py3:
     numeric_types = (int, float)
     next = lambda x: x.next()
 
+    # Attributes which are only imported when they are first used since
+    # urllib.request pulls in http.client, email and ssl (see __getattr__)
+    _lazy_attributes = {'urlopen': ('urllib.request', 'urlopen'),
+                        'Request': ('urllib.request', 'Request'),
+                        'HTTPError': ('urllib.error', 'HTTPError'),
+                        'csv_reader': ('csv', 'reader'),
+                        'csv_writer': ('csv', 'writer')}
+
+    def _import_lazy_attribute(name):
+        module_name, attribute = _lazy_attributes[name]
+        value = getattr(importlib.import_module(module_name), attribute)
+        globals()[name] = value
+        return value
+
+    def open_csv(path):
+        """Open a file to write CSV to with csv_writer"""
+        return io.open(path, 'w', encoding='utf-8', newline='')
+
+    if _ver >= (3, 7):
+        def __getattr__(name):
+            """Import lazy attributes on first access (PEP 562)"""
+            if name in _lazy_attributes:
+                return _import_lazy_attribute(name)
+            raise AttributeError("module {0!r} has no attribute {1!r}".format(
+                __name__, name))
+    else:
+        # Modules can't have __getattr__ before Python 3.7
+        for _name in _lazy_attributes:
+            _import_lazy_attribute(_name)
+
+
+# Rename a file, replacing the target if it exists (os.rename only does
+# that on POSIX and os.replace isn't in Python 2)
+replace = getattr(os, 'replace', os.rename)
+
 
 def to_bytes(textstring, encoding='utf-8'):
     """Convert a text string to a byte string"""
     return textstring.encode(encoding)
+
+
+def with_metaclass(meta, *bases):
+    """Create a base class with a metaclass (works on both Py2 and Py3)"""
+    return meta(builtin_str('NewBase'), bases, {})
@@ -5,6 +5,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import os
+import sys
 import io
 import json
 import codecs
@@ -58,5 +59,19 @@ def save_licenses_json():
         fh.write(content)
 
 
+def save_compact_licenses_json():
+    # The compact registry is compiled with the code which reads it
+    dirname = os.path.split(os.path.realpath(__file__))[0]
+    sys.path.insert(0, os.path.join(dirname, os.pardir, os.pardir))
+    from datapackage.util import load_licenses
+    from datapackage.licenses import compile_licenses
+
+    compiled = compile_licenses(load_licenses(), load_licenses_aliases())
+    filename = os.path.join(dirname, 'licenses.compact.json')
+    with io.open(filename, 'w') as fh:
+        fh.write(json.dumps(compiled, sort_keys=True, separators=(',', ':')))
+
+
 if __name__ == '__main__':
     save_licenses_json()
+    save_compact_licenses_json()
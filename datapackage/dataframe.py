@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+# Strings columns with at most this ratio of distinct values to values are
+# turned into categoricals
+CATEGORY_RATIO = 0.5
+
+
+def _import_pandas():
+    """Import pandas, which is an optional dependency of datapackage"""
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError("to_dataframe needs pandas "
+                          "(install it with pip install datapackage[pandas])")
+    return pandas
+
+
+def _column(pandas, field_type, values):
+    """Turn the parsed values of a field into a pandas Series with a dtype
+    derived from the type of the field
+
+    """
+    if field_type == 'integer':
+        # Nullable integers so empty values don't turn the column to floats
+        return pandas.Series(pandas.array(values, dtype='Int64'))
+    if field_type == 'number':
+        return pandas.Series(values, dtype='float64')
+    if field_type in ('date', 'datetime'):
+        return pandas.Series(pandas.to_datetime(values))
+    if field_type == 'string' and values and \
+            len(set(values)) <= CATEGORY_RATIO * len(values):
+        return pandas.Series(values, dtype='category')
+    return pandas.Series(values, dtype='object')
+
+
+def _frame(pandas, names, types, columns, start):
+    """Build a DataFrame from lists of parsed values of the fields"""
+    frame = pandas.DataFrame(dict(
+        (name, _column(pandas, field_type, values))
+        for name, field_type, values in zip(names, types, columns)),
+        columns=names)
+    frame.index = pandas.RangeIndex(start, start + len(frame))
+    return frame
+
+
+def to_dataframe(datapackage, resource, chunksize=None, fields=None):
+    """
+    Read the data of a resource of a data package into a pandas DataFrame
+    (pandas is imported when this is called and is not needed otherwise).
+    Columns get dtypes derived from the types of the fields in the schema:
+
+    - integer: nullable Int64
+    - number: float64
+    - date and datetime: datetime64
+    - string: category if there are few distinct values (see
+      CATEGORY_RATIO), otherwise object
+    - other types: object
+
+    The rows are parsed in chunks (see ``DataPackage.iter_chunks``) and
+    the values are collected straight into columns instead of going
+    through a dictionary for each row.
+
+    :param datapackage: The DataPackage the resource belongs to
+    :param resource: The resource to read
+    :param int chunksize: Optional number of rows per DataFrame. If given
+        an iterator over DataFrames of (at most) chunksize rows is returned
+        instead of a single DataFrame (category columns then have the
+        categories of each chunk).
+    :param list fields: Optional names of the fields to read (and the
+        order of the columns). All fields are read if not given.
+    """
+    pandas = _import_pandas()
+    selected = datapackage._selected_fields(resource, fields)
+    names = [field.get('name', field.get('id', ''))
+             for field_idx, field in selected]
+    types = [field.get('type', 'string') for field_idx, field in selected]
+    chunks = datapackage.iter_chunks(resource, rows=chunksize,
+                                     as_tuples=True, fields=names)
+
+    if chunksize is not None:
+        return _iter_frames(pandas, names, types, chunks)
+
+    columns = [[] for name in names]
+    for chunk in chunks:
+        for column, values in zip(columns, zip(*chunk)):
+            column.extend(values)
+    return _frame(pandas, names, types, columns, 0)
+
+
+def _iter_frames(pandas, names, types, chunks):
+    start = 0
+    for chunk in chunks:
+        columns = [list(values) for values in zip(*chunk)]
+        yield _frame(pandas, names, types, columns, start)
+        start += len(chunk)
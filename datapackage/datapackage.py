@@ -25,18 +25,27 @@ import itertools
 import os
 import datetime
 import time
-import base64
 import re
-import io
 import warnings
+import threading
 from .resource import Resource
 from .schema import Schema
 from .sources import Source
 from .licenses import License, LICENSES
 from .persons import Person
-from .util import (Specification, verify_version, parse_version,
-                   format_version, is_local, is_url)
+from .hashing import (DEFAULT_ALGORITHM, IntegrityMismatch, HashingReader,
+                      parse_hash, format_hash, hashes_match)
+from .util import (Specification, LazyList, verify_version, parse_version,
+                   format_version, is_url)
+from .location import resolve
 from . import compat
+from . import storage
+
+
+def _b64decode(value):
+    """Parser for binary fields (base64 is imported when it's first used)"""
+    import base64
+    return base64.b64decode(value)
 
 
 class DataPackage(Specification):
@@ -46,6 +55,11 @@ class DataPackage(Specification):
     """
 
     DATAPACKAGE_VERSION = "1.0-beta.10"
+    # Default target size (in bytes of data) of the chunks of iter_chunks
+    # and the number of rows of each chunk the width of rows is estimated
+    # from
+    CHUNK_BYTES = 1024 * 1024
+    CHUNK_SAMPLE_ROWS = 100
     EXTENDABLE = True
     SPECIFICATION = {'name': compat.str,
                      'resources': list,
@@ -66,6 +80,18 @@ class DataPackage(Specification):
                      'dataDependencies': dict}
     REQUIRED = ('name',)
     RESOURCE_CLASS = Resource
+    OBJECT_ARRAYS = {'licenses': License,
+                     'sources': Source,
+                     'maintainers': Person,
+                     'contributors': Person,
+                     'publisher': Person}
+
+    # Whether resources are built when they are first accessed instead of
+    # when they are assigned (set via the lazy keyword argument)
+    _lazy = False
+
+    # The base along with its resolved location (see base_location)
+    _base_location = None
 
     FIELD_PARSERS = {
         'number': float,
@@ -76,7 +102,7 @@ class DataPackage(Specification):
         'datetime': lambda x:
             datetime.datetime.strptime(x, '%Y-%m-%dT%H:%M:%S%Z'),
         'boolean': bool,
-        'binary': base64.b64decode,
+        'binary': _b64decode,
         'object': json.loads,
         'json': json.loads,
         'geojson': json.loads,
@@ -89,21 +115,51 @@ class DataPackage(Specification):
 
         :param basestring uri: Optional argument. Provide URI or file path
             to a data package to be loaded. ``datapackage.json`` should exist
-            under this URI. If not provided keyword arguments can be used to
-            create a new DataPackage
+            under this URI. The path of a zip archive can also be given in
+            which case the data package is read straight out of the archive
+            (``datapackage.json`` should be at the root of the archive or in
+            its only top-level directory). If not provided keyword arguments
+            can be used to create a new DataPackage
+        :param bool lazy: Optional keyword argument. If True the resources
+            are only checked to be dicts when the data package is created
+            and each of them is turned into a Resource when it is first
+            accessed (e.g. via ``get_resource``). Top-level metadata is
+            validated immediately.
         """
 
+        self._lazy = kwargs.pop('lazy', False)
+
         # URI to an existing Data Package can be provided as an argument
         # If that's the case then we start off by loading that data package
         if not args:
             super(DataPackage, self).__init__(*args, **kwargs)
         elif len(args) == 1:
-            self.base = args[0]
+            self.base = _package_base(args[0])
             descriptor = self.get_descriptor()
             super(DataPackage, self).__init__(**descriptor)
         else:
             raise TypeError('DataPackage takes 0 or 1 arguments')
 
+    @classmethod
+    def from_trusted(cls, descriptor):
+        """
+        Create a new DataPackage from a trusted descriptor (e.g. one that
+        was created and validated by this package before) without
+        validating any of it. Resources are built with
+        ``Resource.from_trusted``. Call ``validate`` to run the checks.
+
+        :param dict descriptor: Descriptor to build the data package from
+        """
+        datapackage = super(DataPackage, cls).from_trusted(descriptor)
+        base = descriptor.get('base', os.path.curdir)
+        resources = descriptor.get('resources')
+        if resources:
+            dict.__setitem__(datapackage, 'resources', [
+                cls.RESOURCE_CLASS.from_trusted(resource, base)
+                if type(resource) is dict else resource
+                for resource in resources])
+        return datapackage
+
     def _field_parser(self, field):
         """
         Return a type casting function (field parser) based on the data
@@ -168,24 +224,35 @@ class DataPackage(Specification):
         # back on unicode type if no parser is found
         return self.FIELD_PARSERS.get(field['type'], compat.str)
 
-    def open_resource(self, path):
+    @property
+    def base_location(self):
+        """
+        The resolved location.Location of the base of the data package
+        (the current directory if base hasn't been set). It is cached until
+        base changes.
+        """
         # If base hasn't been set we use the current directory as the base
-        if self.base:
-            base = self.base
-        else:
-            base = os.path.curdir
-        # use os.path.join if the path is local, otherwise use urljoin
-        # -- we don't want to just use os.path.join because otherwise
-        # on Windows it will try to create URLs with backslashes
-        if is_url(path):
-            return compat.urlopen(path)
-        else:
-            if is_local(base):
-                resource_path = os.path.join(base, path)
-                return io.open(resource_path, 'rb')  # Read file in binary mode to mimick behavior of urlopen
-            else:
-                resource_path = compat.parse.urljoin(base, path)
-                return compat.urlopen(resource_path)  # Do not use os.path.join here since url separators do not change with platform
+        base = self.base or os.path.curdir
+        cached = self._base_location
+        if cached is None or cached[0] != base:
+            cached = self._base_location = (base, resolve(base))
+        return cached[1]
+
+    def open_resource(self, path):
+        # URLs are opened as they are, other paths are joined to the base
+        # (with a url join if the base is remote since url separators do
+        # not change with platform). Local files are read in binary mode to
+        # mimick the behavior of urlopen.
+        return self.base_location.join(path).open('rb')
+
+    def map_resource(self, path):
+        """
+        Open a resource path like ``open_resource`` but as a
+        storage.MappedFile over a memory map of the file if its storage
+        backend can map it (e.g. local files and stored members of zip
+        archives). Other files are opened like with ``open_resource``.
+        """
+        return self.base_location.join(path).map()
 
     @property
     def name(self):
@@ -617,6 +684,13 @@ class DataPackage(Specification):
                 '{0} must be a list not {1}'.format(
                     self.RESOURCE_CLASS.__name__, type(value)))
 
+        base = os.path.curdir if 'base' not in self else self.base
+
+        def create_resource(single_value):
+            # We turn the single_value into kwargs and pass it into
+            # the Resource class constructor
+            return self.RESOURCE_CLASS(datapackage_uri=base, **single_value)
+
         # We loop through the list and create Resource objects from dicts
         # or throw errors if the type is invalid
         modified_array = []
@@ -626,18 +700,223 @@ class DataPackage(Specification):
                 # is of the correct class
                 pass
             elif type(single_value) == dict:
-                # We turn the single_value into kwargs and pass it into
-                # the Resource class constructor
-                base = os.path.curdir if 'base' not in self else self.base
-                single_value = self.RESOURCE_CLASS(datapackage_uri=base,
-                                                   **single_value)
+                # Lazy data packages keep the dict until it's accessed
+                if not self._lazy:
+                    single_value = create_resource(single_value)
             else:
                 raise TypeError('{0} type {1} is invalid'.format(
                     self.RESOURCE_CLASS.__name__, type(single_value)))
             modified_array.append(single_value)
 
+        if self._lazy:
+            modified_array = LazyList(modified_array, create_resource)
+
         self['resources'] = modified_array
 
+    def get_resource(self, name):
+        """
+        Get a single resource by its name (or its deprecated id). For lazy
+        data packages only the resource which is returned gets built.
+
+        :param basestring name: Name of the resource
+        """
+        resources = self['resources']
+        raw = resources.raw() if isinstance(resources, LazyList) \
+            else iter(resources)
+        for index, resource in enumerate(raw):
+            if resource.get('name', resource.get('id', '')) == name:
+                return resources[index]
+        raise KeyError("datapackage has no resource named '{0}'".format(name))
+
+    def _map_resources(self, function, workers, per_host=None,
+                       progress=None):
+        """
+        Call a function on every resource in a thread pool. At most
+        per_host resources read from the same server are processed at
+        once. Exceptions raised by the function are returned instead of
+        raised so one resource can't stop the others. If progress is given
+        it is called with the number of resources done and the total
+        number of resources each time a resource is done.
+
+        Returns a list with the value returned by the function (or the
+        exception it raised) for each resource, in the order of the
+        resources.
+        """
+        resources = list(self['resources'])
+        semaphores = {}
+        if per_host:
+            for resource in resources:
+                host = _remote_host(resource)
+                if host is not None and host not in semaphores:
+                    semaphores[host] = threading.BoundedSemaphore(per_host)
+
+        progress_lock = threading.Lock()
+        done = [0]
+
+        def call(resource):
+            semaphore = semaphores.get(_remote_host(resource))
+            try:
+                if semaphore is None:
+                    result = function(resource)
+                else:
+                    with semaphore:
+                        result = function(resource)
+            except Exception as error:
+                result = error
+            if progress is not None:
+                with progress_lock:
+                    done[0] += 1
+                    progress(done[0], len(resources))
+            return result
+
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(max(1, min(workers, len(resources))))
+        try:
+            return pool.map(call, resources, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def update_all_bytes(self, verify=True, workers=32, per_host=8):
+        """
+        Re-compute the size of all resources concurrently (see
+        Resource.update_bytes). Sizes of remote files are taken from the
+        Content-Length header of a HEAD request, falling back to GET if
+        the server doesn't send it.
+
+        :param bool verify: Check that sizes already present haven't changed
+        :param int workers: Number of resources processed at once
+        :param int per_host: Maximum number of concurrent requests to a
+            single server
+        :returns: A list with the new size of each resource (in the order
+            of the resources), or the exception raised when computing it
+            (e.g. RuntimeError if the size has changed).
+        """
+        def update(resource):
+            resource.update_bytes(verify=verify)
+            return resource.bytes
+
+        return self._map_resources(update, workers, per_host)
+
+    def _integrity_mismatches(self, function, workers, per_host, progress):
+        """
+        Run an integrity check (a function which returns a list of
+        (field, expected, actual) tuples for a resource) over all resources
+        and collect the results as a list of IntegrityMismatch tuples.
+        """
+        results = self._map_resources(function, workers, per_host, progress)
+        mismatches = []
+        for index, (resource, result) in enumerate(
+                zip(self['resources'], results)):
+            name = resource.get('name', resource.get('id')) or index
+            if isinstance(result, Exception):
+                mismatches.append(
+                    IntegrityMismatch(name, None, None, None, result))
+            else:
+                mismatches.extend(IntegrityMismatch(name, *found + (None,))
+                                  for found in result)
+        return mismatches
+
+    def update_integrity(self, verify=True, algorithm=None, workers=8,
+                         per_host=8, progress=None, store=None,
+                         cache_dir=None):
+        """
+        Re-compute the size and hash of all resources (inline data, paths
+        and urls) in a thread pool (see Resource.update_bytes and
+        Resource.update_hash). Resources whose size or hash doesn't match
+        the one already in the descriptor are reported and left unchanged
+        instead of raising an error.
+
+        :param bool verify: Check that sizes and hashes already present
+            haven't changed
+        :param string algorithm: Hash algorithm (defaults to the algorithm
+            of each resource's current hash, or md5)
+        :param int workers: Number of resources processed at once
+        :param int per_host: Maximum number of concurrent requests to a
+            single server
+        :param progress: Optional function called with the number of
+            resources done and the total number of resources
+        :param store: Optional fingerprints.FingerprintStore for local files
+        :param string cache_dir: Optional directory for local copies of url
+            resources
+        :returns: A list of hashing.IntegrityMismatch tuples (empty if all
+            resources were updated)
+        """
+        def update(resource):
+            old_size = resource.bytes
+            old_hash = resource.hash
+            old_algorithm = parse_hash(old_hash)[0] if old_hash \
+                else DEFAULT_ALGORITHM
+            new_algorithm = algorithm or old_algorithm
+
+            # The size and hash come from a single pass over the resource
+            try:
+                new_size, new_hash = resource._compute_digest(
+                    new_algorithm, store, cache_dir)
+
+                found = []
+                if verify and old_size and old_size != new_size:
+                    found.append(('bytes', old_size, new_size))
+                if verify and old_hash:
+                    if new_algorithm != old_algorithm:
+                        current_hash = resource._compute_hash(
+                            old_algorithm, store, cache_dir)
+                    else:
+                        current_hash = new_hash
+                    if not hashes_match(current_hash, old_hash):
+                        found.append(('hash', old_hash, current_hash))
+            except Exception:
+                resource._drop_copy()
+                raise
+
+            if found:
+                resource._drop_copy()
+            else:
+                resource._keep_copy()
+                resource['bytes'] = new_size
+                resource['hash'] = new_hash
+            return found
+
+        return self._integrity_mismatches(update, workers, per_host,
+                                          progress)
+
+    def verify_integrity(self, workers=8, per_host=8, progress=None,
+                         store=None):
+        """
+        Check the size and hash in the descriptor of every resource against
+        its inline data, path or url in a thread pool without changing the
+        descriptor. Hashes are checked with their own algorithm and
+        resources without a size or hash are only checked for the one they
+        have.
+
+        :param int workers: Number of resources processed at once
+        :param int per_host: Maximum number of concurrent requests to a
+            single server
+        :param progress: Optional function called with the number of
+            resources done and the total number of resources
+        :param store: Optional fingerprints.FingerprintStore for local files
+        :returns: A list of hashing.IntegrityMismatch tuples (empty if all
+            resources are intact)
+        """
+        def verify(resource):
+            found = []
+            if resource.hash:
+                # The size is checked with the one computed with the hash
+                size, hash = resource._compute_digest(
+                    parse_hash(resource.hash)[0], store)
+            elif resource.bytes:
+                size, hash = resource._compute_bytes(), None
+            else:
+                return found
+            if resource.bytes and size != resource.bytes:
+                found.append(('bytes', resource.bytes, size))
+            if hash is not None and not hashes_match(hash, resource.hash):
+                found.append(('hash', resource.hash, hash))
+            return found
+
+        return self._integrity_mismatches(verify, workers, per_host,
+                                          progress)
+
     def get_resources(self):
         """
         Get the data package's resources as a dictionary. The key for each
@@ -665,65 +944,278 @@ class DataPackage(Specification):
         # Return the resource collection
         return resources
 
-    def get_data(self, resource):
+    def _open_data(self, resource, verify=False, fileobj=None):
         """
-        Generator that yields the data for a given resource.
+        Open the data of a resource for reading its rows. Returns a tuple
+        of an iterator over the decoded lines of the data and the
+        HashingReader the raw bytes are read through (None unless verify
+        is True, see _verify_data).
         """
-        # Open the resource location
+        if verify and not (resource.get('hash') or resource.get('bytes')):
+            raise ValueError("resource has no hash or size to verify")
+
+        # Open the resource location (or the local copy of its url if one
+        # was made when it was hashed)
         resource_path = None
-        for location_type in ('path', 'url'):
-            if location_type in resource:
-                resource_path = resource[location_type]
-                try:
-                    resource_file = self.open_resource(resource_path)
-                except Exception as x:
-                    warnings.warn("Error opening resource {0}={1}: {2}".format(location_type, resource_path, x))
-                    continue # Try next location_type
-                else:
-                    break
+        local_copy = getattr(resource, 'local_copy', None)
+        if fileobj is not None:
+            resource_file = fileobj
+        elif local_copy and os.path.exists(local_copy):
+            resource_file = resolve(local_copy).map()
+        else:
+            for location_type in ('path', 'url'):
+                if location_type in resource:
+                    resource_path = resource[location_type]
+                    try:
+                        resource_file = self.map_resource(resource_path)
+                    except Exception as x:
+                        warnings.warn(
+                            "Error opening resource {0}={1}: {2}".format(
+                                location_type, resource_path, x))
+                        continue  # Try next location_type
+                    else:
+                        break
+            else:
+                # None of the location types were in resource
+                raise NotImplementedError('Datapackage currently only '
+                                          'supports resource url and path')
+
+        encoding = resource.get('encoding', 'utf-8')
+        raw_file = None
+        if verify:
+            # The raw bytes are hashed as they are read so the resource
+            # doesn't have to be read again to verify it
+            old_hash = resource.get('hash')
+            resource_file = raw_file = HashingReader(
+                resource_file,
+                parse_hash(old_hash)[0] if old_hash else DEFAULT_ALGORITHM)
+
+        if isinstance(resource_file, storage.MappedFile):
+            # Whole blocks of lines are decoded at once
+            lines = resource_file.iter_text(encoding)
         else:
-            # None of the location types were in resource
-            raise NotImplementedError('Datapackage currently only supports resource url and path')
+            lines = (line.decode(encoding) for line in resource_file)
+        return (lines, raw_file)
 
-        resource_file = (line.decode(resource.get('encoding', 'utf-8'))
-                         for line in resource_file)
-        # We assume CSV so we create the csv file
-        reader = compat.csv_reader(resource_file)
-        # Throw away the first line (headers)
-        next(reader)
-        # For each row we yield it as a dictionary where keys are the field
-        # names and the value the value in that row
-        for row_idx, row in enumerate(reader):
-            # Each row will be returned as a dictionary where the keys are
-            # the field id
-            row_dict = {}
-            # Loop over fields in the schema and parse the values
-            for field_idx, field in enumerate(resource.schema['fields']):
-                # Again, id is an old deprecated word from the standard and
-                # we use the name (but support the old id).
-                field_name = field.get('name', field.get('id', ''))
+    def _verify_data(self, resource, raw_file):
+        """Check the size and hash of the data read through raw_file (the
+        HashingReader from _open_data) against the descriptor
+
+        """
+        size, hexdigest = raw_file.finish()
+        old_size = resource.get('bytes')
+        if old_size and old_size != size:
+            raise RuntimeError(
+                "size of file has changed! (was: {0}, is now: {1})".format(
+                    old_size, size))
+        old_hash = resource.get('hash')
+        new_hash = format_hash(raw_file.algorithm, hexdigest)
+        if old_hash and not hashes_match(old_hash, new_hash):
+            raise RuntimeError(
+                "hash of file has changed! (was: {0}, is now: {1})".format(
+                    old_hash, new_hash))
+
+    def _selected_fields(self, resource, fields=None):
+        """The (index, field) pairs of the schema fields of a resource with
+        the given names (in that order) or of all of them
 
+        """
+        # Again, id is an old deprecated word from the standard and we use
+        # the name (but support the old id).
+        schema_fields = [(field_idx, field.get('name', field.get('id', '')),
+                          field) for field_idx, field
+                         in enumerate(resource.schema['fields'])]
+        if fields is None:
+            return [(field_idx, field)
+                    for field_idx, name, field in schema_fields]
+        by_name = dict((name, (field_idx, field))
+                       for field_idx, name, field in schema_fields)
+        try:
+            return [by_name[name] for name in fields]
+        except KeyError as x:
+            raise ValueError("no such field: {0}".format(x.args[0]))
+
+    def _row_parser(self, resource, as_tuples=False, fields=None):
+        """
+        Compile a function which parses a row of the resource (a list of
+        strings read from the CSV file) given the index of the row (used
+        in error messages). The names, parsers and constraints of the
+        fields are looked up once here instead of for every value. Only
+        the fields with the given names are parsed if fields is given.
+        """
+        fields = [(field_idx, field.get('name', field.get('id', '')),
+                   self._field_parser(field),
+                   field.get('constraints', {}).get('required', False))
+                  for field_idx, field
+                  in self._selected_fields(resource, fields)]
+        names = [name for field_idx, name, parser, required in fields]
+
+        def parse_row(row, row_idx):
+            values = []
+            for field_idx, field_name, parser, field_required in fields:
                 # Decode the field value
                 value = row[field_idx]
 
-                field_required = field.get('constraints', {}).get('required', False)
-
                 # We wrap this in a try clause so that we can give error
                 # messages about specific fields in a row
                 try:
                     if (value == '' or value is None) and field_required:
                         raise ValueError("Field {field} is required.".format(field=field_name))
 
-                    parser = self._field_parser(field)
-
                     # Attempting to parse legally empty values (e.g. cast to int) will raise an unnecessary exception here.
                     if value == '' and parser is not compat.str:
-                        row_dict[field_name] = None
+                        values.append(None)
                     else:
-                        row_dict[field_name] = parser(value)
+                        values.append(parser(value))
 
                 except Exception as x:
                     msg = 'Field "{field}" in row {row} could not be parsed due to: {x}'
                     raise ValueError(msg.format(field=field_name, row=row_idx, x=x))
 
-            yield row_dict
+            if as_tuples:
+                return tuple(values)
+            return dict(zip(names, values))
+
+        return parse_row
+
+    def get_data(self, resource, verify=False, fileobj=None):
+        """
+        Generator that yields the data for a given resource.
+
+        :param bool verify: Hash and count the bytes of the resource while
+            they are read and check them against the hash and size in the
+            descriptor. A RuntimeError is raised once all rows have been
+            read if either of them doesn't match.
+        :param fileobj: Optional binary file-like object to read the data
+            from instead of opening the resource (e.g. a member of a tar
+            stream, see tarstream.TarStreamReader)
+        """
+        lines, raw_file = self._open_data(resource, verify, fileobj)
+        # We assume CSV so we create the csv file
+        reader = compat.csv_reader(lines)
+        # Throw away the first line (headers)
+        next(reader, None)
+        # For each row we yield it as a dictionary where keys are the field
+        # names and the value the value in that row
+        parse_row = self._row_parser(resource)
+        for row_idx, row in enumerate(reader):
+            yield parse_row(row, row_idx)
+
+        if verify:
+            self._verify_data(resource, raw_file)
+
+    def iter_chunks(self, resource, rows=None, bytes=None, as_tuples=False,
+                    fields=None, verify=False, fileobj=None):
+        """
+        Generator that yields the data for a given resource in chunks
+        (lists of rows) for consumers which write rows in batches, e.g. to
+        databases or message queues. Rows are read and parsed a chunk at a
+        time so the overhead of yielding them one by one is only paid once
+        per chunk.
+
+        Chunks either have a fixed number of rows or are sized to a target
+        number of bytes (of the CSV data, the parsed rows take up more
+        memory). In the latter case the number of rows in each chunk is
+        worked out from the average width of the rows read so far. If
+        neither is given chunks are sized to ``CHUNK_BYTES``.
+
+        :param int rows: Number of rows in each chunk (the last chunk may
+            have fewer)
+        :param int bytes: Target size of each chunk in bytes
+        :param bool as_tuples: Yield rows as tuples of the values in the
+            order of the schema fields instead of dictionaries
+        :param list fields: Optional names of the fields to parse and yield
+            (in that order for tuples), the other fields are skipped
+        :param bool verify: Verify the data like ``get_data`` does
+        :param fileobj: Optional binary file-like object to read the data
+            from (see ``get_data``)
+        """
+        if rows is not None and bytes is not None:
+            raise ValueError("give either rows or bytes, not both")
+        if (rows is not None and rows < 1) or \
+                (bytes is not None and bytes < 1):
+            raise ValueError("chunk size must be positive")
+
+        lines, raw_file = self._open_data(resource, verify, fileobj)
+        reader = compat.csv_reader(lines)
+        # Throw away the first line (headers)
+        next(reader, None)
+        parse_row = self._row_parser(resource, as_tuples, fields)
+
+        def measure(read):
+            # Number of characters of the values and the separators of the
+            # first rows read
+            sample = read[:self.CHUNK_SAMPLE_ROWS]
+            return (len(sample), sum(map(len, sample)) +
+                    sum(map(len, itertools.chain.from_iterable(sample))))
+
+        measured_rows = measured_width = 0
+        if rows is None:
+            budget = bytes or self.CHUNK_BYTES
+            # The width of the rows is sampled before the first chunk is
+            # sized. The sample is split into chunks if it is larger than
+            # the budget.
+            buffered = list(itertools.islice(reader, self.CHUNK_SAMPLE_ROWS))
+            measured_rows, measured_width = measure(buffered)
+            size = max(1, budget * measured_rows // max(measured_width, 1))
+        else:
+            buffered = []
+            size = rows
+        row_count = 0
+        while True:
+            if len(buffered) < size:
+                read = list(itertools.islice(reader, size - len(buffered)))
+                if rows is None and read:
+                    read_rows, read_width = measure(read)
+                    measured_rows += read_rows
+                    measured_width += read_width
+                    size = max(1, budget * measured_rows //
+                               max(measured_width, 1))
+                buffered.extend(read)
+            chunk = buffered[:size]
+            del buffered[:size]
+            if not chunk:
+                break
+            yield [parse_row(row, row_idx)
+                   for row_idx, row in enumerate(chunk, row_count)]
+            row_count += len(chunk)
+
+        if verify:
+            self._verify_data(resource, raw_file)
+
+    def to_dataframe(self, resource, chunksize=None, fields=None):
+        """
+        Read the data of a resource into a pandas DataFrame (or an iterator
+        over DataFrames of chunksize rows) with dtypes derived from the
+        schema. pandas is an optional dependency which is only imported
+        when this is called. See ``dataframe.to_dataframe``.
+
+        :param int chunksize: Optional number of rows per DataFrame
+        :param list fields: Optional names of the fields to read
+        """
+        from .dataframe import to_dataframe
+        return to_dataframe(self, resource, chunksize, fields)
+
+
+def _remote_host(resource):
+    """The server a resource is read from (the one update_bytes and
+    update_hash use) or None for inline data and local files.
+
+    """
+    if resource.get('data'):
+        return None
+    location = resource.location
+    return location.host if location is not None else None
+
+
+def _package_base(uri):
+    """The base of the data package at a URI: the zip: URI of the
+    directory of its datapackage.json if the URI is the path of a local zip
+    archive, otherwise the URI itself.
+
+    """
+    location = resolve(uri)
+    if location.is_local and location.path.lower().endswith('.zip') and \
+            os.path.isfile(location.path):
+        return storage.get_backend('zip').package_root(location.path)
+    return uri
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import sqlite3
+import threading
+from . import hashing
+
+
+def default_store_path():
+    """Path to the default fingerprint store in the user's cache directory
+    (``$XDG_CACHE_HOME/datapackage`` or ``~/.cache/datapackage``).
+
+    """
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_dir, 'datapackage', 'fingerprints.sqlite')
+
+
+def _stat_key(stat):
+    """The parts of a file's stat result which identify its contents"""
+    mtime_ns = getattr(stat, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(stat.st_mtime * 1e9)
+    return (stat.st_ino, stat.st_size, mtime_ns)
+
+
+class FingerprintStore(object):
+    """
+    Persistent store (an SQLite database) of the sizes and hashes of local
+    files keyed by their absolute path, inode, size and modification time.
+    Files which haven't changed since they were last hashed are answered
+    from the store without reading them.
+
+    :param string path: Path to the SQLite database. Defaults to
+        ``default_store_path()``. Use ':memory:' for a store which only
+        lives as long as the object.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = default_store_path()
+        if path != ':memory:':
+            directory = os.path.dirname(os.path.abspath(path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # This is a cache so we trade durability for speed
+        self._connection.execute('PRAGMA synchronous = OFF')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            'path TEXT NOT NULL, algorithm TEXT NOT NULL, '
+            'inode INTEGER NOT NULL, size INTEGER NOT NULL, '
+            'mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL, '
+            'PRIMARY KEY (path, algorithm))')
+        self._connection.commit()
+
+    def lookup(self, path, algorithm=hashing.DEFAULT_ALGORITHM):
+        """
+        Get the (size, hexdigest) of a file from the store, or None if the
+        file isn't in the store or has changed since it was stored.
+        """
+        path = os.path.abspath(path)
+        inode, size, mtime_ns = _stat_key(os.stat(path))
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT hash FROM fingerprints WHERE path = ? AND '
+                'algorithm = ? AND inode = ? AND size = ? AND mtime_ns = ?',
+                (path, algorithm, inode, size, mtime_ns)).fetchone()
+        if row is None:
+            return None
+        return (size, row[0])
+
+    def store(self, path, algorithm, stat, hexdigest):
+        """Store the hexdigest of a file along with its stat result"""
+        path = os.path.abspath(path)
+        inode, size, mtime_ns = _stat_key(stat)
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO fingerprints '
+                '(path, algorithm, inode, size, mtime_ns, hash) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (path, algorithm, inode, size, mtime_ns, hexdigest))
+            self._connection.commit()
+
+    def hash_file(self, path, algorithm=hashing.DEFAULT_ALGORITHM):
+        """
+        Get the (size, hexdigest) of a local file from the store or compute
+        it (with hashing.hash_file) and store it if it isn't there.
+        """
+        fingerprint = self.lookup(path, algorithm)
+        if fingerprint is not None:
+            return fingerprint
+
+        stat = os.stat(path)
+        size, hexdigest = hashing.hash_file(path, algorithm)
+        # Only store the hash if the file didn't change while we read it
+        if _stat_key(os.stat(path)) == _stat_key(stat):
+            self.store(path, algorithm, stat, hexdigest)
+        return (size, hexdigest)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import mmap
+import collections
+from . import compat
+
+# Hash algorithms which can be used for resource hashes. The hash field
+# of a resource holds '<algorithm>:<hexdigest>' except for md5 which is
+# the default and is stored as a bare hexdigest (like the specification
+# prescribed before it supported other algorithms).
+HASH_ALGORITHMS = ('md5', 'sha1', 'sha256', 'blake2b')
+DEFAULT_ALGORITHM = 'md5'
+
+# Size of each read (and each update of the hash). hashlib releases the
+# GIL for large updates so several files can be hashed at once in threads
+BUFFER_SIZE = 1024 * 1024
+
+# A size or hash of a resource which doesn't match the descriptor (see
+# DataPackage.verify_integrity). 'resource' is the name (or position) of
+# the resource and 'field' is 'bytes' or 'hash'. If the resource couldn't
+# be read at all 'field', 'expected' and 'actual' are None and 'error' is
+# the exception which was raised.
+IntegrityMismatch = collections.namedtuple(
+    compat.builtin_str('IntegrityMismatch'),
+    ['resource', 'field', 'expected', 'actual', 'error'])
+
+
+def new_hash(algorithm=DEFAULT_ALGORITHM):
+    """Create a new hash object for one of the supported algorithms"""
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError("unsupported hash algorithm: {0}".format(algorithm))
+    # hashlib is imported here since loading OpenSSL adds noticeably to
+    # the import time of the package
+    import hashlib
+    try:
+        return hashlib.new(algorithm)
+    except ValueError:
+        raise ValueError(
+            "hash algorithm {0} is not available".format(algorithm))
+
+
+def format_hash(algorithm, hexdigest):
+    """Format a hexdigest for the hash field of a resource"""
+    if algorithm == DEFAULT_ALGORITHM:
+        return hexdigest
+    return '{0}:{1}'.format(algorithm, hexdigest)
+
+
+def parse_hash(value):
+    """Split the hash field of a resource into (algorithm, hexdigest). A
+    hash without an algorithm prefix is an md5 hash.
+
+    """
+    if ':' in value:
+        algorithm, hexdigest = value.split(':', 1)
+        return (algorithm.lower(), hexdigest)
+    return (DEFAULT_ALGORITHM, value)
+
+
+def hashes_match(first, second):
+    """Check if two values of the hash field of a resource are the same
+    hash, e.g. 'md5:<hexdigest>' and the bare '<hexdigest>'
+
+    """
+    first_algorithm, first_hexdigest = parse_hash(first)
+    second_algorithm, second_hexdigest = parse_hash(second)
+    return first_algorithm == second_algorithm and \
+        first_hexdigest.lower() == second_hexdigest.lower()
+
+
+def hash_stream(fh, algorithm=DEFAULT_ALGORITHM, buffer_size=BUFFER_SIZE,
+                copy_to=None):
+    """Compute the size and hexdigest of everything read from a binary
+    file-like object. If copy_to (a binary file-like object) is given
+    everything read is also written to it. Returns a (size, hexdigest)
+    tuple.
+
+    """
+    hasher = new_hash(algorithm)
+    size = 0
+    while True:
+        chunk = fh.read(buffer_size)
+        if not chunk:
+            break
+        hasher.update(chunk)
+        size += len(chunk)
+        if copy_to is not None:
+            copy_to.write(chunk)
+    return (size, hasher.hexdigest())
+
+
+class HashingReader(object):
+    """
+    Wrapper around a binary file-like object which hashes and counts
+    everything read from it (line by line by iterating over it or with
+    read) so a file can be verified while it is being read.
+
+    :param fh: Binary file-like object (e.g. an opened url)
+    :param string algorithm: Hash algorithm
+    """
+
+    def __init__(self, fh, algorithm=DEFAULT_ALGORITHM):
+        self._fh = fh
+        self._hasher = new_hash(algorithm)
+        self.algorithm = algorithm
+        self.size = 0
+
+    def _update(self, chunk):
+        self._hasher.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+    def read(self, size=-1):
+        return self._update(self._fh.read(size))
+
+    def __iter__(self):
+        for line in self._fh:
+            yield self._update(line)
+
+    def hexdigest(self):
+        return self._hasher.hexdigest()
+
+    def finish(self, buffer_size=BUFFER_SIZE):
+        """Read whatever hasn't been read yet (the rest of the file has to
+        be hashed as well) and return a (size, hexdigest) tuple.
+
+        """
+        while self.read(buffer_size):
+            pass
+        return (self.size, self.hexdigest())
+
+    def close(self):
+        self._fh.close()
+
+
+def hash_file(path, algorithm=DEFAULT_ALGORITHM, buffer_size=BUFFER_SIZE,
+              use_mmap=True):
+    """Compute the size and hexdigest of a local file. The file is memory
+    mapped (unless use_mmap is False or it can't be mapped) so the hash is
+    updated straight from the page cache without copying it into Python
+    objects first. Returns a (size, hexdigest) tuple.
+
+    """
+    with io.open(path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if not use_mmap or size == 0:
+            return hash_stream(fh, algorithm, buffer_size)
+        try:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError, OSError):
+            # Some files (e.g. special files) can't be memory mapped
+            return hash_stream(fh, algorithm, buffer_size)
+
+    hasher = new_hash(algorithm)
+    try:
+        size = len(mapped)
+        try:
+            view = memoryview(mapped)
+        except TypeError:
+            # mmap objects don't support the new buffer protocol on
+            # Python 2 so the hash is fed (copied) slices of the map
+            for offset in range(0, size, buffer_size):
+                hasher.update(mapped[offset:offset + buffer_size])
+        else:
+            try:
+                for offset in range(0, size, buffer_size):
+                    hasher.update(view[offset:offset + buffer_size])
+            finally:
+                # The view has to be released before the map can be closed
+                if hasattr(view, 'release'):
+                    view.release()
+    finally:
+        mapped.close()
+    return (size, hasher.hexdigest())
+
+
+def hash_resources(resources, algorithm=None, workers=4, verify=True,
+                   store=None, cache_dir=None):
+    """Update the hash of several resources at once in a thread pool (see
+    Resource.update_hash). Returns the list of resources.
+
+    :param list resources: Resources to hash
+    :param string algorithm: Hash algorithm (defaults to the algorithm of
+        each resource's current hash, or md5)
+    :param int workers: Number of threads
+    :param bool verify: Raise an error if a hash has changed
+    :param store: Optional fingerprints.FingerprintStore for local files
+    :param string cache_dir: Optional directory for local copies of url
+        resources
+    """
+    resources = list(resources)
+
+    def update(resource):
+        resource.update_hash(verify=verify, algorithm=algorithm,
+                             store=store, cache_dir=cache_dir)
+        return resource
+
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(max(1, min(workers, len(resources) or 1)))
+    try:
+        return pool.map(update, resources)
+    finally:
+        pool.close()
+        pool.join()
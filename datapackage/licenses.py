@@ -4,11 +4,129 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
+import os
+import json
 from .util import Specification, is_url, load_licenses
 from . import compat
 
 
-LICENSES = load_licenses()
+DATA_DIRECTORY = os.path.join(
+    os.path.split(os.path.realpath(__file__))[0], 'data')
+# Registry in the compact form written by compile_licenses (generated from
+# licenses.json and licenses_aliases.json by data/update_licenses.py)
+COMPACT_LICENSES = os.path.join(DATA_DIRECTORY, 'licenses.compact.json')
+
+
+def load_licenses_aliases():
+    """Reads a dictionary of license IDs and lists of their aliases out of
+    a JSON file."""
+    filename = os.path.join(DATA_DIRECTORY, 'licenses_aliases.json')
+    with io.open(filename, 'r') as fh:
+        return json.load(fh)
+
+
+def normalize_license(name):
+    """Normalize a license ID or alias for case-insensitive lookups"""
+    return name.upper()
+
+
+def compile_licenses(licenses, aliases):
+    """
+    Compile a dictionary of licenses (as read by util.load_licenses) and
+    their aliases into the compact form of the registry. The field names
+    are only stored once and each license is a list of values (null for
+    fields it doesn't have). The normalized index of all IDs and aliases
+    is precomputed.
+    """
+    fields = sorted(set(field for details in licenses.values()
+                        for field in details))
+    index = {}
+    for license_id in licenses:
+        index[normalize_license(license_id)] = license_id
+    alias_ids = {}
+    for license_id, license_aliases in aliases.items():
+        if license_id not in licenses:
+            continue
+        for alias in license_aliases:
+            # IDs take precedence over aliases with the same name
+            index.setdefault(normalize_license(alias), alias)
+            alias_ids[alias] = license_id
+    return {'fields': fields,
+            'licenses': dict(
+                (license_id, [details.get(field) for field in fields])
+                for license_id, details in licenses.items()),
+            'index': index,
+            'aliases': alias_ids}
+
+
+class LicenseRegistry(compat.Mapping):
+    """
+    Read-only mapping of Open Definition license IDs to their details
+    (e.g. url and title). The registry is read the first time it is used
+    rather than when the module is imported.
+
+    Lookups (``registry[key]``, ``get`` and ``key in registry``) are
+    case-insensitive and aliases (e.g. 'CC-BY' for 'CC-BY-4.0') resolve to
+    the license they are an alias of. Iterating over the registry (and
+    ``keys``, ``items`` and ``len``) only covers the license IDs, so
+    ``'cc-by' in registry`` is true while ``'cc-by' in list(registry)`` is
+    not. Use ``resolve`` to get the license ID of a key.
+    """
+
+    def __init__(self, filename=COMPACT_LICENSES):
+        self.filename = filename
+        self._compiled = None
+
+    def _load(self):
+        compiled = self._compiled
+        if compiled is None:
+            try:
+                with io.open(self.filename, 'r') as fh:
+                    compiled = json.load(fh)
+            except (IOError, OSError):
+                # Fall back to the source files
+                compiled = compile_licenses(load_licenses(),
+                                            load_licenses_aliases())
+            self._compiled = compiled
+        return compiled
+
+    def name(self, value):
+        """
+        The properly cased license ID or alias for a case-insensitive
+        license ID or alias (None if it isn't a known license).
+        """
+        return self._load()['index'].get(normalize_license(value))
+
+    def resolve(self, value):
+        """
+        The license ID for a case-insensitive license ID or alias (None if
+        it isn't a known license).
+        """
+        name = self.name(value)
+        return self._load()['aliases'].get(name, name)
+
+    def __getitem__(self, key):
+        compiled = self._load()
+        license_id = self.resolve(key) \
+            if isinstance(key, compat.basestring) else None
+        if license_id is None:
+            raise KeyError(key)
+        # A new dict is built for each lookup so the registry can't be
+        # modified through it
+        return dict((field, value) for field, value
+                    in zip(compiled['fields'],
+                           compiled['licenses'][license_id])
+                    if value is not None)
+
+    def __iter__(self):
+        return iter(self._load()['licenses'])
+
+    def __len__(self):
+        return len(self._load()['licenses'])
+
+
+LICENSES = LicenseRegistry()
 
 
 class License(Specification):
@@ -49,11 +167,12 @@ class License(Specification):
         if not value:
             raise ValueError('License type is missing')
 
-        value = value.upper()
-        self['type'] = value
+        # Known licenses are stored with the case of their ID (or alias)
+        license_name = LICENSES.name(value)
+        self['type'] = license_name or value.upper()
 
-        license_data = LICENSES.get(value, {})
-        license_url = license_data.get('url')
+        license_url = LICENSES[license_name].get('url') if license_name \
+            else None
         if 'url' not in self and license_url is None:
             raise AttributeError(
                 "url is required if type isn't {0}".format(
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import posixpath
+from . import compat
+from . import storage
+
+
+class Location(object):
+    """
+    A resolved location of a file: either a path on the local file system
+    or the url of a remote file. Locations are created with ``resolve``
+    which parses the URI once so the scheme, the path or url, whether the
+    file is local and the storage backend don't have to be worked out
+    again each time the file is used.
+
+    ``file:`` URLs are resolved to local paths so they are treated like
+    any other local path.
+    """
+
+    __slots__ = ('uri', 'scheme', 'path', 'url', 'host', 'backend')
+
+    def __init__(self, uri, scheme='', path=None, url=None, host=None,
+                 backend=None):
+        self.uri = uri
+        self.scheme = scheme
+        self.path = path
+        self.url = url
+        self.host = host
+        if backend is None:
+            backend = storage.get_backend('' if path is not None else scheme)
+        self.backend = backend
+
+    @property
+    def is_local(self):
+        """Whether the location is a path on the local file system"""
+        return self.path is not None
+
+    def join(self, path):
+        """Resolve a path relative to this location (see ``resolve``)"""
+        return resolve(path, self)
+
+    def _backend(self):
+        if self.backend is None:
+            raise ValueError(
+                "no storage backend for scheme: {0}".format(self.scheme))
+        return self.backend
+
+    def open(self, mode='rb'):
+        """Open the file at the location with its storage backend. Local
+        files are opened with io.open, urls are opened with urlopen (only
+        for reading and in binary mode).
+
+        """
+        return self._backend().open(self, mode)
+
+    def stat(self):
+        """The storage.StatResult (size, mtime, etag) of the file"""
+        return self._backend().stat(self)
+
+    def read_range(self, start, length=None):
+        """Read length bytes (or the rest of the file if length is None)
+        of the file starting at the byte offset start
+
+        """
+        return self._backend().read_range(self, start, length)
+
+    def list(self):
+        """List the names of the files under the location"""
+        return self._backend().list(self)
+
+    def map(self):
+        """Open the file for reading as a storage.MappedFile over a memory
+        map of it (or like open if the backend can't map the file)
+
+        """
+        return self._backend().map(self)
+
+    def __str__(self):
+        return self.path if self.path is not None else self.url
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, str(self))
+
+    def __eq__(self, other):
+        return isinstance(other, Location) and \
+            (self.path, self.url) == (other.path, other.url)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.path, self.url))
+
+
+def _file_url_path(parsed):
+    """The local path of a parsed file: URL"""
+    if os.name == 'nt':
+        from nturl2path import url2pathname
+        return url2pathname(parsed.path)
+    return compat.unquote(parsed.path)
+
+
+def resolve(uri, base=None):
+    """
+    Resolve a URI or path to a Location. URIs with a scheme and a host
+    (e.g. http URLs) or with the scheme of a registered storage backend
+    (e.g. ``memory:``, see storage.register_backend) are remote and are
+    used as they are. Other URIs are local paths which are joined to the
+    base (a URI or a Location) if one is given. The join is a Unix-style
+    path join when the base is local or its scheme doesn't support url
+    joins and a url join when it does (e.g. http).
+
+    :param basestring uri: URI or path to resolve
+    :param base: Optional base URI (or Location) relative paths are
+        resolved against
+    """
+    if isinstance(uri, Location):
+        return uri
+    parsed = compat.parse.urlparse(uri)
+    scheme = parsed.scheme.lower()
+    if scheme == 'file':
+        return Location(uri, scheme, path=_file_url_path(parsed))
+    # One letter schemes are Windows drives
+    if scheme and (parsed.netloc or
+                   (len(scheme) > 1 and storage.get_backend(scheme))):
+        return Location(uri, scheme, url=uri, host=parsed.netloc)
+
+    if base is None:
+        return Location(uri, scheme, path=uri)
+    base = resolve(base)
+    if base.is_local:
+        # use posix path since paths are supposed to be unix-style
+        return Location(uri, base.scheme, path=posixpath.join(base.path, uri))
+    if base.scheme in compat.parse.uses_relative:
+        return resolve(compat.parse.urljoin(base.url, uri))
+    return resolve(posixpath.join(base.url, uri))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import posixpath
+
+# Mediatypes of common data formats by file extension. These are used
+# before the mimetypes module (which reads the mime.types files of the
+# host the first time it is used and therefore gives different answers
+# on different hosts) is consulted.
+MEDIATYPES = {
+    'csv': 'text/csv',
+    'tsv': 'text/tab-separated-values',
+    'tab': 'text/tab-separated-values',
+    'txt': 'text/plain',
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'jsonl': 'application/x-ndjson',
+    'geojson': 'application/geo+json',
+    'topojson': 'application/json',
+    'xml': 'application/xml',
+    'rdf': 'application/rdf+xml',
+    'kml': 'application/vnd.google-earth.kml+xml',
+    'yaml': 'application/x-yaml',
+    'yml': 'application/x-yaml',
+    'xls': 'application/vnd.ms-excel',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+            '.sheet',
+    'ods': 'application/vnd.oasis.opendocument.spreadsheet',
+    'parquet': 'application/vnd.apache.parquet',
+    'sqlite': 'application/vnd.sqlite3',
+    'html': 'text/html',
+    'htm': 'text/html',
+    'pdf': 'application/pdf',
+    'zip': 'application/zip',
+    'tar': 'application/x-tar',
+    'gz': 'application/gzip',
+    'bz2': 'application/x-bzip2',
+    'xz': 'application/x-xz',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'svg': 'image/svg+xml',
+}
+
+# Formats (file extensions) of mediatypes, the reverse of MEDIATYPES with
+# the usual extension picked where several extensions share a mediatype
+FORMATS = dict((mediatype, extension)
+               for extension, mediatype in MEDIATYPES.items())
+FORMATS.update({
+    'image/jpeg': 'jpg',
+    'text/html': 'html',
+    'text/tab-separated-values': 'tsv',
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/x-yaml': 'yaml',
+})
+
+# Extensions of compressed files. The mediatype of e.g. foo.csv.gz is the
+# mediatype of the file inside it (text/csv) like mimetypes guesses it.
+COMPRESSION_EXTENSIONS = frozenset(['gz', 'bz2', 'xz'])
+
+# Memos of earlier guesses (cleared when they reach MEMO_SIZE entries)
+MEMO_SIZE = 4096
+_mediatype_memo = {}
+_format_memo = {}
+
+
+def _memoized(memo, key, guess):
+    try:
+        return memo[key]
+    except KeyError:
+        pass
+    value = guess(key)
+    if len(memo) >= MEMO_SIZE:
+        memo.clear()
+    memo[key] = value
+    return value
+
+
+def _extension_mediatype(extension):
+    mediatype = MEDIATYPES.get(extension)
+    if mediatype is None:
+        import mimetypes
+        mediatype = mimetypes.guess_type('file.' + extension)[0]
+    return mediatype or ''
+
+
+def _suffix_mediatype(suffix):
+    extensions = suffix.split('.')
+    if len(extensions) == 2 and extensions[0]:
+        return _extension_mediatype(extensions[0]) or \
+            _extension_mediatype(extensions[1])
+    return _extension_mediatype(extensions[-1])
+
+
+def guess_mediatype(path):
+    """
+    Guess the mediatype of a file from the extension of its (Unix-style)
+    path. Returns an empty string if the extension isn't known.
+    """
+    base, extension = posixpath.splitext(path)
+    suffix = extension[1:].lower()
+    if suffix in COMPRESSION_EXTENSIONS:
+        suffix = posixpath.splitext(base)[1][1:].lower() + '.' + suffix
+    if not suffix:
+        return ''
+    return _memoized(_mediatype_memo, suffix, _suffix_mediatype)
+
+
+def _mediatype_format(mediatype):
+    format = FORMATS.get(mediatype)
+    if format is None:
+        import mimetypes
+        format = mimetypes.guess_extension(mediatype)
+        if format:
+            format = format[1:]
+            # Bug in Python: http://bugs.python.org/issue4963
+            if format in ('jpe', 'jpeg'):
+                format = 'jpg'
+    return format or ''
+
+
+def guess_format(mediatype):
+    """
+    Guess the format (file extension) of a mediatype. Returns an empty
+    string if the mediatype isn't known.
+    """
+    if not mediatype:
+        return ''
+    return _memoized(_format_memo, mediatype.lower(), _mediatype_format)
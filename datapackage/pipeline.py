@@ -0,0 +1,527 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import json
+import datetime
+import threading
+import functools
+import collections
+import timeit
+from .util import LazyList
+from . import compat
+
+if compat.is_py2:
+    import Queue as queue
+else:
+    import queue
+
+# Default number of rows in the batches read from resources
+DEFAULT_BATCH_SIZE = 1000
+# Default number of batches which can wait between two stages before the
+# stage in front has to wait (backpressure)
+DEFAULT_QUEUE_SIZE = 4
+# Seconds between checks for whether the pipeline has been stopped while
+# a stage waits for a queue
+_POLL_INTERVAL = 0.1
+
+
+class StageStats(object):
+    """
+    Throughput of a stage of a pipeline: the number of batches and rows it
+    took in and passed on and the time it spent processing them (not
+    counting the time it waited for input or for room in the queue to the
+    next stage).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        """Rows taken in per second of processing"""
+        rows = self.rows_in or self.rows_out
+        return rows / self.seconds if self.seconds else None
+
+    def __repr__(self):
+        return ('{0}({1!r}, batches={2}, rows_in={3}, rows_out={4}, '
+                'seconds={5:.3f})').format(
+            type(self).__name__, self.name, self.batches, self.rows_in,
+            self.rows_out, self.seconds)
+
+
+def _map_batch(function, batch):
+    return [function(row) for row in batch]
+
+
+def _filter_batch(function, batch):
+    return [row for row in batch if function(row)]
+
+
+class Stage(object):
+    """
+    A stage of a pipeline which turns each batch (list of rows) into a new
+    batch with a function. Stages with more than one worker apply the
+    function to several batches at once in a thread pool or a process
+    pool (in which case the function has to be picklable, e.g. defined at
+    the top level of a module) and pass the batches on in order.
+
+    :param basestring name: Name of the stage (in its StageStats)
+    :param function: Function from a batch to a new batch
+    :param int workers: Number of batches processed at once
+    :param basestring pool: 'thread' or 'process'
+    """
+
+    def __init__(self, name, function, workers=1, pool='thread'):
+        if pool not in ('thread', 'process'):
+            raise ValueError("pool must be 'thread' or 'process'")
+        if workers < 1:
+            raise ValueError("a stage needs at least one worker")
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.pool = pool
+
+    def _pool(self):
+        if self.pool == 'thread':
+            from multiprocessing.pool import ThreadPool
+            return ThreadPool(self.workers)
+        import multiprocessing
+        return multiprocessing.Pool(self.workers)
+
+    def process(self, batches, stats):
+        """Generator which processes batches and yields the new batches"""
+        timer = timeit.default_timer
+        if self.workers == 1:
+            for batch in batches:
+                start = timer()
+                output = self.function(batch)
+                stats.seconds += timer() - start
+                yield self._count(stats, batch, output)
+            return
+
+        # Only a window of batches is handed to the pool at a time so the
+        # stage doesn't read ahead of the queue it takes batches from
+        pool = self._pool()
+        pending = collections.deque()
+        window = 2 * self.workers
+        try:
+            for batch in batches:
+                pending.append((batch,
+                                pool.apply_async(self.function, (batch,))))
+                if len(pending) >= window:
+                    yield self._finish(stats, pending.popleft(), timer)
+            while pending:
+                yield self._finish(stats, pending.popleft(), timer)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _finish(self, stats, pending, timer):
+        batch, result = pending
+        start = timer()
+        output = result.get()
+        stats.seconds += timer() - start
+        return self._count(stats, batch, output)
+
+    @staticmethod
+    def _count(stats, batch, output):
+        output = list(output)
+        stats.batches += 1
+        stats.rows_in += len(batch)
+        stats.rows_out += len(output)
+        return output
+
+
+class _Stopped(Exception):
+    """Raised in the threads of a pipeline when it has been stopped"""
+
+
+class _Failure(object):
+    """Passed down the queues of a pipeline when a stage fails"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+# Passed down the queues of a pipeline after the last batch
+_END = object()
+
+
+def _put(queue_, item, stop):
+    while True:
+        try:
+            queue_.put(item, timeout=_POLL_INTERVAL)
+            return
+        except queue.Full:
+            if stop.is_set():
+                raise _Stopped()
+
+
+def _get(queue_, stop):
+    while True:
+        try:
+            return queue_.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped()
+
+
+class _Batches(object):
+    """Iterator over the batches in a queue (until the end of the queue)"""
+
+    def __init__(self, queue_, stop):
+        self.queue = queue_
+        self.stop = stop
+        self.failure = None
+
+    def __iter__(self):
+        while True:
+            item = _get(self.queue, self.stop)
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                self.failure = item
+                return
+            yield item
+
+
+class Pipeline(object):
+    """
+    Streaming pipeline from a source of batches of rows (e.g. the data of a
+    resource, see ``from_resource``) through map, filter and transform
+    stages to a sink (e.g. a CSVSink, an NDJSONSink or a ResourceSink).
+
+    The source and each stage run in their own thread and hand batches
+    (lists of rows) to the next stage through bounded queues, so a slow
+    stage holds the stages in front of it back instead of letting batches
+    pile up in memory. Stages can process several batches at once in a
+    thread or process pool (see the workers and pool arguments). Each
+    stage reports its throughput in a StageStats::
+
+        pipeline = Pipeline.from_resource(dpkg, dpkg.resources[0])
+        pipeline.filter(lambda row: row['year'] > 2000)
+        pipeline.map(convert, workers=4)
+        for stats in pipeline.run(CSVSink('out.csv')):
+            print(stats.name, stats.rows_per_second)
+
+    :param batches: Iterable of batches (lists of rows)
+    :param int queue_size: Number of batches which can wait between two
+        stages
+    """
+
+    def __init__(self, batches, queue_size=DEFAULT_QUEUE_SIZE):
+        self.batches = batches
+        self.queue_size = queue_size
+        self.stages = []
+        self.stats = []
+
+    @classmethod
+    def from_resource(cls, datapackage, resource,
+                      batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+        """
+        Create a pipeline which reads the data of a resource (in batches of
+        batch_size rows, see ``DataPackage.iter_chunks``)
+        """
+        return cls(datapackage.iter_chunks(resource, rows=batch_size),
+                   **kwargs)
+
+    def _add(self, kind, name, function, workers, pool):
+        name = name or '{0}-{1}'.format(kind, len(self.stages))
+        self.stages.append(Stage(name, function, workers, pool))
+        return self
+
+    def map(self, function, workers=1, pool='thread', name=None):
+        """Add a stage which replaces each row with function(row)"""
+        return self._add('map', name, functools.partial(_map_batch, function),
+                         workers, pool)
+
+    def filter(self, function, workers=1, pool='thread', name=None):
+        """Add a stage which keeps the rows for which function(row) is
+        true"""
+        return self._add('filter', name,
+                         functools.partial(_filter_batch, function),
+                         workers, pool)
+
+    def transform(self, function, workers=1, pool='thread', name=None):
+        """Add a stage which replaces each batch with function(batch) (an
+        iterable of rows)"""
+        return self._add('transform', name, function, workers, pool)
+
+    def _source(self, output, stop, stats):
+        timer = timeit.default_timer
+        try:
+            batches = iter(self.batches)
+            while True:
+                start = timer()
+                batch = next(batches, None)
+                stats.seconds += timer() - start
+                if batch is None:
+                    break
+                stats.batches += 1
+                stats.rows_out += len(batch)
+                _put(output, batch, stop)
+            _put(output, _END, stop)
+        except _Stopped:
+            pass
+        except BaseException as error:
+            self._fail(output, stop, error)
+
+    def _stage(self, stage, input, output, stop, stats):
+        batches = _Batches(input, stop)
+        try:
+            for batch in stage.process(batches, stats):
+                _put(output, batch, stop)
+            _put(output, batches.failure or _END, stop)
+        except _Stopped:
+            pass
+        except BaseException as error:
+            self._fail(output, stop, error)
+
+    @staticmethod
+    def _fail(output, stop, error):
+        try:
+            _put(output, _Failure(error), stop)
+        except _Stopped:
+            pass
+
+    def iter_batches(self):
+        """
+        Run the pipeline and yield the batches which come out of the last
+        stage. The pipeline is stopped if the generator is closed before
+        all batches have been read. ``stats`` holds the StageStats of the
+        source and the stages.
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(self.queue_size)
+                  for _ in range(len(self.stages) + 1)]
+        self.stats = [StageStats('source')] + \
+            [StageStats(stage.name) for stage in self.stages]
+        threads = [threading.Thread(
+            target=self._source, args=(queues[0], stop, self.stats[0]))]
+        for index, stage in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._stage,
+                args=(stage, queues[index], queues[index + 1], stop,
+                      self.stats[index + 1])))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        batches = _Batches(queues[-1], stop)
+        try:
+            for batch in batches:
+                yield batch
+            if batches.failure is not None:
+                raise batches.failure.error
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def run(self, sink):
+        """
+        Run the pipeline, writing the rows which come out of it to a sink:
+        an object with a write(batch) method, a finish() method which is
+        only called once the last batch has been written and a close()
+        method which is always called (also when the pipeline fails).
+        Returns the StageStats of the source, the stages and the sink.
+        """
+        stats = StageStats('sink')
+        timer = timeit.default_timer
+        try:
+            for batch in self.iter_batches():
+                start = timer()
+                sink.write(batch)
+                stats.seconds += timer() - start
+                stats.batches += 1
+                stats.rows_in += len(batch)
+            start = timer()
+            sink.finish()
+            stats.seconds += timer() - start
+        finally:
+            sink.close()
+        self.stats.append(stats)
+        return self.stats
+
+
+def _json_default(value):
+    """Serialize the values parsed from resources which json can't"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        # time.struct_time (time fields)
+        return '{0:02d}:{1:02d}'.format(value[3], value[4])
+    return compat.str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, compat.basestring):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (datetime.date, datetime.datetime, tuple)):
+        return _json_default(value)
+    return compat.str(value)
+
+
+class CSVSink(object):
+    """
+    Sink which writes rows (dictionaries) to a CSV file with a header.
+
+    :param basestring path: Path of the CSV file
+    :param list fields: Names of the columns (the keys of the first row if
+        not given)
+    """
+
+    def __init__(self, path, fields=None):
+        self.path = path
+        self.fields = fields
+        self._file = None
+        self._writer = None
+
+    def _open(self):
+        self._file = compat.open_csv(self.path)
+        self._writer = compat.csv_writer(self._file)
+        if self.fields is not None:
+            self._writer.writerow(self.fields)
+
+    def write(self, batch):
+        if not batch:
+            return
+        if self._writer is None:
+            if self.fields is None:
+                self.fields = list(batch[0])
+            self._open()
+        fields = self.fields
+        self._writer.writerows([_csv_value(row.get(field)) for field in fields]
+                               for row in batch)
+
+    def finish(self):
+        """Called once the last batch has been written (the file gets at
+        least the header if no rows came out of the pipeline)"""
+        if self._writer is None:
+            self._open()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class NDJSONSink(object):
+    """
+    Sink which writes rows as newline delimited JSON (one object per line)
+
+    :param basestring path: Path of the NDJSON file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = io.open(path, 'w', encoding='utf-8')
+
+    def write(self, batch):
+        self._file.write(''.join(
+            compat.str(json.dumps(row, default=_json_default,
+                                  ensure_ascii=False)) + '\n'
+            for row in batch))
+
+    def finish(self):
+        pass
+
+    def close(self):
+        self._file.close()
+
+
+# Schema field types of the values of rows (for ResourceSink). Only types
+# which DataPackage.get_data parses back to the values written are used:
+# booleans would all be read back as true (bool of the text) and lists
+# written as JSON can only be read back as objects. Datetimes are written
+# without the time zone the default datetime parser needs.
+_FIELD_TYPES = [(bool, 'string'), (compat.numeric_types[:-1], 'integer'),
+                (float, 'number'), (datetime.datetime, 'string'),
+                (datetime.date, 'date'), ((dict, list), 'object')]
+
+
+def _field_type(value):
+    for types, field_type in _FIELD_TYPES:
+        if isinstance(value, types):
+            return field_type
+    return 'string'
+
+
+class ResourceSink(CSVSink):
+    """
+    Sink which writes rows to a CSV file in the directory of a (local)
+    data package and adds it to the package as a new resource once the
+    pipeline has finished. If the pipeline fails the resource isn't added
+    and the partly written file is removed.
+
+    :param datapackage: The DataPackage to add the resource to
+    :param basestring path: Path of the CSV file (relative to the base of
+        the data package)
+    :param basestring name: Name of the new resource
+    :param dict schema: Schema of the new resource (the fields and their
+        types are taken from the first batch if not given)
+    """
+
+    def __init__(self, datapackage, path, name=None, schema=None):
+        location = datapackage.base_location.join(path)
+        if not location.is_local:
+            raise ValueError("resources can only be written to local data "
+                             "packages")
+        fields = None
+        if schema is not None:
+            fields = [field['name'] for field in schema['fields']]
+        super(ResourceSink, self).__init__(location.path, fields)
+        self.datapackage = datapackage
+        self.resource_path = path
+        self.name = name
+        self.schema = schema
+        self.resource = None
+
+    def write(self, batch):
+        if batch and self.schema is None:
+            # The type of each field is taken from its first value in the
+            # batch which isn't empty
+            fields = []
+            for name in batch[0]:
+                value = next((row[name] for row in batch
+                              if row.get(name) is not None), None)
+                fields.append({'name': name, 'type': _field_type(value)})
+            self.schema = {'fields': fields}
+        super(ResourceSink, self).write(batch)
+
+    def finish(self):
+        if self.schema is None:
+            raise ValueError("no rows to take the schema of the resource "
+                             "from (pass a schema to ResourceSink)")
+        super(ResourceSink, self).finish()
+        super(ResourceSink, self).close()
+        descriptor = {'path': self.resource_path,
+                      'format': 'csv',
+                      'mediatype': 'text/csv',
+                      'schema': self.schema}
+        if self.name is not None:
+            descriptor['name'] = self.name
+        resources = self.datapackage.get('resources') or []
+        resources = list(resources.raw() if isinstance(resources, LazyList)
+                         else resources)
+        resources.append(descriptor)
+        self.datapackage.resources = resources
+        self.resource = self.datapackage.resources[-1]
+
+    def close(self):
+        super(ResourceSink, self).close()
+        if self.resource is None and self._file is not None:
+            os.remove(self.path)
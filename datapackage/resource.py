@@ -7,22 +7,58 @@ from __future__ import unicode_literals
 import os
 import sys
 import io
-import hashlib
+import codecs
 import json
 import posixpath
+import itertools
 import re
-import mimetypes
 from .sources import Source
 from .licenses import License
 from .schema import Schema
 from .util import (Specification, is_local, is_url, is_mimetype,
-                   get_size_from_url)
+                   check_serializable, get_size_from_url)
+from .mediatypes import guess_mediatype, guess_format
+from .location import resolve
+from .hashing import (HASH_ALGORITHMS, DEFAULT_ALGORITHM, new_hash,
+                      format_hash, parse_hash, hashes_match, hash_file,
+                      hash_stream)
 from . import compat
 
 
 name_regex = re.compile(r"^[0-9A-Za-z-_\.]+$")
 
 
+# Number of items of a list of inline data serialized at once (see
+# iter_data_json)
+DATA_JSON_GROUP = 1024
+
+
+def iter_data_json(data):
+    """Generator which yields the JSON serialization of inline data (the
+    same as json.dumps(data) when joined) in pieces, so the whole string is
+    never held in memory at once. Lists are serialized DATA_JSON_GROUP
+    items at a time, which keeps the fast one-shot encoder; other values
+    are streamed with JSONEncoder.iterencode.
+
+    """
+    encoder = json.JSONEncoder()
+    if isinstance(data, (list, tuple)):
+        yield '['
+        for start in range(0, len(data), DATA_JSON_GROUP):
+            if start:
+                yield ', '
+            group = data[start:start + DATA_JSON_GROUP]
+            yield encoder.encode(group)[1:-1]
+        yield ']'
+    else:
+        chunks = encoder.iterencode(data)
+        while True:
+            piece = ''.join(itertools.islice(chunks, DATA_JSON_GROUP))
+            if not piece:
+                return
+            yield piece
+
+
 class Resource(Specification):
 
     SPECIFICATION = {'url': compat.str,
@@ -39,19 +75,86 @@ class Resource(Specification):
                      'licenses': list}
     REQUIRED = (('url', 'path', 'data'),)
     SERIALIZE_EXCLUDES = ('datapackage_uri', 'is_local')
+    OBJECT_ARRAYS = {'sources': Source,
+                     'licenses': License}
+
+    # Path of a local copy of the file at the url, made while hashing it
+    # (see update_hash) so reading the data doesn't download it again
+    local_copy = None
+
+    # The (temporary path, path) of a copy of the url which becomes
+    # local_copy once its hash has been verified (see _spill)
+    _pending_copy = None
+
+    # The (url, size) measured by the last download of the url, so the
+    # size doesn't have to be downloaded again after hashing it (see
+    # _url_bytes)
+    _url_size = None
+
+    # The (url, algorithm, (size, hexdigest)) of the url measured when its
+    # size had to be counted by downloading it, so hashing it afterwards
+    # doesn't download it again (see _url_digest)
+    _url_counted = None
+
+    # Resolved locations of the path and url along with the values they
+    # were resolved from (see _location)
+    _locations = None
 
     def __init__(self, *args, **kwargs):
         self.datapackage_uri = kwargs.pop('datapackage_uri', os.path.curdir)
         self.is_local = is_local(self.datapackage_uri)
         super(Resource, self).__init__(self, *args, **kwargs)
 
+    @classmethod
+    def from_trusted(cls, descriptor, datapackage_uri=os.path.curdir):
+        """
+        Create a new Resource from a trusted descriptor without validating
+        it (see ``Specification.from_trusted``). Unlike the constructor
+        this does not guess the mediatype and format from the path or url.
+
+        :param dict descriptor: Descriptor to build the resource from
+        :param basestring datapackage_uri: URI for the data package which
+            holds this resource
+        """
+        resource = super(Resource, cls).from_trusted(descriptor)
+        dict.__setitem__(resource, 'datapackage_uri', datapackage_uri)
+        dict.__setitem__(resource, 'is_local', is_local(datapackage_uri))
+        return resource
+
+    def _location(self, key):
+        """The resolved location.Location of the path (relative to the
+        datapackage_uri) or the url of the resource, or None if it doesn't
+        have one. Locations are cached until the values they were resolved
+        from change.
+
+        """
+        value = self.get(key)
+        if not value:
+            return None
+        base = self['datapackage_uri'] if key == 'path' else None
+        locations = self._locations
+        if locations is None:
+            locations = self._locations = {}
+        cached = locations.get(key)
+        if cached is not None and cached[0] == value and cached[1] == base:
+            return cached[2]
+        location = resolve(value, base)
+        locations[key] = (value, base, location)
+        return location
+
+    @property
+    def location(self):
+        """The resolved location.Location of the file of the resource: its
+        path if it has one, otherwise its url (None for inline data).
+
+        """
+        return self._location('path') or self._location('url')
+
     def _open(self, mode):
-        if self.is_local:
-            return io.open(self.fullpath, mode)
-        else:
-            if mode not in ('r', 'rb'):
-                raise ValueError('urls can only be opened read-only')
-            return compat.urlopen(self.fullpath)
+        location = self._location('path')
+        if location is None:
+            raise ValueError("path to file is not specified")
+        return location.open(mode)
 
     @property
     def datapackage_uri(self):
@@ -90,7 +193,7 @@ class Resource(Specification):
 
         # make sure the value is json serializable
         try:
-            json.loads(json.dumps(val))
+            check_serializable(val)
         except TypeError:
             raise TypeError("'{0}' is not json serializable".format(val))
 
@@ -126,14 +229,10 @@ class Resource(Specification):
         than being relative to it.
 
         """
-        path = self.path
-        if path:
-            if self['is_local']:
-                # use posix path since it is supposed to be unix-style
-                path = posixpath.join(self['datapackage_uri'], path)
-            else:
-                path = compat.parse.urljoin(self['datapackage_uri'], path)
-        return path
+        location = self._location('path')
+        if location is None:
+            return self.path
+        return str(location)
 
     @property
     def url(self):
@@ -142,6 +241,11 @@ class Resource(Specification):
 
     @url.setter
     def url(self, val):
+        if val != self.url:
+            # The copy and size belong to the old url
+            self.local_copy = None
+            self._url_size = None
+            self._url_counted = None
         if not val and 'url' in self:
             del self['url']
             return
@@ -161,9 +265,10 @@ class Resource(Specification):
 
         """
         if self.path:
-            mediatype, encoding = mimetypes.guess_type(self.path)
+            mediatype = guess_mediatype(self.path)
         elif self.url:
-            mediatype, encoding = mimetypes.guess_type(self.url)
+            mediatype = guess_mediatype(
+                compat.parse.urlparse(self.url).path)
         else:
             mediatype = ''
 
@@ -182,14 +287,7 @@ class Resource(Specification):
             path = compat.parse.urlparse(self.url).path
             format = posixpath.splitext(path)[1][1:]
         else:
-            format = mimetypes.guess_extension(self.mediatype)
-            if format:
-                format = format[1:]
-                # Bug in Python: http://bugs.python.org/issue4963
-                if format in ('jpe', 'jpeg'):
-                    format = 'jpg'
-            else:
-                format = ''
+            format = guess_format(self.mediatype)
 
         return compat.str(format)
 
@@ -263,29 +361,81 @@ class Resource(Specification):
             val = 'utf-8'
         self['encoding'] = compat.str(val)
 
+    def _data_digest(self, algorithm=DEFAULT_ALGORITHM):
+        """Compute the size and checksum of the serialized inline data in
+        one pass (without holding the whole serialization in memory).
+        Returns a (size, hexdigest) tuple.
+
+        """
+        encoder = codecs.getincrementalencoder(self.encoding)()
+        hasher = new_hash(algorithm)
+        size = 0
+        for chunk in iter_data_json(self.data):
+            bytestr = encoder.encode(chunk)
+            hasher.update(bytestr)
+            size += len(bytestr)
+        bytestr = encoder.encode('', final=True)
+        hasher.update(bytestr)
+        size += len(bytestr)
+        return (size, hasher.hexdigest())
+
     def _data_bytes(self):
         """Compute the size of the inline data"""
         if not self.data:
             raise ValueError("data is not specified")
-        bytestr = compat.to_bytes(json.dumps(self.data), encoding=self.encoding)
-        return len(bytestr)
+        return self._data_digest()[0]
 
     def _path_bytes(self):
         """Compute the size of the file specified by the path"""
-        if not self.path:
+        location = self._location('path')
+        if location is None:
             raise ValueError("path to file is not specified")
-        if self.is_local:
-            size = os.path.getsize(self.fullpath)
-        else:
-            size = get_size_from_url(self.fullpath)
-
+        size = location.stat().size
+        if size is None:
+            # e.g. a server which doesn't send Content-Length
+            with location.open('rb') as fh:
+                size = hash_stream(fh, DEFAULT_ALGORITHM)[0]
         return size
 
     def _url_bytes(self):
-        """Compute the size of the file specified by the url"""
+        """Compute the size of the file specified by the url. The size
+        measured when the url was last hashed is used if there is one
+        (only once), otherwise it is taken from the Content-Length header
+        if the server sends it, otherwise the file is streamed and counted.
+        A streamed file is hashed while it is counted so hashing it next
+        doesn't download it again.
+
+        """
         if not self.url:
             raise ValueError("url to file is not specified")
-        return get_size_from_url(self.url)
+        url_size, self._url_size = self._url_size, None
+        if url_size is not None and url_size[0] == self.url:
+            return url_size[1]
+        algorithm = parse_hash(self.hash)[0] if self.hash \
+            else DEFAULT_ALGORITHM
+        if algorithm not in HASH_ALGORITHMS:
+            algorithm = DEFAULT_ALGORITHM
+
+        def count(site):
+            digest = hash_stream(site, algorithm)
+            self._url_counted = (self.url, algorithm, digest)
+            return digest[0]
+
+        return get_size_from_url(self.url, count)
+
+    def _compute_bytes(self):
+        """Compute the size of the resource, using either the inline data,
+        the path, or the url (whichever one exists first, in that order).
+
+        """
+        if self.data:
+            return self._data_bytes()
+        elif self.path:
+            return self._path_bytes()
+        elif self.url:
+            return self._url_bytes()
+        else:
+            raise ValueError("resource not found")
 
     def update_bytes(self, verify=True):
         """Re-compute the size of the resource, using either the inline data,
@@ -296,14 +446,7 @@ class Resource(Specification):
 
         """
         old_size = self.bytes
-        if self.data:
-            new_size = self._data_bytes()
-        elif self.path:
-            new_size = self._path_bytes()
-        elif self.url:
-            new_size = self._url_bytes()
-        else:
-            raise ValueError("resource not found")
+        new_size = self._compute_bytes()
 
         if verify and old_size and (old_size != new_size):
             raise RuntimeError(
@@ -312,54 +455,182 @@ class Resource(Specification):
 
         self['bytes'] = new_size
 
-    def _data_hash(self):
-        """Computes the md5 checksum of the inline data."""
-        bytestr = compat.to_bytes(json.dumps(self.data), encoding=self.encoding)
-        md5 = hashlib.md5()
-        md5.update(bytestr)
-        hash = md5.hexdigest()
-        return hash
-
-    def _path_hash(self):
-        """Computes the md5 checksum of the file saved at the given path."""
-        # we need to compute the md5 sum one chunk at a time, because
+    def _data_hash(self, algorithm=DEFAULT_ALGORITHM):
+        """Computes the checksum of the inline data."""
+        return self._data_digest(algorithm)[1]
+
+    def _path_digest(self, algorithm=DEFAULT_ALGORITHM, store=None):
+        """Computes the size and checksum of the file saved at the given
+        path in one pass. If a fingerprint store is given local files are
+        looked up in (and added to) the store. Returns a (size, hexdigest)
+        tuple.
+
+        """
+        # we need to compute the checksum one chunk at a time, because
         # some files are too large to fit in memory
-        if not self.path:
+        location = self._location('path')
+        if location is None:
             raise ValueError("path to file is not specified")
-        md5 = hashlib.md5()
-        with self._open('rb') as fh:
-            while True:
-                chunk = fh.read(128)
-                if not chunk:
-                    break
-                md5.update(chunk)
-        hash = md5.hexdigest()
-        return hash
-
-    def _url_hash(self):
-        """Computes the md5 checksum of the file saved at the url."""
-        # probably want to download the data first and store it
-        # somewhere before computing the MD5 sum otherwise it'll have
-        # be downloaded twice. But then if that's the case then
-        # _path_hash can probably just be used?
-        raise NotImplementedError
-
-    def update_hash(self, verify=True):
-        old_hash = self.hash
+        if location.is_local and store is not None:
+            return store.hash_file(location.path, algorithm)
+        elif location.is_local:
+            return hash_file(location.path, algorithm)
+        with location.open('rb') as fh:
+            return hash_stream(fh, algorithm)
+
+    def _path_hash(self, algorithm=DEFAULT_ALGORITHM, store=None):
+        """Computes the checksum of the file saved at the given path (see
+        _path_digest).
+
+        """
+        return self._path_digest(algorithm, store)[1]
+
+    def _url_digest(self, algorithm=DEFAULT_ALGORITHM, cache_dir=None):
+        """Stream the file saved at the url once, computing its size and
+        checksum in the same pass. If cache_dir is given the file is also
+        copied to a file in that directory, which becomes local_copy once
+        the hash has been verified (see _keep_copy). If the url was just
+        downloaded by _url_bytes its digest is used instead. Returns a
+        (size, hexdigest) tuple.
+
+        """
+        if not self.url:
+            raise ValueError("url to file is not specified")
+        counted, self._url_counted = self._url_counted, None
+        if cache_dir is None and counted is not None and \
+                counted[:2] == (self.url, algorithm):
+            # The url was just downloaded to count its size
+            digest = counted[2]
+        else:
+            site = compat.urlopen(self.url)
+            try:
+                if cache_dir is None:
+                    digest = hash_stream(site, algorithm)
+                else:
+                    digest = self._spill(site, algorithm, cache_dir)
+            finally:
+                site.close()
+        self._url_size = (self.url, digest[0])
+        return digest
+
+    def _spill(self, site, algorithm, cache_dir):
+        """Copy an opened url to a temporary file in cache_dir while hashing
+        it. The copy is only renamed (and becomes local_copy) by _keep_copy
+        so local_copy is never a partial or unverified file.
+
+        """
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # Name the copy after the url (keeping the extension)
+        extension = posixpath.splitext(compat.parse.urlparse(self.url).path)[1]
+        url_hash = new_hash('sha1')
+        url_hash.update(self.url.encode('utf-8'))
+        filename = url_hash.hexdigest() + extension
+        import tempfile
+        fd, temporary = tempfile.mkstemp(suffix='.part', dir=cache_dir)
+        try:
+            with io.open(fd, 'wb') as copy:
+                digest = hash_stream(site, algorithm, copy_to=copy)
+        except Exception:
+            os.remove(temporary)
+            raise
+        self._drop_copy()
+        self._pending_copy = (temporary, os.path.join(cache_dir, filename))
+        return digest
+
+    def _keep_copy(self):
+        """Make the copy of the url made by _spill the local_copy"""
+        if self._pending_copy is not None:
+            temporary, local_copy = self._pending_copy
+            self._pending_copy = None
+            compat.replace(temporary, local_copy)
+            self.local_copy = local_copy
+
+    def _drop_copy(self):
+        """Remove the copy of the url made by _spill (e.g. when its hash
+        doesn't match)
+
+        """
+        if self._pending_copy is not None:
+            os.remove(self._pending_copy[0])
+            self._pending_copy = None
+
+    def _url_hash(self, algorithm=DEFAULT_ALGORITHM, cache_dir=None):
+        """Computes the checksum of the file saved at the url (see
+        _url_digest).
+
+        """
+        return self._url_digest(algorithm, cache_dir)[1]
+
+    def _compute_digest(self, algorithm, store=None, cache_dir=None):
+        """Compute the size and checksum of the resource in one pass
+        (inline data is serialized once and files are read once), using
+        either the inline data, the path, or the url (whichever one exists
+        first, in that order). Returns a (size, hash) tuple with the hash
+        formatted for the hash field.
+
+        """
         if self.data:
-            new_hash = self._data_hash()
+            size, hash = self._data_digest(algorithm)
         elif self.path:
-            new_hash = self._path_hash()
+            size, hash = self._path_digest(algorithm, store)
         elif self.url:
-            new_hash = self._url_hash()
+            size, hash = self._url_digest(algorithm, cache_dir)
         else:
             raise ValueError("resource not found")
+        return (size, format_hash(algorithm, hash))
 
-        if verify and old_hash and (old_hash != new_hash):
-            raise RuntimeError(
-                "hash of file has changed! (was: {0}, is now: {1})".format(
-                    old_hash, new_hash))
+    def _compute_hash(self, algorithm, store=None, cache_dir=None):
+        """Compute the checksum of the resource (see _compute_digest) and
+        format it for the hash field.
+
+        """
+        return self._compute_digest(algorithm, store, cache_dir)[1]
+
+    def update_hash(self, verify=True, algorithm=None, store=None,
+                    cache_dir=None):
+        """Re-compute the checksum of the resource, using either the inline
+        data, the path, or the url (whichever one exists first, in that
+        order). If 'verify' is True and a hash is already present in
+        the descriptor, then this will check that the hash hasn't
+        changed, and throw an error if it has.
 
+        :param string algorithm: One of hashing.HASH_ALGORITHMS. Defaults
+            to the algorithm of the current hash (or md5 if there is none).
+            Hashes other than md5 are stored as '<algorithm>:<hexdigest>'.
+        :param store: Optional fingerprints.FingerprintStore used to skip
+            rehashing local files which haven't changed.
+        :param string cache_dir: Optional directory to copy the file at the
+            url to while it is hashed. The copy is kept as local_copy (if
+            the hash is verified) and used when reading the data of the
+            resource.
+        """
+        old_hash = self.hash
+        old_algorithm = parse_hash(old_hash)[0] if old_hash \
+            else DEFAULT_ALGORITHM
+        if algorithm is None:
+            algorithm = old_algorithm
+
+        try:
+            new_hash = self._compute_hash(algorithm, store, cache_dir)
+
+            if verify and old_hash:
+                # If the algorithm is being changed the old hash has to be
+                # verified with its own algorithm
+                if old_algorithm != algorithm:
+                    current_hash = self._compute_hash(old_algorithm, store,
+                                                      cache_dir)
+                else:
+                    current_hash = new_hash
+                if not hashes_match(old_hash, current_hash):
+                    raise RuntimeError(
+                        "hash of file has changed! (was: {0}, is now: "
+                        "{1})".format(old_hash, current_hash))
+        except Exception:
+            self._drop_copy()
+            raise
+
+        self._keep_copy()
         self['hash'] = new_hash
 
     @property
@@ -155,6 +155,7 @@ class Schema(Specification):
     SPECIFICATION = {'fields': list,
                      'primaryKey': (compat.str, list),
                      'foreignKeys': list}
+    OBJECT_ARRAYS = {'fields': Field}
 
     def __init__(self, *args, **kwargs):
         # We need to initialize an empty fields array (this is a required
@@ -222,7 +223,7 @@ class Schema(Specification):
         if isinstance(field, Field):
             self['fields'].append(field)
         elif type(field) == dict:
-            self['fields'].append(Field(field))
+            self['fields'].append(Field(**field))
         else:
             raise TypeError("Type of parameter field is not supported.")
 
@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import io
+import time
+import itertools
+import struct
+import threading
+import collections
+import posixpath
+from . import compat
+from . import util
+
+# Size (None if unknown), modification time (seconds since the epoch or
+# None) and entity tag (None if the backend has none) of a file
+StatResult = collections.namedtuple(
+    compat.builtin_str('StatResult'), ['size', 'mtime', 'etag'])
+
+
+class Backend(object):
+    """
+    Base class of storage backends. A backend opens, stats, reads ranges
+    of and lists the files at location.Location objects with the URI
+    schemes it is registered for (see ``register_backend``).
+    """
+
+    # Whether files are read over the network (so they are e.g. cached
+    # with a time to live instead of being checked for changes)
+    remote = False
+
+    def open(self, location, mode='rb'):
+        """Open the file at the location as a binary file-like object"""
+        raise NotImplementedError
+
+    def stat(self, location):
+        """Get the StatResult of the file at the location"""
+        raise NotImplementedError
+
+    def read_range(self, location, start, length=None):
+        """Read length bytes (or the rest of the file if length is None)
+        from the file at the location starting at the byte offset start.
+
+        """
+        with self.open(location, 'rb') as fh:
+            try:
+                fh.seek(start)
+            except (AttributeError, IOError, OSError, ValueError):
+                # Not seekable, so skip to the start instead
+                while start > 0:
+                    skipped = fh.read(min(start, 1024 * 1024))
+                    if not skipped:
+                        break
+                    start -= len(skipped)
+            return fh.read() if length is None else fh.read(length)
+
+    def list(self, location):
+        """List the names of the files under the location (a directory)"""
+        raise NotImplementedError(
+            "{0} can't list files".format(type(self).__name__))
+
+    def map(self, location):
+        """Open the file at the location for reading as a MappedFile over a
+        memory map of it. Files which can't be memory mapped are opened
+        with open instead.
+
+        """
+        return self.open(location, 'rb')
+
+
+class LocalBackend(Backend):
+    """Files on the local file system"""
+
+    def open(self, location, mode='rb'):
+        return io.open(location.path, mode)
+
+    def stat(self, location):
+        stat = os.stat(location.path)
+        return StatResult(stat.st_size, stat.st_mtime, None)
+
+    def read_range(self, location, start, length=None):
+        with io.open(location.path, 'rb') as fh:
+            fh.seek(start)
+            return fh.read() if length is None else fh.read(length)
+
+    def list(self, location):
+        return sorted(os.listdir(location.path))
+
+    def map(self, location):
+        import mmap
+        fh = io.open(location.path, 'rb')
+        try:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError, OSError):
+            # Empty and special files (e.g. pipes) can't be mapped
+            return fh
+        fh.close()
+        return MappedFile(mapped, owner=True)
+
+
+class URLBackend(Backend):
+    """Files at urls which are opened with urlopen (read-only)"""
+
+    remote = True
+
+    def open(self, location, mode='rb'):
+        if mode not in ('r', 'rb'):
+            raise ValueError('urls can only be opened read-only')
+        return compat.urlopen(location.url)
+
+    def stat(self, location):
+        site = compat.urlopen(location.url)
+        try:
+            return _stat_from_headers(site)
+        finally:
+            site.close()
+
+
+class HTTPBackend(URLBackend):
+    """
+    Files on HTTP(S) servers. Files are stat'ed with HEAD requests (falling
+    back to GET if the server doesn't allow HEAD or doesn't send the size)
+    and ranges are read with Range requests.
+    """
+
+    def stat(self, location):
+        try:
+            site = compat.urlopen(util.head_request(location.url))
+        except compat.HTTPError:
+            # e.g. 405 Method Not Allowed
+            pass
+        else:
+            try:
+                stat = _stat_from_headers(site)
+            finally:
+                site.close()
+            if stat.size is not None:
+                return stat
+        # Some servers leave Content-Length out of HEAD responses
+        return super(HTTPBackend, self).stat(location)
+
+    def read_range(self, location, start, length=None):
+        end = '' if length is None else start + length - 1
+        request = compat.Request(location.url, headers={
+            'Range': 'bytes={0}-{1}'.format(start, end)})
+        site = compat.urlopen(request)
+        try:
+            if site.getcode() != 206:
+                # The server sent the whole file
+                skipped = 0
+                while skipped < start:
+                    chunk = site.read(min(start - skipped, 1024 * 1024))
+                    if not chunk:
+                        break
+                    skipped += len(chunk)
+            return site.read() if length is None else site.read(length)
+        finally:
+            site.close()
+
+
+class _MemoryWriter(io.BytesIO):
+    """In-memory file which is stored in a MemoryBackend when closed"""
+
+    def __init__(self, backend, key):
+        super(_MemoryWriter, self).__init__()
+        self._backend = backend
+        self._key = key
+
+    def close(self):
+        if not self.closed:
+            self._backend.put(self._key, self.getvalue())
+        super(_MemoryWriter, self).close()
+
+
+class MemoryBackend(Backend):
+    """
+    Files kept in memory, keyed by the host and path of ``memory:`` URIs
+    (e.g. ``memory://bucket/datapackage.json`` is stored under
+    ``bucket/datapackage.json``). Useful for tests and benchmarks which
+    shouldn't depend on the disk.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(location):
+        """The key of a location in the backend"""
+        parsed = compat.parse.urlparse(location.url)
+        return parsed.netloc + parsed.path
+
+    def put(self, key, data):
+        """Store the contents (bytes) of a file under a key"""
+        with self._lock:
+            self._files[key] = (bytes(data), time.time())
+
+    def remove(self, key):
+        with self._lock:
+            del self._files[key]
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+    def _get(self, location):
+        key = self.key(location)
+        try:
+            return self._files[key]
+        except KeyError:
+            raise IOError("no such file in memory: {0}".format(key))
+
+    def open(self, location, mode='rb'):
+        if mode in ('w', 'wb'):
+            return _MemoryWriter(self, self.key(location))
+        if mode not in ('r', 'rb'):
+            raise ValueError("unsupported mode: {0}".format(mode))
+        return io.BytesIO(self._get(location)[0])
+
+    def stat(self, location):
+        data, mtime = self._get(location)
+        return StatResult(len(data), mtime, None)
+
+    def read_range(self, location, start, length=None):
+        data = self._get(location)[0]
+        return data[start:] if length is None else data[start:start + length]
+
+    def list(self, location):
+        prefix = self.key(location).rstrip('/') + '/'
+        with self._lock:
+            keys = list(self._files)
+        return sorted(set(key[len(prefix):].split('/', 1)[0]
+                          for key in keys if key.startswith(prefix)))
+
+
+# Number of bytes of whole lines MappedFile.iter_text decodes at once
+TEXT_BLOCK_SIZE = 1024 * 1024
+
+
+class MappedFile(io.RawIOBase):
+    """
+    Read-only file-like object over the bytes from start to end of a
+    memory map. Reads slice the map directly (no buffering) and lines are
+    found with mmap.find. The map is closed along with the file if the
+    file owns it (e.g. the map of a local file, see LocalBackend.map).
+    """
+
+    def __init__(self, mapped, start=0, end=None, owner=False):
+        super(MappedFile, self).__init__()
+        self.mmap = mapped
+        self.start = start
+        self.end = len(mapped) if end is None else end
+        self.owner = owner
+        self._position = start
+
+    def close(self):
+        if self.owner and not self.closed:
+            self.mmap.close()
+        super(MappedFile, self).close()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position - self.start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = self.start + offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.end + offset
+        else:
+            raise ValueError("invalid whence: {0}".format(whence))
+        self._position = min(max(position, self.start), self.end)
+        return self.tell()
+
+    def read(self, size=-1):
+        start = self._position
+        if size is None or size < 0:
+            end = self.end
+        else:
+            end = min(start + size, self.end)
+        self._position = end
+        return self.mmap[start:end]
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readline(self, size=-1):
+        start = self._position
+        end = self.mmap.find(b'\n', start, self.end)
+        end = self.end if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, start + size)
+        self._position = end
+        return self.mmap[start:end]
+
+    def __iter__(self):
+        mapped, end, find = self.mmap, self.end, self.mmap.find
+        position = self._position
+        while position < end:
+            newline = find(b'\n', position, end)
+            newline = end if newline < 0 else newline + 1
+            line = mapped[position:newline]
+            position = self._position = newline
+            yield line
+
+    def _text_blocks(self, encoding, block_size):
+        mapped, end = self.mmap, self.end
+        position = self._position
+        while position < end:
+            cut = mapped.rfind(b'\n', position,
+                               min(position + block_size, end))
+            if cut < 0:
+                # A line longer than the block
+                cut = mapped.find(b'\n', position + block_size, end)
+            cut = end if cut < 0 else cut + 1
+            text = mapped[position:cut].decode(encoding)
+            position = self._position = cut
+            # Only \\n ends lines (like when iterating over binary files)
+            yield io.StringIO(text, newline='\n')
+
+    def iter_text(self, encoding='utf-8', block_size=TEXT_BLOCK_SIZE):
+        """
+        Iterate over the lines (ending with \\n, which is kept) of the
+        rest of the file decoded with the encoding. Blocks of whole lines
+        (about block_size bytes) are sliced out of the map and decoded at
+        once instead of line by line. Encodings where \\n isn't the byte
+        0x0A (e.g. UTF-16) are decoded with a TextIOWrapper instead.
+        """
+        if '\n'.encode(encoding) != b'\n':
+            return io.TextIOWrapper(io.BufferedReader(self), encoding,
+                                    newline='\n')
+        return itertools.chain.from_iterable(
+            self._text_blocks(encoding, block_size))
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+
+class ZipIndex(object):
+    """
+    Index of the members of a zip archive, built once from the central
+    directory of the archive. The archive is kept open (and memory mapped)
+    so members can be opened without parsing the central directory again.
+    Members which are stored without compression are read straight out of
+    the memory map.
+    """
+
+    def __init__(self, path):
+        import zipfile
+        self.path = path
+        self.stamp = _file_stamp(path)
+        self.zipfile = zipfile.ZipFile(path)
+        self.members = dict((info.filename, info)
+                            for info in self.zipfile.infolist())
+        self._mmap = None
+        self._lock = threading.Lock()
+
+    def info(self, member):
+        """The ZipInfo of a member (IOError if there is no such member)"""
+        try:
+            return self.members[member]
+        except KeyError:
+            raise IOError("no such member in {0}: {1}".format(
+                self.path, member))
+
+    def names(self):
+        return list(self.members)
+
+    def _mapped(self):
+        with self._lock:
+            if self._mmap is None:
+                import mmap
+                with io.open(self.path, 'rb') as fh:
+                    self._mmap = mmap.mmap(fh.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+            return self._mmap
+
+    def region(self, member):
+        """The (mmap, start, end) of the bytes of a member which is stored
+        without compression or encryption (None for other members)
+
+        """
+        import zipfile
+        info = self.info(member)
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+            return None
+        mapped = self._mapped()
+        # The local file header has its own name and extra field lengths
+        offset = info.header_offset
+        header = struct.unpack(_LOCAL_HEADER, mapped[offset:offset + 30])
+        start = offset + 30 + header[-2] + header[-1]
+        return (mapped, start, start + info.file_size)
+
+    def open(self, member):
+        """Open a member for reading"""
+        region = self.region(member)
+        if region is not None:
+            return MappedFile(*region)
+        return self.zipfile.open(self.info(member))
+
+    def close(self):
+        """Close the archive. Files already opened from it can still be
+        read: the memory map is released once the last of them is closed.
+
+        """
+        with self._lock:
+            self.zipfile.close()
+            self._mmap = None
+
+
+# Layout of the local file header of a zip member (see the zip spec)
+_LOCAL_HEADER = compat.builtin_str('<4sHHHHHLLLHH')
+
+
+class ZipBackend(Backend):
+    """
+    Members of zip archives on the local file system addressed with
+    ``zip:`` URIs of the form ``zip:<path to archive>!/<member>`` (e.g.
+    ``zip:///data/package.zip!/datapackage.json``). The central directory
+    of each archive is read once into a ZipIndex which is kept until the
+    archive changes. The indexes of at most ``MAX_INDEXES`` archives are
+    kept open, the least recently used one is closed when there are more.
+    """
+
+    MAX_INDEXES = 16
+
+    def __init__(self):
+        self._indexes = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def split(location):
+        """Split a location into the path of the archive and the name of
+        the member (which is '' for the root of the archive)
+
+        """
+        path = compat.unquote(compat.parse.urlparse(location.url).path)
+        if '!' not in path:
+            return (path, '')
+        archive, member = path.split('!', 1)
+        member = posixpath.normpath('/' + member).lstrip('/')
+        return (archive, member)
+
+    @staticmethod
+    def uri(archive, member=''):
+        """The zip: URI of a member of the archive at a local path"""
+        path = compat.quote(os.path.abspath(archive).replace(os.sep, '/'))
+        return 'zip://{0}!/{1}'.format(path, member)
+
+    def index(self, archive):
+        """The ZipIndex of the archive at a local path"""
+        stamp = _file_stamp(archive)
+        stale = []
+        with self._lock:
+            index = self._indexes.pop(archive, None)
+            if index is not None and index.stamp != stamp:
+                stale.append(index)
+                index = None
+            if index is None:
+                index = ZipIndex(archive)
+            # Move to the end to mark it as the most recently used
+            self._indexes[archive] = index
+            while len(self._indexes) > self.MAX_INDEXES:
+                stale.append(self._indexes.popitem(last=False)[1])
+        for index_ in stale:
+            index_.close()
+        return index
+
+    def open(self, location, mode='rb'):
+        if mode not in ('r', 'rb'):
+            raise ValueError('zip members can only be opened read-only')
+        archive, member = self.split(location)
+        return self.index(archive).open(member)
+
+    def stat(self, location):
+        archive, member = self.split(location)
+        info = self.index(archive).info(member)
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        return StatResult(info.file_size, mtime, '{0:08x}'.format(info.CRC))
+
+    def read_range(self, location, start, length=None):
+        archive, member = self.split(location)
+        region = self.index(archive).region(member)
+        if region is None:
+            return super(ZipBackend, self).read_range(location, start, length)
+        mapped, begin, end = region
+        begin = min(begin + start, end)
+        if length is not None:
+            end = min(begin + length, end)
+        return mapped[begin:end]
+
+    def map(self, location):
+        archive, member = self.split(location)
+        return self.index(archive).open(member)
+
+    def list(self, location):
+        archive, member = self.split(location)
+        prefix = member.rstrip('/') + '/' if member else ''
+        names = self.index(archive).names()
+        return sorted(set(name[len(prefix):].split('/', 1)[0]
+                          for name in names
+                          if name.startswith(prefix) and name != prefix))
+
+    def package_root(self, archive):
+        """The zip: URI of the directory of the datapackage.json in the
+        archive at a local path: the root of the archive or the only
+        top-level directory of the archive if the data package was zipped
+        with its directory (IOError if there is no datapackage.json)
+
+        """
+        names = self.index(archive).names()
+        if 'datapackage.json' in names:
+            return self.uri(archive)
+        roots = set(name.split('/', 1)[0] for name in names)
+        if len(roots) == 1:
+            root = roots.pop()
+            if root + '/datapackage.json' in names:
+                return self.uri(archive, root + '/')
+        raise IOError("no datapackage.json in {0}".format(archive))
+
+
+def _stat_from_headers(site):
+    """The StatResult of an opened url from its response headers"""
+    mtime = util._header(site, 'Last-Modified')
+    if mtime is not None:
+        import email.utils
+        parsed = email.utils.parsedate_tz(mtime)
+        mtime = email.utils.mktime_tz(parsed) if parsed else None
+    return StatResult(util._content_length(site), mtime,
+                      util._header(site, 'ETag'))
+
+
+# Backends by URI scheme ('' is local paths)
+BACKENDS = {}
+_local = LocalBackend()
+_url = URLBackend()
+_http = HTTPBackend()
+# The process-wide in-memory storage of memory: URIs
+memory = MemoryBackend()
+_zip = ZipBackend()
+
+
+def register_backend(scheme, backend):
+    """
+    Register a backend (a Backend instance) for a URI scheme. Locations
+    with the scheme which are resolved afterwards use the backend.
+    """
+    BACKENDS[scheme.lower()] = backend
+
+
+def get_backend(scheme):
+    """The backend registered for a URI scheme (None if there is none)"""
+    return BACKENDS.get(scheme.lower())
+
+
+register_backend('', _local)
+register_backend('file', _local)
+register_backend('http', _http)
+register_backend('https', _http)
+register_backend('ftp', _url)
+register_backend('memory', memory)
+register_backend('zip', _zip)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import shutil
+import posixpath
+from .datapackage import DataPackage
+
+# Default number of bytes of the members which come before datapackage.json
+# that are kept in memory (the rest are spilled to temporary files)
+DEFAULT_BUFFER_SIZE = 16 * 1024 * 1024
+
+
+def _member_name(name):
+    """Normalized name of a tar member (without a leading ./)"""
+    return posixpath.normpath(name).lstrip('/')
+
+
+class TarStreamReader(object):
+    """
+    Single-pass reader of a data package from a tar stream (e.g. stdin or a
+    socket). The stream is read once, front to back, so it never has to be
+    seekable or stored on disk:
+
+    - Members which come before ``datapackage.json`` are buffered since
+      it isn't known yet which of them are resources. The first
+      ``buffer_size`` bytes are kept in memory, the rest are spilled to
+      temporary files.
+    - Once ``datapackage.json`` (at the root of the archive or in a
+      directory) has been read, the buffered resources are yielded and
+      then each resource with a path in the package is yielded as its
+      member streams past. Other members are skipped.
+
+    Iterating over the reader yields ``(resource, rows)`` pairs where rows
+    is the ``DataPackage.get_data`` generator of the resource. The rows of
+    a resource have to be consumed before moving on to the next resource
+    since the member is gone once the stream has moved past it::
+
+        reader = TarStreamReader(sys.stdin.buffer)
+        for resource, rows in reader:
+            for row in rows:
+                ...
+
+    The data package is available as ``reader.datapackage`` once the first
+    resource has been yielded.
+
+    :param fileobj: Binary file-like object to read the (possibly gzip,
+        bz2 or xz compressed) tar stream from
+    :param int buffer_size: Number of bytes of members which come before
+        ``datapackage.json`` to keep in memory
+    :param bool verify: Verify the hash and size of each resource while
+        it is read (see ``DataPackage.get_data``)
+    """
+
+    def __init__(self, fileobj, buffer_size=DEFAULT_BUFFER_SIZE,
+                 verify=False, datapackage_class=DataPackage):
+        self.fileobj = fileobj
+        self.buffer_size = buffer_size
+        self.verify = verify
+        self.datapackage_class = datapackage_class
+        self.datapackage = None
+        # Resources by the name of their member in the stream
+        self._members = {}
+
+    def _load(self, fh, directory):
+        """Load the data package from its descriptor"""
+        descriptor = json.loads(fh.read().decode('utf-8'))
+        self.datapackage = self.datapackage_class(**descriptor)
+        for resource in self.datapackage.resources:
+            if resource.get('path'):
+                name = _member_name(posixpath.join(directory,
+                                                   resource['path']))
+                self._members[name] = resource
+
+    def _buffer(self, fh, available):
+        """Copy a member to a temporary file which is kept in memory if the
+        member is at most available bytes. Returns the file and the number
+        of bytes of memory it takes up.
+
+        """
+        import tempfile
+        if available > 0:
+            buffer = tempfile.SpooledTemporaryFile(max_size=available)
+        else:
+            # max_size=0 would keep everything in memory
+            buffer = tempfile.TemporaryFile()
+        shutil.copyfileobj(fh, buffer)
+        size = buffer.tell()
+        buffer.seek(0)
+        return (buffer, size if size <= available else 0)
+
+    def _rows(self, resource, fh):
+        return self.datapackage.get_data(resource, verify=self.verify,
+                                         fileobj=fh)
+
+    def __iter__(self):
+        import tarfile
+        stream = tarfile.open(fileobj=self.fileobj, mode='r|*')
+        buffered = []
+        in_memory = 0
+        try:
+            for member in stream:
+                if not member.isfile():
+                    continue
+                name = _member_name(member.name)
+                fh = stream.extractfile(member)
+                if self.datapackage is None:
+                    if posixpath.basename(name) == 'datapackage.json':
+                        self._load(fh, posixpath.dirname(name))
+                        for buffered_name, buffer in buffered:
+                            with buffer:
+                                resource = self._members.get(buffered_name)
+                                if resource is not None:
+                                    yield (resource,
+                                           self._rows(resource, buffer))
+                        buffered = []
+                    else:
+                        buffer, size = self._buffer(
+                            fh, self.buffer_size - in_memory)
+                        buffered.append((name, buffer))
+                        in_memory += size
+                    continue
+                resource = self._members.get(name)
+                if resource is not None:
+                    yield (resource, self._rows(resource, fh))
+        finally:
+            for buffered_name, buffer in buffered:
+                buffer.close()
+            stream.close()
+        if self.datapackage is None:
+            raise ValueError("no datapackage.json in the tar stream")
@@ -9,11 +9,51 @@ import os
 import io
 import json
 import re
+import itertools
+import operator
 from collections import namedtuple
 from . import compat
 
 
-class Specification(dict):
+class SpecificationMeta(type):
+    """
+    Metaclass for Specification which compiles the lookup tables used for
+    attribute access once, when the class is created, instead of working
+    them out on every attribute get and set.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super(SpecificationMeta, cls).__init__(name, bases, namespace)
+        cls._compile()
+
+    def __setattr__(cls, attribute, value):
+        super(SpecificationMeta, cls).__setattr__(attribute, value)
+        # Class attributes (or the specification) can be changed after
+        # the class has been created so we need to recompile the tables
+        # for the class and all of its subclasses
+        if not attribute.startswith('_COMPILED_'):
+            cls._compile()
+            subclasses = cls.__subclasses__()
+            while subclasses:
+                subclass = subclasses.pop()
+                subclass._compile()
+                subclasses.extend(subclass.__subclasses__())
+
+    def _compile(cls):
+        # Names which are real attributes of the class (e.g. properties
+        # or methods) and should not be handled as specification keys
+        cls._COMPILED_ATTRIBUTES = frozenset(dir(cls))
+        # Allowed keys mapped to a tuple of their types (or None if the
+        # type should not be validated)
+        spec_types = {}
+        for (key, spec_type) in getattr(cls, 'SPECIFICATION', {}).items():
+            if spec_type is not None and type(spec_type) is not tuple:
+                spec_type = (spec_type,)
+            spec_types[key] = spec_type
+        cls._COMPILED_TYPES = spec_types
+
+
+class Specification(compat.with_metaclass(SpecificationMeta, dict)):
 
     # Allowed keys in the specification object and their types.
     # These are the currently allowed data package keys
@@ -23,6 +63,10 @@ class Specification(dict):
     REQUIRED = ()
     EXTENDABLE = False
     SERIALIZE_EXCLUDES = ()
+    # Keys which hold an array of objects of a Specification class. This
+    # is only used when building objects from trusted descriptors since
+    # the property setters take care of it otherwise.
+    OBJECT_ARRAYS = {}
 
     def __init__(self, *args, **kwargs):
         """
@@ -41,6 +85,54 @@ class Specification(dict):
         for (key, value) in kwargs.items():
             self.__setattr__(key, value)
 
+    @classmethod
+    def from_trusted(cls, descriptor):
+        """
+        Create a new object from a trusted descriptor (e.g. one that has
+        been created and validated before) without validating it or
+        filling in any values (like property setters would). Arrays of
+        objects in the descriptor are turned into their Specification
+        objects in the same way. Use ``validate`` to run the checks later.
+
+        :param dict descriptor: Descriptor to build the object from
+        """
+        instance = cls.__new__(cls)
+        dict.update(instance, descriptor)
+        for (key, object_class) in cls.OBJECT_ARRAYS.items():
+            array = dict.get(instance, key)
+            if array:
+                dict.__setitem__(instance, key, [
+                    object_class.from_trusted(value)
+                    if type(value) is dict else value
+                    for value in array])
+        return instance
+
+    def validate(self):
+        """
+        Run all of the checks which are done when values are set on the
+        object (and on nested objects) in one pass. Raises the same errors
+        as setting an invalid value would.
+        """
+        missing_fields = self.ensure_required(self)
+        if missing_fields:
+            raise ValueError('Required fields for {0} missing: {1}'.format(
+                self.__class__.__name__,
+                ' AND '.join(missing_fields)))
+
+        # Values are set on a scratch copy of the object since property
+        # setters can both depend on and change other values
+        scratch = self.__class__.__new__(self.__class__)
+        dict.update(scratch, self)
+        for (key, value) in dict.items(self):
+            if isinstance(value, Specification):
+                value.validate()
+            elif isinstance(value, list):
+                for single_value in value:
+                    if isinstance(single_value, Specification):
+                        single_value.validate()
+            if key not in self.SERIALIZE_EXCLUDES:
+                scratch.__setattr__(key, value)
+
     def as_dict(self):
         """Output a dict of the specification."""
 
@@ -56,17 +148,43 @@ class Specification(dict):
                     k not in self.SERIALIZE_EXCLUDES)
 
     def as_json(self):
-        """Output a JSON object of the specification."""
+        """Output a JSON object of the specification. Use dump to write
+        large specifications to a file without building the string."""
         return json.dumps(self.as_dict(), ensure_ascii=False, indent=4)
 
+    def dump(self, fp, indent=4, separators=None, chunk_size=65536):
+        """
+        Write the specification as JSON to a file-like object (e.g. a file
+        or a socket file) without building a copy of it with as_dict first.
+        The output is the same as ``as_json`` (with the default arguments).
+
+        :param fp: File-like object with a write method (text)
+        :param indent: Indentation (like for json.dumps). Use None for
+            compact output on a single line.
+        :param tuple separators: Optional (item_separator, key_separator)
+            tuple, e.g. (',', ':') for the most compact output.
+        :param int chunk_size: Approximate size of each write to fp.
+        """
+        chunks = []
+        size = 0
+        for chunk in iter_json(self, indent=indent, separators=separators):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= chunk_size:
+                fp.write(''.join(chunks))
+                chunks = []
+                size = 0
+        if chunks:
+            fp.write(''.join(chunks))
+
     def __getattr__(self, attribute):
         # If the attribute has been defined as a real attribute
         # e.g. as a property, we use the object getter instead of
         # our own
-        if hasattr(self.__class__, attribute):
+        if attribute in self._COMPILED_ATTRIBUTES:
             return object.__getattribute__(self, attribute)
 
-        if attribute in self.SPECIFICATION.keys():
+        if attribute in self._COMPILED_TYPES:
             return dict.get(self, attribute, None)
         else:
             raise AttributeError("'{0}' object has no attribute '{1}'".format(
@@ -76,7 +194,7 @@ class Specification(dict):
         # If the attribute has been defined as a real attribute
         # e.g. as a property with its own setter, we use the object
         # setter instead of our custom one
-        if hasattr(self.__class__, attribute):
+        if attribute in self._COMPILED_ATTRIBUTES:
             object.__setattr__(self, attribute, value)
             return
 
@@ -88,19 +206,15 @@ class Specification(dict):
                 dict.__delitem__(self, attribute)
             return
         # Attribute must exist in the specification keys
-        if attribute in self.SPECIFICATION.keys():
-            spec_type = self.SPECIFICATION[attribute]
+        spec_types = self._COMPILED_TYPES
+        if attribute in spec_types:
+            spec_type = spec_types[attribute]
             # If spec_type is None we don't do any validation of type
-            if spec_type is not None:
-                # To accommodate for multiple types we cast non-tuples into
-                # a tuple to make later processing easier
-                if type(spec_type) != tuple:
-                    spec_type = (spec_type,)
-                if not isinstance(value, spec_type):
-                    raise TypeError(
-                        "Attribute '{0}' ({1}) should be {2}".format(
-                            attribute, type(value),
-                            ' or '.join([compat.str(s) for s in spec_type])))
+            if spec_type is not None and not isinstance(value, spec_type):
+                raise TypeError(
+                    "Attribute '{0}' ({1}) should be {2}".format(
+                        attribute, type(value),
+                        ' or '.join([compat.str(s) for s in spec_type])))
         elif not self.EXTENDABLE:
             raise AttributeError(
                 "Attribute '{0}' is not allowed in a '{1}' object".format(
@@ -166,6 +280,169 @@ class Specification(dict):
 
         return missing_fields
 
+
+class LazyList(list):
+    """
+    List which holds raw dicts and only turns them into objects (using
+    the provided factory) when they are accessed. Items which are
+    accessed are replaced by the object so they are only built once.
+    """
+
+    def __init__(self, iterable, factory):
+        super(LazyList, self).__init__(iterable)
+        self._factory = factory
+
+    def _build(self, index):
+        value = list.__getitem__(self, index)
+        if type(value) is dict:
+            value = self._factory(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(i) for i in range(*index.indices(len(self)))]
+        return self._build(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._build(index)
+
+    def __reversed__(self):
+        for index in reversed(range(len(self))):
+            yield self._build(index)
+
+    def pop(self, index=-1):
+        value = self._build(index)
+        list.pop(self, index)
+        return value
+
+    def raw(self):
+        """
+        Iterate over the items without building them, i.e. items which
+        have not been accessed are returned as the raw dicts.
+        """
+        return list.__iter__(self)
+
+    def built(self):
+        """Number of items which have been turned into objects"""
+        return sum(1 for value in self.raw() if type(value) is not dict)
+
+
+# Encoder for the values (strings, numbers, etc.) in iter_json
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def iter_json(value, indent=None, separators=None):
+    """
+    Generator which encodes a value (usually a Specification object) as
+    JSON piece by piece. Specification objects are encoded like the output
+    of their as_dict method (without creating it) so the joined output is
+    the same as json.dumps(value.as_dict(), ensure_ascii=False, ...) with
+    the same indent and separators.
+
+    :param value: Value to encode
+    :param indent: Indentation (like for json.dumps)
+    :param tuple separators: Optional (item_separator, key_separator)
+    """
+    if separators is not None:
+        item_separator, key_separator = separators
+    else:
+        # The defaults depend on the indent and on the Python version
+        # (Python 2 keeps ', ' even when indenting)
+        defaults = json.JSONEncoder(indent=indent)
+        item_separator = defaults.item_separator
+        key_separator = defaults.key_separator
+    if indent is not None and not isinstance(indent, compat.basestring):
+        indent = ' ' * indent
+    # Ids of the containers being encoded (to detect circular references)
+    markers = set()
+
+    def encode_key(key):
+        if isinstance(key, compat.basestring):
+            if isinstance(key, compat.bytes):
+                # Byte strings (native strings on Python 2) are decoded
+                # like json does
+                key = key.decode('utf-8')
+            return _json_encoder.encode(key)
+        elif key is True:
+            return '"true"'
+        elif key is False:
+            return '"false"'
+        elif key is None:
+            return '"null"'
+        elif isinstance(key, compat.numeric_types):
+            return _json_encoder.encode(_json_encoder.encode(key))
+        raise TypeError('keys must be str, int, float, bool or None, '
+                        'not {0}'.format(type(key).__name__))
+
+    def encode_items(items, level, opening, closing, encode_item):
+        if not items:
+            yield opening + closing
+            return
+        yield opening
+        if indent is not None:
+            level += 1
+            newline_indent = '\n' + indent * level
+            separator = item_separator + newline_indent
+            yield newline_indent
+        else:
+            separator = item_separator
+        for index, item in enumerate(items):
+            if index:
+                yield separator
+            for chunk in encode_item(item, level):
+                yield chunk
+        if indent is not None:
+            yield '\n' + indent * (level - 1)
+        yield closing
+
+    def encode(value, level, specification):
+        if not isinstance(value, (dict, list, tuple)):
+            yield _json_encoder.encode(value)
+            return
+
+        marker = id(value)
+        if marker in markers:
+            raise ValueError('Circular reference detected')
+        markers.add(marker)
+
+        if isinstance(value, dict):
+            # Specification objects are only encoded like as_dict when
+            # they are reached through Specification objects and lists
+            # (like as_dict does), otherwise they're just dicts
+            if specification and isinstance(value, Specification):
+                excludes = value.SERIALIZE_EXCLUDES
+                items = [(k, v) for (k, v) in value.items()
+                         if k not in excludes]
+                if compat.is_py2:
+                    # The new dict built by as_dict can iterate in another
+                    # order than the specification on Python 2
+                    items = list(dict(items).items())
+            else:
+                items = list(value.items())
+                specification = False
+
+            def encode_item(item, level):
+                yield encode_key(item[0])
+                yield key_separator
+                for chunk in encode(item[1], level, specification):
+                    yield chunk
+
+            chunks = encode_items(items, level, '{', '}', encode_item)
+        else:
+            def encode_item(item, level):
+                return encode(item, level, specification)
+
+            chunks = encode_items(value, level, '[', ']', encode_item)
+
+        for chunk in chunks:
+            yield chunk
+        markers.discard(marker)
+
+    return encode(value, 0, True)
+
+
 # This is a named tuple for representing semantic versions (see
 # http://semver.org/). Semantic versions look like this:
 #
@@ -285,13 +562,13 @@ def load_licenses():
 
 def is_local(path):
     """Checks whether a path is a local path, or a remote URL. This simple
-    check just looks if there is a scheme or netloc associated with
-    the path (and will therefore return False when the path uses the
-    file: scheme)
+    check just looks if there is a scheme and netloc associated with
+    the path. file: URLs are local (see location.resolve).
 
     """
-    parsed_results = compat.parse.urlparse(path)
-    return parsed_results.scheme == '' or parsed_results.netloc == ''
+    # location imports util (through storage)
+    from .location import resolve
+    return resolve(path).is_local
 
 
 def is_url(path):
@@ -320,8 +597,152 @@ def is_mimetype(val):
     return bool(re.match(r"[^/]+/[^/]+", val))
 
 
-def get_size_from_url(url):
-    site = compat.urlopen(url)
+# Types which can be encoded as JSON values (and as JSON object keys)
+_json_scalar_types = (compat.str, compat.builtin_str, bool,
+                      type(None)) + compat.numeric_types
+_json_scalar_type_set = frozenset(_json_scalar_types)
+
+
+def _split_repeated(dicts, sequences, seen):
+    """Split the containers on a nesting level into the dicts and
+    sequences which haven't been reached before (adding their ids to seen)
+    and a list of the distinct ones which have.
+
+    """
+    repeated = {}
+    fresh = ([], [])
+    for containers, unique in zip((dicts, sequences), fresh):
+        for container in containers:
+            marker = id(container)
+            if marker in seen:
+                repeated[marker] = container
+            else:
+                seen.add(marker)
+                unique.append(container)
+    return fresh + (list(repeated.values()),)
+
+
+def check_serializable(val):
+    """Checks that a value can be serialized as JSON (by json.dumps)
+    without building the JSON string. Raises a TypeError for values that
+    can't be serialized and a ValueError for circular references (just
+    like json.dumps).
+
+    The value is walked one nesting level at a time so the types of all
+    values on a level (e.g. all cells in inline tabular data) are checked
+    in a single pass. Containers reached more than once (shared ones) are
+    only walked once.
+
+    """
+    chain = itertools.chain.from_iterable
+    is_scalar_type = _json_scalar_type_set.__contains__
+    # Containers on the current nesting level and the ids of all of the
+    # containers we have looked into
+    level = [val]
+    seen = set()
+    while level:
+        dicts = []
+        sequences = []
+        for value in level:
+            if isinstance(value, dict):
+                dicts.append(value)
+            elif isinstance(value, (list, tuple)):
+                sequences.append(value)
+            elif not isinstance(value, _json_scalar_types):
+                raise TypeError(
+                    'Object of type {0} is not JSON serializable'.format(
+                        type(value).__name__))
+
+        ids = set(map(id, dicts))
+        ids.update(map(id, sequences))
+        if len(ids) == len(dicts) + len(sequences) and \
+                seen.isdisjoint(ids):
+            seen.update(ids)
+        else:
+            # Some containers have been reached before: they are either
+            # shared or part of a circular reference
+            dicts, sequences, repeated = _split_repeated(
+                dicts, sequences, seen)
+            for container in repeated:
+                # A container which is part of a circular reference
+                # contains itself, which makes json.dumps raise a
+                # ValueError. Shared ones are only checked once.
+                json.dumps(container)
+
+        key_types = set(map(type, chain(dicts)))
+        if not key_types <= _json_scalar_type_set:
+            for key_type in key_types:
+                if not issubclass(key_type, _json_scalar_types):
+                    raise TypeError(
+                        'keys must be str, int, float, bool or None, '
+                        'not {0}'.format(key_type.__name__))
+
+        def children():
+            return itertools.chain(chain(map(dict.values, dicts)),
+                                   chain(sequences))
+
+        if _json_scalar_type_set.issuperset(map(type, children())):
+            return
+        # Only values which aren't plain scalars go on to the next level
+        level = list(itertools.compress(
+            children(), map(operator.not_,
+                            map(is_scalar_type, map(type, children())))))
+
+
+def _header(site, name):
+    """Get a response header of an opened url (None if missing)"""
     meta = site.info()
-    size = int(meta.getheaders("Content-Length")[0])
-    return size
+    if hasattr(meta, 'getheaders'):
+        # Python 2 (mimetools.Message)
+        return (meta.getheaders(name) or [None])[0]
+    return meta.get(name)
+
+
+def _content_length(site):
+    """Get the Content-Length header of an opened url (None if missing)"""
+    size = _header(site, "Content-Length")
+    if size is None:
+        return None
+    return int(size)
+
+
+def head_request(url):
+    """Create a HEAD request for a url (the Python 2 Request class has no
+    method argument so get_method is overridden instead)
+
+    """
+    request = compat.Request(url)
+    request.get_method = lambda: 'HEAD'
+    return request
+
+
+def get_size_from_url(url, count=None):
+    """Get the size of the file at the url from its Content-Length header.
+    The url is probed with a HEAD request first and only requested with
+    GET if the server doesn't allow HEAD or leaves the header out of the
+    response. Returns None if the server doesn't send the header, unless
+    count is given: it is then called with the response of the GET request
+    (to read and count the body) and its return value is returned.
+
+    """
+    try:
+        site = compat.urlopen(head_request(url))
+    except compat.HTTPError:
+        # e.g. 405 Method Not Allowed
+        pass
+    else:
+        try:
+            size = _content_length(site)
+        finally:
+            site.close()
+        if size is not None:
+            return size
+
+    site = compat.urlopen(url)
+    try:
+        size = _content_length(site)
+        if size is None and count is not None:
+            size = count(site)
+        return size
+    finally:
+        site.close()
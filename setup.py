@@ -29,6 +29,7 @@ setup(
     packages = ['datapackage'],
     package_dir={'datapackage': 'datapackage'},
     package_data={'datapackage': ['data/*.json']},
+    extras_require={'pandas': ['pandas']},
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import json
+import shutil
+import zipfile
+import tempfile
+import datapackage
+from datapackage.cache import DataPackageCache, ReadOnlyView
+from nose.tools import raises
+from datapackage import compat
+
+if compat.is_py2 or compat.is_py32:
+    import mock as mocklib
+else:
+    from unittest import mock as mocklib
+
+
+class TestCache(object):
+
+    def setup(self):
+        self.cache = DataPackageCache(maxsize=2)
+        # Paths of data packages are text (not bytes on Python 2)
+        self.tmpdir = compat.str(tempfile.mkdtemp())
+        shutil.copy('tests/test.dpkg/datapackage.json', self.tmpdir)
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_returns_view(self):
+        """Check that the cache hands out read-only views"""
+        dpkg = self.cache.get('tests/test.dpkg')
+        assert isinstance(dpkg, ReadOnlyView)
+        assert dpkg.name == 'test.dpkg'
+        assert dpkg['resources'][0]['name'] == 'foobar'
+        assert dpkg.resources[0].schema['fields'][0]['name'] == 'foo'
+
+    def test_method_results_are_views(self):
+        """Check that objects returned by methods can't be modified"""
+        dpkg = self.cache.get('tests/test.dpkg')
+        resource = dpkg.get_resource('foobar')
+        assert isinstance(resource, ReadOnlyView)
+        assert resource.name == 'foobar'
+        for change in (lambda: resource.__setitem__('name', 'x'),
+                       lambda: setattr(resource, 'data', [])):
+            try:
+                change()
+            except TypeError:
+                pass
+            else:
+                assert False, "the resource was modified"
+        assert isinstance(dpkg.get_resources()['foobar']['fields'], tuple)
+        assert self.cache.get('tests/test.dpkg').resources[0].name == \
+            'foobar'
+
+    def test_get_is_cached(self):
+        """Check that a package is only loaded once"""
+        factory = mocklib.Mock(side_effect=datapackage.DataPackage)
+        cache = DataPackageCache(factory=factory)
+        first = cache.get('tests/test.dpkg')
+        second = cache.get('tests/test.dpkg')
+        assert factory.call_count == 1
+        assert first == second
+
+    def test_local_package_revalidated(self):
+        """Check that a changed datapackage.json is reloaded"""
+        assert self.cache.get(self.tmpdir).title == \
+            'A simple datapackage for testing'
+
+        filename = os.path.join(self.tmpdir, 'datapackage.json')
+        with io.open(filename, 'r', encoding='utf-8') as fh:
+            descriptor = json.load(fh)
+        descriptor['title'] = 'A changed title for the datapackage'
+        with io.open(filename, 'w', encoding='utf-8') as fh:
+            fh.write(compat.str(json.dumps(descriptor)))
+
+        assert self.cache.get(self.tmpdir).title == \
+            'A changed title for the datapackage'
+
+    def test_zip_package(self):
+        """Check that zipped packages are cached on the package in them"""
+        archive = os.path.join(self.tmpdir, 'package.zip')
+        with zipfile.ZipFile(archive, 'w') as zipped:
+            zipped.write(os.path.join(self.tmpdir, 'datapackage.json'),
+                         'datapackage.json')
+        factory = mocklib.Mock(side_effect=datapackage.DataPackage)
+        cache = DataPackageCache(factory=factory)
+        assert cache.get(archive).name == 'test.dpkg'
+        assert cache.get(archive).name == 'test.dpkg'
+        assert factory.call_count == 1
+        assert archive in cache
+
+    @mocklib.patch('datapackage.cache.time.time')
+    def test_remote_package_ttl(self, mock_time):
+        """Check that remote packages expire after the ttl"""
+        factory = mocklib.Mock(return_value=datapackage.DataPackage(
+            'tests/test.dpkg'))
+        cache = DataPackageCache(ttl=60, factory=factory)
+        mock_time.return_value = 1000
+        cache.get('http://example.com/dpkg/')
+        mock_time.return_value = 1059
+        cache.get('http://example.com/dpkg/')
+        assert factory.call_count == 1
+        mock_time.return_value = 1061
+        cache.get('http://example.com/dpkg/')
+        assert factory.call_count == 2
+
+    def test_cache_is_bounded(self):
+        """Check that the least recently used package is evicted"""
+        self.cache.get('tests/test.dpkg')
+        self.cache.get('tests/test.dpkg_local')
+        self.cache.get('tests/test.dpkg')
+        self.cache.get(self.tmpdir)
+        assert len(self.cache) == 2
+        assert 'tests/test.dpkg' in self.cache
+        assert 'tests/test.dpkg_local' not in self.cache
+
+    def test_invalidate(self):
+        """Check that packages can be removed from the cache"""
+        self.cache.get('tests/test.dpkg')
+        self.cache.invalidate('tests/test.dpkg')
+        assert 'tests/test.dpkg' not in self.cache
+
+    @raises(TypeError)
+    def test_view_set_attribute(self):
+        """Check that attributes can't be set through the view"""
+        self.cache.get('tests/test.dpkg').name = 'foo'
+
+    @raises(TypeError)
+    def test_view_set_nested_item(self):
+        """Check that nested objects can't be modified through the view"""
+        self.cache.get('tests/test.dpkg').resources[0]['name'] = 'foo'
+
+    @raises(AttributeError)
+    def test_view_mutating_method(self):
+        """Check that mutating methods are not available on the view"""
+        self.cache.get('tests/test.dpkg').add_source('foo')
+
+    def test_view_as_dict_is_private(self):
+        """Check that the dict output doesn't share state with the cache"""
+        dpkg = self.cache.get('tests/test.dpkg')
+        as_dict = dpkg.as_dict()
+        as_dict['resources'][0]['schema']['fields'] = []
+        assert len(dpkg.resources[0].schema['fields']) == 2
+
+    def test_view_get_data(self):
+        """Check that data can be read through the view"""
+        dpkg = self.cache.get('tests/test.dpkg_local')
+        rows = list(dpkg.data)
+        assert rows[0]['name'] == 'Afghanistan'
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datapackage
+from datapackage.compact import compact, compact_class, CompactSpecification
+from datapackage.persons import Person
+from nose.tools import raises
+
+
+class TestCompact(object):
+
+    def setup(self):
+        self.dpkg = datapackage.DataPackage("tests/test.dpkg")
+        self.dpkg['x-extension'] = {'foo': 'bar'}
+        self.compact = compact(self.dpkg)
+
+    def teardown(self):
+        pass
+
+    def test_serializes_identically(self):
+        """Check that compact objects serialize like the originals"""
+        assert self.compact.as_dict() == self.dpkg.as_dict()
+        assert self.compact.as_json() == self.dpkg.as_json()
+
+    def test_nested_objects_compacted(self):
+        """Check that nested Specification objects are compacted"""
+        resource = self.compact.resources[0]
+        assert isinstance(resource, CompactSpecification)
+        assert isinstance(resource.sources[0], CompactSpecification)
+        assert resource.name == 'foobar'
+        assert resource['path'] == 'foobar.json'
+
+    def test_extension_keys(self):
+        """Check that extension keys are kept in the overflow dict"""
+        assert self.compact['x-extension'] == {'foo': 'bar'}
+        assert 'x-extension' in self.compact
+
+    def test_missing_key(self):
+        """Check that missing specification keys behave like before"""
+        person = compact(Person(name='Bruce Wayne'))
+        assert person.get('email') is None
+        assert 'email' not in person
+
+    @raises(KeyError)
+    def test_missing_key_property(self):
+        """Check that properties which require their key still do"""
+        compact(Person(name='Bruce Wayne')).email
+
+    def test_property_defaults(self):
+        """Check that missing keys get the defaults of the properties"""
+        resource = datapackage.Resource(data={'foo': 'bar'})
+        compacted = compact(resource)
+        for attribute in ('encoding', 'name', 'format', 'mediatype',
+                          'schema', 'url'):
+            assert getattr(compacted, attribute) == \
+                getattr(resource, attribute)
+        assert compacted.encoding == 'utf-8'
+        dpkg = datapackage.DataPackage(name='foo')
+        assert compact(dpkg).datapackage_version == dpkg.datapackage_version
+        assert compact(dpkg).publisher is None
+
+    @raises(AttributeError)
+    def test_unknown_attribute(self):
+        """Check that unknown attributes raise an error"""
+        compact(Person(name='Bruce Wayne')).batman
+
+    @raises(TypeError)
+    def test_read_only(self):
+        """Check that compact objects can't be modified"""
+        self.compact.name = 'foo'
+
+    def test_no_instance_dict(self):
+        """Check that compact objects don't carry a per-instance dict"""
+        assert not hasattr(self.compact.resources[0], '__dict__')
+        assert compact_class(datapackage.Resource) is \
+            type(self.compact.resources[0])
+
+    def test_shared_key_order(self):
+        """Check that objects with the same keys share the key order"""
+        first = compact(Person(name='Bruce Wayne', email='bruce@wayne.com'))
+        second = compact(Person(name='Alfred', email='alfred@wayne.com'))
+        assert first._keys is second._keys
+
+    def test_expand(self):
+        """Check that compact objects can be expanded again"""
+        expanded = self.compact.expand()
+        assert isinstance(expanded, datapackage.DataPackage)
+        assert isinstance(expanded.resources[0], datapackage.Resource)
+        assert expanded.as_dict() == self.dpkg.as_dict()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import datapackage
+from nose.tools import raises
+from nose.plugins.skip import SkipTest
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+class TestDataFrame(object):
+
+    def setup(self):
+        if pandas is None:
+            raise SkipTest("pandas is not installed")
+        self.dpkg = datapackage.DataPackage('tests/test.dpkg_local')
+        self.resource = self.dpkg.resources[0]
+        self.rows = list(self.dpkg.get_data(self.resource))
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_to_dataframe(self):
+        """Check that the columns get dtypes from the schema"""
+        frame = self.dpkg.to_dataframe(self.resource)
+        names = [field['name'] for field in self.resource.schema['fields']]
+        assert list(frame.columns) == names
+        assert len(frame) == len(self.rows)
+        assert str(frame['ISO3166-1-numeric'].dtype) == 'Int64'
+        assert str(frame['is_independent'].dtype) == 'category'
+        assert str(frame['name'].dtype) == 'object'
+        assert frame['name'].tolist() == [row['name'] for row in self.rows]
+
+    def test_fields(self):
+        """Check that only the given fields are read"""
+        frame = self.dpkg.to_dataframe(self.resource,
+                                       fields=['name', 'GAUL'])
+        assert list(frame.columns) == ['name', 'GAUL']
+        gaul = [row['GAUL'] for row in self.rows]
+        assert [None if pandas.isna(value) else value
+                for value in frame['GAUL']] == gaul
+
+    def test_chunksize(self):
+        """Check that DataFrames of chunksize rows can be iterated over"""
+        frames = list(self.dpkg.to_dataframe(self.resource, chunksize=100,
+                                             fields=['name']))
+        assert [len(frame) for frame in frames] == \
+            [100, 100, len(self.rows) - 200]
+        assert frames[1].index[0] == 100
+        frame = pandas.concat(frames)
+        assert frame['name'].tolist() == [row['name'] for row in self.rows]
+
+    def test_dates_and_numbers(self):
+        """Check the dtypes of date and number fields"""
+        path = os.path.join(self.tmpdir, 'dates.csv')
+        with io.open(path, 'wb') as fh:
+            fh.write(b'day,value,count\n2015-01-02,1.5,3\n,,\n')
+        resource = datapackage.Resource(path=path, schema={
+            'fields': [{'name': 'day', 'type': 'date'},
+                       {'name': 'value', 'type': 'number'},
+                       {'name': 'count', 'type': 'integer'}]})
+        frame = self.dpkg.to_dataframe(resource)
+        assert str(frame['day'].dtype).startswith('datetime64')
+        assert frame['day'][0] == pandas.Timestamp('2015-01-02')
+        assert pandas.isna(frame['day'][1])
+        assert str(frame['value'].dtype) == 'float64'
+        assert pandas.isna(frame['value'][1])
+        assert frame['count'].tolist()[0] == 3
+        assert pandas.isna(frame['count'][1])
+
+    @raises(ValueError)
+    def test_unknown_field(self):
+        """Check that unknown fields are an error"""
+        self.dpkg.to_dataframe(self.resource, fields=['nonexistent'])
@@ -5,7 +5,12 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import io
+import json
+import time
+import threading
 import datapackage
+import datapackage.schema
+import datapackage.sources
 from nose.tools import raises
 import unittest
 from datapackage import compat
@@ -222,6 +227,111 @@ class TestDatapackage(object):
         assert self.dpkg.title == "Annual Consumer Price Index (CPI)"
         assert self.dpkg.description == "Annual Consumer Price Index (CPI) for most countries in the world. Reference year is 2005."
 
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_get_data_local_copy(self, mock_urlopen):
+        """Check that the local copy of a url resource is read if present"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_url")
+        resource = dpkg.resources[0]
+        resource.local_copy = "tests/test.dpkg_local/country-codes.csv"
+        rows = list(dpkg.get_data(resource))
+        assert rows[0]['name'] == 'Afghanistan'
+        assert not mock_urlopen.called
+
+    def test_get_data_verify(self):
+        """Check that data can be verified while it is read"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        resource = dpkg.resources[0]
+        resource.update_bytes()
+        resource.update_hash(algorithm='sha1')
+        with mocklib.patch.object(resource, 'update_hash') as mock_hash:
+            rows = list(dpkg.get_data(resource, verify=True))
+            assert not mock_hash.called
+        assert rows == list(dpkg.get_data(resource))
+
+    @raises(RuntimeError)
+    def test_get_data_verify_changed(self):
+        """Check that a mismatch is raised once all rows are read"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        resource = dpkg.resources[0]
+        resource['hash'] = 'sha256:' + '0' * 64
+        rows = dpkg.get_data(resource, verify=True)
+        assert next(rows)['name'] == 'Afghanistan'
+        list(rows)
+
+    @raises(ValueError)
+    def test_get_data_verify_nothing(self):
+        """Check that verifying needs a hash or size"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        list(dpkg.get_data(dpkg.resources[0], verify=True))
+
+    def test_iter_chunks_rows(self):
+        """Check that chunks have a fixed number of rows"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        resource = dpkg.resources[0]
+        rows = list(dpkg.get_data(resource))
+        chunks = list(dpkg.iter_chunks(resource, rows=100))
+        assert [len(chunk) for chunk in chunks] == [100, 100, len(rows) - 200]
+        assert [row for chunk in chunks for row in chunk] == rows
+
+    def test_iter_chunks_bytes(self):
+        """Check that chunks are sized from the width of the rows"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        resource = dpkg.resources[0]
+        rows = list(dpkg.get_data(resource))
+        chunks = list(dpkg.iter_chunks(resource, bytes=5000))
+        # The rows are a bit over 100 characters wide on average
+        assert 2 < len(chunks) < 10
+        assert [row for chunk in chunks for row in chunk] == rows
+        chunks = list(dpkg.iter_chunks(resource))
+        assert len(chunks) == 1
+
+    def test_iter_chunks_budget(self):
+        """Check that no chunk is estimated to be larger than the budget
+        (give or take a row), including the first chunk
+
+        """
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        resource = dpkg.resources[0]
+        with io.open('tests/test.dpkg_local/' + resource.path,
+                     encoding='utf-8') as fh:
+            lines = list(compat.csv_reader(fh))[1:]
+        # Average width of the rows measured like iter_chunks does
+        width = (len(lines) + sum(len(value) for line in lines
+                                  for value in line)) / len(lines)
+        for budget in (50, 200, 1000, 5000):
+            chunks = list(dpkg.iter_chunks(resource, bytes=budget))
+            assert sum(map(len, chunks)) == len(lines)
+            for chunk in chunks:
+                assert len(chunk) * width <= max(budget, width) + width
+
+    def test_iter_chunks_tuples(self):
+        """Check that rows can be yielded as tuples in field order"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        resource = dpkg.resources[0]
+        names = [field['name'] for field in resource.schema['fields']]
+        row = next(dpkg.iter_chunks(resource, as_tuples=True))[0]
+        assert dict(zip(names, row)) == next(dpkg.get_data(resource))
+
+    def test_iter_chunks_verify(self):
+        """Check that chunked data can be verified"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        resource = dpkg.resources[0]
+        resource['bytes'] = 1
+        chunks = dpkg.iter_chunks(resource, rows=10, verify=True)
+        assert len(next(chunks)) == 10
+        try:
+            list(chunks)
+        except RuntimeError:
+            pass
+        else:
+            assert False, "the size mismatch wasn't raised"
+
+    @raises(ValueError)
+    def test_iter_chunks_size(self):
+        """Check that chunks are sized either by rows or bytes"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local")
+        next(dpkg.iter_chunks(dpkg.resources[0], rows=10, bytes=1000))
+
     def test_bump_major_version(self):
         """Tests bumping the major version of the datapackage"""
         self.dpkg.version = "1.0.0"
@@ -322,6 +432,45 @@ class TestDatapackage(object):
     def test_as_json(self):
         assert self.dpkg.as_json()
 
+    def test_dump_matches_as_json(self):
+        """Check that the streamed JSON matches the as_json output"""
+        self.dpkg['x-extension'] = {1: [1.5, None, True], 'foo': {}}
+        fh = io.StringIO()
+        self.dpkg.dump(fh)
+        assert fh.getvalue() == self.dpkg.as_json()
+
+    def test_dump_native_keys(self):
+        """Check that packages loaded from a path can be dumped when their
+        keys are native strings (bytes on Python 2)
+
+        """
+        dpkg = datapackage.DataPackage('tests/test.dpkg_local')
+        dpkg[compat.builtin_str('x-native')] = 'value'
+        fh = io.StringIO()
+        dpkg.dump(fh)
+        assert fh.getvalue() == dpkg.as_json()
+
+    def test_dump(self):
+        """Check that the data package can be written to a file"""
+        fh = io.StringIO()
+        self.dpkg.dump(fh, chunk_size=16)
+        assert fh.getvalue() == self.dpkg.as_json()
+
+    def test_dump_compact(self):
+        """Check that the data package can be dumped in compact form"""
+        fh = io.StringIO()
+        self.dpkg.dump(fh, indent=None, separators=(',', ':'))
+        expected = json.dumps(self.dpkg.as_dict(), ensure_ascii=False,
+                              separators=(',', ':'))
+        assert fh.getvalue() == expected
+
+    @raises(ValueError)
+    def test_dump_circular_reference(self):
+        """Check that circular references are detected"""
+        self.dpkg['x-extension'] = []
+        self.dpkg['x-extension'].append(self.dpkg['x-extension'])
+        self.dpkg.dump(io.StringIO())
+
     def test_as_dict_exclude(self):
         self.dpkg.SERIALIZE_EXCLUDES = ('name',)
         as_dict = self.dpkg.as_dict()
@@ -331,3 +480,222 @@ class TestDatapackage(object):
         as_dict = self.dpkg.as_dict()
         resource = as_dict['resources'][0]
         assert 'is_local' not in list(resource.keys())
+
+    def test_get_resource(self):
+        """Check that resources can be looked up by name"""
+        resource = self.dpkg.get_resource('foobar')
+        assert isinstance(resource, datapackage.Resource)
+        assert resource.path == 'foobar.json'
+
+    @raises(KeyError)
+    def test_get_missing_resource(self):
+        """Check that an error is raised for unknown resource names"""
+        self.dpkg.get_resource('barfoo')
+
+
+class TestLazyDatapackage(object):
+
+    def setup(self):
+        self.resources = [
+            {"name": "resource-{0}".format(i),
+             "path": "resource-{0}.csv".format(i)}
+            for i in range(100)]
+        self.dpkg = datapackage.DataPackage(
+            name="lazy", license="ODC-PDDL-1.0",
+            resources=self.resources, lazy=True)
+
+    def teardown(self):
+        pass
+
+    def test_resources_not_built(self):
+        """Check that resources aren't built when the package is created"""
+        assert self.dpkg.resources.built() == 0
+
+    def test_get_resource_builds_one(self):
+        """Check that a name lookup only builds the resource returned"""
+        resource = self.dpkg.get_resource('resource-42')
+        assert isinstance(resource, datapackage.Resource)
+        assert resource.format == 'csv'
+        assert self.dpkg.resources.built() == 1
+        assert self.dpkg.get_resource('resource-42') is resource
+
+    def test_index_builds_resource(self):
+        """Check that indexing and iterating builds resources"""
+        assert isinstance(self.dpkg.resources[0], datapackage.Resource)
+        assert self.dpkg.resources.built() == 1
+        resources = list(self.dpkg.resources)
+        assert all(isinstance(r, datapackage.Resource) for r in resources)
+        assert self.dpkg.resources.built() == 100
+
+    def test_lazy_load(self):
+        """Check that a package can be lazily loaded from its uri"""
+        dpkg = datapackage.DataPackage("tests/test.dpkg_local", lazy=True)
+        assert dpkg.name == "test.dpkg_1"
+        assert dpkg.resources.built() == 0
+        rows = list(dpkg.get_data(dpkg.get_resource('country-codes')))
+        assert rows[0]['name'] == 'Afghanistan'
+
+    def test_lazy_as_dict(self):
+        """Check that lazy and eager packages serialize the same"""
+        eager = datapackage.DataPackage(
+            name="lazy", license="ODC-PDDL-1.0", resources=self.resources)
+        assert self.dpkg.as_dict() == eager.as_dict()
+
+    @raises(ValueError)
+    def test_lazy_validates_metadata(self):
+        """Check that top-level metadata is validated immediately"""
+        datapackage.DataPackage(name="lazy", homepage="foo",
+                                resources=self.resources, lazy=True)
+
+    @raises(TypeError)
+    def test_lazy_validates_resource_type(self):
+        """Check that the resources must still be dicts or Resources"""
+        datapackage.DataPackage(name="lazy", resources=["foo"], lazy=True)
+
+
+class TestTrustedDatapackage(object):
+
+    def setup(self):
+        self.dpkg = datapackage.DataPackage("tests/test.dpkg")
+        self.descriptor = self.dpkg.as_dict()
+
+    def teardown(self):
+        pass
+
+    def test_from_trusted(self):
+        """Check that a trusted descriptor builds the same data package"""
+        trusted = datapackage.DataPackage.from_trusted(self.descriptor)
+        assert isinstance(trusted, datapackage.DataPackage)
+        assert trusted.as_dict() == self.descriptor
+        resource = trusted.resources[0]
+        assert isinstance(resource, datapackage.Resource)
+        assert resource.datapackage_uri == "tests/test.dpkg"
+        assert isinstance(resource.sources[0],
+                          datapackage.sources.Source)
+        assert isinstance(trusted.sources[0], datapackage.sources.Source)
+
+    def test_from_trusted_does_not_validate(self):
+        """Check that trusted descriptors are not validated"""
+        self.descriptor['homepage'] = 'foo'
+        trusted = datapackage.DataPackage.from_trusted(self.descriptor)
+        assert trusted.homepage == 'foo'
+
+    def test_validate(self):
+        """Check that a valid data package passes validation"""
+        datapackage.DataPackage.from_trusted(self.descriptor).validate()
+
+    @raises(ValueError)
+    def test_validate_invalid(self):
+        """Check that validation finds invalid values"""
+        self.descriptor['homepage'] = 'foo'
+        datapackage.DataPackage.from_trusted(self.descriptor).validate()
+
+    @raises(ValueError)
+    def test_validate_invalid_nested(self):
+        """Check that validation finds invalid values in nested objects"""
+        self.descriptor['resources'][0]['sources'][0]['email'] = 'foo'
+        datapackage.DataPackage.from_trusted(self.descriptor).validate()
+
+    @raises(ValueError)
+    def test_validate_missing_required(self):
+        """Check that validation finds missing required fields"""
+        del self.descriptor['name']
+        datapackage.DataPackage.from_trusted(self.descriptor).validate()
+
+    def test_schema_from_trusted(self):
+        """Check that trusted schemas are built with Field objects"""
+        schema = datapackage.schema.Schema.from_trusted(
+            {'fields': [{'name': 'foo', 'type': 'integer'}],
+             'primaryKey': 'foo'})
+        assert isinstance(schema['fields'][0], datapackage.schema.Field)
+        schema.validate()
+
+    @raises(AttributeError)
+    def test_schema_validate_invalid(self):
+        """Check that schema validation finds an unknown primary key"""
+        datapackage.schema.Schema.from_trusted(
+            {'fields': [{'name': 'foo'}], 'primaryKey': 'bar'}).validate()
+
+
+class TestPackageBytes(object):
+
+    def setup(self):
+        self.dpkg = datapackage.DataPackage(
+            name="remote", license="ODC-PDDL-1.0",
+            resources=[{"name": "resource-{0}".format(i),
+                        "url": "http://{0}.example.com/{1}.csv".format(
+                            'ab'[i % 2], i)}
+                       for i in range(8)] + [{"data": {"foo": "bar"}}])
+        self.lock = threading.Lock()
+        self.active = {}
+        self.most_active = {}
+        self.methods = []
+
+    def teardown(self):
+        pass
+
+    def urlopen(self, request):
+        """Fake urlopen which tracks the concurrent requests per host"""
+        url = getattr(request, 'get_full_url', lambda: request)()
+        host = compat.parse.urlparse(url).netloc
+        with self.lock:
+            method = getattr(request, 'get_method', lambda: 'GET')()
+            self.methods.append(method)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.most_active[host] = max(self.most_active.get(host, 0),
+                                         self.active[host])
+        time.sleep(0.01)
+        with self.lock:
+            self.active[host] -= 1
+        site = mocklib.Mock()
+        site.info.return_value = {'Content-Length': str(len(url))}
+        return site
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_update_all_bytes(self, mock_urlopen):
+        """Check that sizes of all resources are probed with HEAD"""
+        mock_urlopen.side_effect = self.urlopen
+        result = self.dpkg.update_all_bytes()
+        assert len(result) == 9
+        assert result[3] == len("http://b.example.com/3.csv")
+        assert result[8] == 14
+        assert self.dpkg.resources[3].bytes == result[3]
+        assert self.methods == ['HEAD'] * 8
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_update_all_bytes_per_host(self, mock_urlopen):
+        """Check that concurrent requests to one host are limited"""
+        mock_urlopen.side_effect = self.urlopen
+        self.dpkg.update_all_bytes(workers=8, per_host=2)
+        assert max(self.most_active.values()) <= 2
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_update_all_bytes_errors(self, mock_urlopen):
+        """Check that errors are returned in the result map"""
+        mock_urlopen.side_effect = self.urlopen
+        self.dpkg.resources[0]['bytes'] = 1
+        result = self.dpkg.update_all_bytes()
+        assert isinstance(result[0], RuntimeError)
+        assert result[1] == len("http://b.example.com/1.csv")
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_update_all_bytes_same_names(self, mock_urlopen):
+        """Check that resources with the same name get their own result"""
+        mock_urlopen.side_effect = self.urlopen
+        for resource in self.dpkg.resources:
+            resource['name'] = 'resource'
+        result = self.dpkg.update_all_bytes()
+        assert result[:2] == [len("http://a.example.com/0.csv"),
+                              len("http://b.example.com/1.csv")]
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_get_fallback(self, mock_urlopen):
+        """Check that GET is used when HEAD has no Content-Length"""
+        head = mocklib.Mock()
+        head.info.return_value = {}
+        get = mocklib.Mock()
+        get.info.return_value = {'Content-Length': '42'}
+        mock_urlopen.side_effect = [head, get]
+        assert datapackage.util.get_size_from_url(
+            "http://a.example.com/0.csv") == 42
+        assert mock_urlopen.call_args[0][0] == "http://a.example.com/0.csv"
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import hashlib
+import shutil
+import tempfile
+import datapackage
+from datapackage import hashing
+from datapackage.fingerprints import FingerprintStore
+from datapackage import compat
+
+if compat.is_py2 or compat.is_py32:
+    import mock as mocklib
+else:
+    from unittest import mock as mocklib
+
+
+class TestFingerprints(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.csv')
+        self.write(b'foo,bar\n1,2\n')
+        self.store = FingerprintStore(
+            os.path.join(self.tmpdir, 'cache', 'fingerprints.sqlite'))
+
+    def teardown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, content):
+        with io.open(self.filename, 'wb') as fh:
+            fh.write(content)
+        self.content = content
+
+    def test_hash_file_stored(self):
+        """Check that an unchanged file is answered from the store"""
+        expected = (len(self.content), hashlib.md5(self.content).hexdigest())
+        assert self.store.hash_file(self.filename) == expected
+        with mocklib.patch('datapackage.hashing.hash_file') as mock_hash:
+            assert self.store.hash_file(self.filename) == expected
+            assert not mock_hash.called
+
+    def test_changed_file_rehashed(self):
+        """Check that a changed file is hashed again"""
+        self.store.hash_file(self.filename)
+        self.write(b'foo,bar\n1,2\n3,4\n')
+        assert self.store.lookup(self.filename) is None
+        assert self.store.hash_file(self.filename)[1] == \
+            hashlib.md5(self.content).hexdigest()
+
+    def test_algorithms_stored_separately(self):
+        """Check that hashes of different algorithms don't mix"""
+        self.store.hash_file(self.filename, 'md5')
+        assert self.store.lookup(self.filename, 'sha256') is None
+        assert self.store.hash_file(self.filename, 'sha256')[1] == \
+            hashlib.sha256(self.content).hexdigest()
+
+    def test_store_persists(self):
+        """Check that the store persists between store objects"""
+        self.store.hash_file(self.filename)
+        path = self.store.path
+        self.store.close()
+        self.store = FingerprintStore(path)
+        assert self.store.lookup(self.filename) is not None
+
+    def test_resource_update_hash_with_store(self):
+        """Check that resources can use the store when hashing"""
+        resource = datapackage.Resource(datapackage_uri=self.tmpdir,
+                                        path='data.csv')
+        resource.update_hash(store=self.store)
+        assert resource.hash == hashlib.md5(self.content).hexdigest()
+        with mocklib.patch('datapackage.hashing.hash_file') as mock_hash:
+            hashing.hash_resources([resource], store=self.store)
+            assert not mock_hash.called
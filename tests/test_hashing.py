@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import datapackage
+from datapackage import compat
+from datapackage import hashing
+from nose.tools import raises
+
+if compat.is_py2 or compat.is_py32:
+    import mock as mocklib
+else:
+    from unittest import mock as mocklib
+
+
+class TestHashing(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.bin')
+        self.content = os.urandom(3 * 1024 + 17)
+        with io.open(self.filename, 'wb') as fh:
+            fh.write(self.content)
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_hash_file(self):
+        """Check that files are hashed correctly with all available
+        algorithms"""
+        for algorithm in hashing.HASH_ALGORITHMS:
+            if algorithm not in hashlib.algorithms_available:
+                # e.g. blake2b before Python 3.6
+                continue
+            expected = hashlib.new(algorithm, self.content).hexdigest()
+            for use_mmap in (True, False):
+                size, hexdigest = hashing.hash_file(
+                    self.filename, algorithm, buffer_size=1024,
+                    use_mmap=use_mmap)
+                assert size == len(self.content)
+                assert hexdigest == expected
+
+    def test_hash_file_mmap(self):
+        """Check that mapped files are hashed without reading them as a
+        stream, also when the map has no new style buffer (Python 2)
+
+        """
+        expected = hashlib.sha1(self.content).hexdigest()
+        with mocklib.patch('datapackage.hashing.hash_stream') as mock_stream:
+            assert hashing.hash_file(
+                self.filename, 'sha1', buffer_size=1000) == \
+                (len(self.content), expected)
+            with mocklib.patch('datapackage.hashing.memoryview',
+                               side_effect=TypeError, create=True):
+                assert hashing.hash_file(
+                    self.filename, 'sha1', buffer_size=1000) == \
+                    (len(self.content), expected)
+            assert not mock_stream.called
+
+    def test_hash_empty_file(self):
+        """Check that empty files (which can't be mapped) are hashed"""
+        filename = os.path.join(self.tmpdir, 'empty.bin')
+        io.open(filename, 'wb').close()
+        assert hashing.hash_file(filename) == \
+            (0, hashlib.md5().hexdigest())
+
+    def test_hash_stream(self):
+        """Check that streams are hashed correctly"""
+        size, hexdigest = hashing.hash_stream(
+            io.BytesIO(self.content), 'sha256', buffer_size=1000)
+        assert size == len(self.content)
+        assert hexdigest == hashlib.sha256(self.content).hexdigest()
+
+    @raises(ValueError)
+    def test_unsupported_algorithm(self):
+        """Check that only the supported algorithms can be used"""
+        hashing.new_hash('crc32')
+
+    def test_format_and_parse_hash(self):
+        """Check that md5 hashes are bare and others are prefixed"""
+        assert hashing.format_hash('md5', 'abc') == 'abc'
+        assert hashing.format_hash('sha256', 'abc') == 'sha256:abc'
+        assert hashing.parse_hash('abc') == ('md5', 'abc')
+        assert hashing.parse_hash('SHA256:abc') == ('sha256', 'abc')
+
+    def test_hashes_match(self):
+        """Check that hashes are compared by algorithm and hexdigest"""
+        assert hashing.hashes_match('md5:abc', 'abc')
+        assert hashing.hashes_match('SHA256:ABC', 'sha256:abc')
+        assert not hashing.hashes_match('sha1:abc', 'abc')
+        assert not hashing.hashes_match('abc', 'abd')
+
+    def test_resource_prefixed_md5(self):
+        """Check that md5 hashes written with a prefix are verified"""
+        resource = datapackage.Resource(
+            datapackage_uri=self.tmpdir, path='data.bin',
+            hash='md5:' + hashlib.md5(self.content).hexdigest())
+        resource.update_hash()
+        assert resource.hash == hashlib.md5(self.content).hexdigest()
+
+    def test_resource_hash_algorithm(self):
+        """Check that resources can be hashed with other algorithms"""
+        resource = datapackage.Resource(
+            datapackage_uri=self.tmpdir, path='data.bin')
+        resource.update_hash(algorithm='sha256')
+        expected = hashlib.sha256(self.content).hexdigest()
+        assert resource.hash == 'sha256:' + expected
+        # The algorithm of the current hash is used by default
+        resource.update_hash()
+        assert resource.hash == 'sha256:' + expected
+
+    def test_resource_change_algorithm(self):
+        """Check that the old hash is verified when changing algorithm"""
+        resource = datapackage.Resource(
+            datapackage_uri=self.tmpdir, path='data.bin')
+        resource.update_hash()
+        assert resource.hash == hashlib.md5(self.content).hexdigest()
+        resource.update_hash(algorithm='sha256')
+        assert resource.hash == \
+            'sha256:' + hashlib.sha256(self.content).hexdigest()
+
+    @raises(RuntimeError)
+    def test_resource_change_algorithm_changed_file(self):
+        """Check that a changed file is detected when changing algorithm"""
+        resource = datapackage.Resource(
+            datapackage_uri=self.tmpdir, path='data.bin',
+            hash='94232c5b8fc9272f6f73a1e36eb68fcf')
+        resource.update_hash(algorithm='sha1')
+
+    def test_resource_data_hash_algorithm(self):
+        """Check that inline data can be hashed with other algorithms"""
+        resource = datapackage.Resource(data={"foo": "bar"})
+        resource.update_hash(algorithm='sha1')
+        assert resource.hash == \
+            'sha1:' + hashlib.sha1(b'{"foo": "bar"}').hexdigest()
+
+    def test_hash_resources(self):
+        """Check that several resources can be hashed in a thread pool"""
+        resources = [datapackage.Resource(datapackage_uri=self.tmpdir,
+                                          path='data.bin')
+                     for i in range(8)]
+        hashed = hashing.hash_resources(resources, algorithm='sha256',
+                                        workers=4)
+        expected = 'sha256:' + hashlib.sha256(self.content).hexdigest()
+        assert [r.hash for r in hashed] == [expected] * 8
+
+
+class TestIntegrity(object):
+
+    def setup(self):
+        # Paths of data packages are text (not bytes on Python 2)
+        self.tmpdir = compat.str(tempfile.mkdtemp())
+        self.contents = {}
+        for i in range(6):
+            self.write('data-{0}.csv'.format(i), 'foo,bar\n{0},2\n'.format(i))
+        resources = [{"name": "data-{0}".format(i),
+                      "path": "data-{0}.csv".format(i)} for i in range(6)]
+        resources.append({"name": "inline", "data": {"foo": "bar"}})
+        descriptor = os.path.join(self.tmpdir, 'datapackage.json')
+        with io.open(descriptor, 'wb') as fh:
+            fh.write(json.dumps({"name": "integrity",
+                                 "resources": resources}).encode('utf-8'))
+        self.dpkg = datapackage.DataPackage(self.tmpdir)
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, filename, content):
+        content = content.encode('utf-8')
+        with io.open(os.path.join(self.tmpdir, filename), 'wb') as fh:
+            fh.write(content)
+        self.contents[filename] = content
+
+    def test_update_integrity(self):
+        """Check that all resources get a size and a hash"""
+        progress = []
+        assert self.dpkg.update_integrity(
+            workers=3, progress=lambda *args: progress.append(args)) == []
+        for i, resource in enumerate(self.dpkg.resources[:6]):
+            content = self.contents['data-{0}.csv'.format(i)]
+            assert resource.bytes == len(content)
+            assert resource.hash == hashlib.md5(content).hexdigest()
+        assert self.dpkg.resources[6].bytes == 14
+        assert sorted(progress) == [(i, 7) for i in range(1, 8)]
+        assert self.dpkg.verify_integrity() == []
+        self.dpkg.resources[0]['hash'] = 'md5:' + self.dpkg.resources[0].hash
+        assert self.dpkg.verify_integrity() == []
+
+    def test_integrity_single_pass(self):
+        """Check that the size and hash of each resource come from reading
+        (or serializing) it once
+
+        """
+        serialize = mocklib.Mock(
+            side_effect=datapackage.resource.iter_data_json)
+        read = mocklib.Mock(side_effect=hashing.hash_file)
+        with mocklib.patch('datapackage.resource.iter_data_json',
+                           serialize), \
+                mocklib.patch('datapackage.resource.hash_file', read):
+            assert self.dpkg.update_integrity() == []
+            assert serialize.call_count == 1
+            assert read.call_count == 6
+            assert self.dpkg.verify_integrity() == []
+            assert serialize.call_count == 2
+            assert read.call_count == 12
+
+    def test_verify_integrity_mismatches(self):
+        """Check that all changed resources are reported"""
+        self.dpkg.update_integrity(algorithm='sha256')
+        self.write('data-1.csv', 'foo,bar\n1,3\n')
+        self.write('data-4.csv', 'foo,bar\n4,2\n4,2\n')
+        os.remove(os.path.join(self.tmpdir, 'data-5.csv'))
+        mismatches = self.dpkg.verify_integrity(workers=4)
+        assert [(m.resource, m.field) for m in mismatches] == \
+            [('data-1', 'hash'), ('data-4', 'bytes'), ('data-4', 'hash'),
+             ('data-5', None)]
+        assert mismatches[0].actual == 'sha256:' + hashlib.sha256(
+            self.contents['data-1.csv']).hexdigest()
+        assert isinstance(mismatches[3].error, (IOError, OSError))
+
+    def test_update_integrity_keeps_mismatches(self):
+        """Check that resources which have changed aren't re-stamped"""
+        self.dpkg.update_integrity()
+        old_hash = self.dpkg.resources[2].hash
+        self.write('data-2.csv', 'foo,bar\n2,3\n')
+        mismatches = self.dpkg.update_integrity()
+        assert [(m.resource, m.field) for m in mismatches] == \
+            [('data-2', 'hash')]
+        assert self.dpkg.resources[2].hash == old_hash
+        assert self.dpkg.update_integrity(verify=False) == []
+        assert self.dpkg.resources[2].hash != old_hash
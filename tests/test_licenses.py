@@ -4,8 +4,13 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
+import json
 from nose.tools import raises
-from datapackage.licenses import License
+from datapackage.licenses import (License, LicenseRegistry, LICENSES,
+                                  COMPACT_LICENSES, compile_licenses,
+                                  load_licenses_aliases)
+from datapackage.util import load_licenses
 
 
 class TestLicenses(object):
@@ -46,3 +51,65 @@ class TestLicenses(object):
         # result in an attribute error.
         license_obj = License(type=self.license.lower())
         assert license_obj.type == self.license
+
+    def test_mixed_case_license_id(self):
+        """Check that IDs which aren't uppercase are recognized"""
+        license_obj = License(type="odbl-1.0")
+        assert license_obj.type == "ODbL-1.0"
+        assert 'url' not in license_obj
+
+    def test_license_alias(self):
+        """Check that aliases are recognized as licenses"""
+        license_obj = License(type="cc-by")
+        assert license_obj.type == "CC-BY"
+        assert LICENSES.resolve("cc-by") == "CC-BY-4.0"
+        assert LICENSES["cc-by"] == LICENSES["CC-BY-4.0"]
+        assert "PDDL" in LICENSES
+        assert "batman" not in LICENSES
+
+    def test_registry_iterates_ids(self):
+        """Check that aliases resolve through lookups but aren't iterated"""
+        assert "cc-by" in LICENSES
+        assert "cc-by" not in list(LICENSES)
+        assert LICENSES.resolve("cc-by") in list(LICENSES)
+        assert len(list(LICENSES)) == len(LICENSES)
+
+
+class TestLicenseRegistry(object):
+
+    def setup(self):
+        self.licenses = load_licenses()
+
+    def teardown(self):
+        pass
+
+    def test_loaded_on_first_use(self):
+        """Check that the registry isn't read until it is used"""
+        registry = LicenseRegistry()
+        assert registry._compiled is None
+        assert "ODC-BY-1.0" in registry
+        assert registry._compiled is not None
+
+    def test_same_as_licenses_json(self):
+        """Check that the registry has the licenses of licenses.json"""
+        assert dict(LICENSES.items()) == self.licenses
+        assert len(LICENSES) == len(self.licenses)
+
+    def test_compact_form_up_to_date(self):
+        """Check that the compact registry is compiled from the sources
+        (run data/update_licenses.py if this fails)"""
+        with io.open(COMPACT_LICENSES, 'r') as fh:
+            compiled = json.load(fh)
+        assert compiled == compile_licenses(self.licenses,
+                                            load_licenses_aliases())
+
+    def test_missing_compact_form(self):
+        """Check that the registry falls back to the source files"""
+        registry = LicenseRegistry('does-not-exist.json')
+        assert dict(registry.items()) == self.licenses
+        assert registry.resolve('odbl') == 'ODbL-1.0'
+
+    def test_lookups_are_copies(self):
+        """Check that the registry can't be modified through lookups"""
+        LICENSES['ODC-BY-1.0']['url'] = 'http://example.com/'
+        assert LICENSES['ODC-BY-1.0']['url'] != 'http://example.com/'
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import datapackage
+from datapackage import compat
+from datapackage.location import Location, resolve
+from datapackage.util import is_local
+from nose.tools import raises
+
+if compat.is_py2 or compat.is_py32:
+    import mock as mocklib
+else:
+    from unittest import mock as mocklib
+
+
+class TestLocation(object):
+
+    def setup(self):
+        self.base = os.path.abspath('tests/test.dpkg_local')
+        self.file_url = 'file://' + compat.quote(self.base)
+
+    def teardown(self):
+        pass
+
+    def test_local(self):
+        """Check that local paths are joined to local bases"""
+        location = resolve('country-codes.csv', 'tests/test.dpkg_local')
+        assert location.is_local
+        assert location.path == 'tests/test.dpkg_local/country-codes.csv'
+        assert location.host is None
+
+    def test_remote(self):
+        """Check that paths are url joined to remote bases"""
+        location = resolve('data/foo.csv', 'http://example.com/pkg/')
+        assert not location.is_local
+        assert location.url == 'http://example.com/pkg/data/foo.csv'
+        assert location.host == 'example.com'
+        assert resolve('http://example.org/foo.csv', self.base).url == \
+            'http://example.org/foo.csv'
+
+    def test_file_urls(self):
+        """Check that file: URLs are local paths"""
+        for url in (self.file_url, 'file://localhost' + self.base):
+            location = resolve(url)
+            assert location.is_local
+            assert location.path == self.base
+            assert is_local(url)
+            assert location.join('country-codes.csv').is_local
+
+    def test_file_url_package(self):
+        """Check that packages can be loaded from file: URLs"""
+        dpkg = datapackage.DataPackage(self.file_url)
+        resource = dpkg.resources[0]
+        assert resource.fullpath == \
+            os.path.join(self.base, 'country-codes.csv')
+        rows = list(dpkg.get_data(resource))
+        assert rows[0]['name'] == 'Afghanistan'
+        resource.update_bytes()
+        assert resource.bytes == \
+            os.path.getsize(os.path.join(self.base, 'country-codes.csv'))
+
+    @raises(ValueError)
+    def test_remote_read_only(self):
+        """Check that remote locations can't be opened for writing"""
+        resolve('http://example.com/foo.csv').open('wb')
+
+    def test_resource_location_cached(self):
+        """Check that a resource resolves its location once"""
+        resource = datapackage.Resource(
+            datapackage_uri='tests/test.dpkg_local', path='country-codes.csv')
+        with mocklib.patch('datapackage.resource.resolve',
+                           side_effect=resolve) as mock_resolve:
+            resource.fullpath
+            resource.update_bytes()
+            resource.update_hash()
+            assert mock_resolve.call_count == 1
+            resource.path = 'datapackage.json'
+            assert resource.location == \
+                Location('datapackage.json',
+                         path='tests/test.dpkg_local/datapackage.json')
+            assert mock_resolve.call_count == 2
+
+    def test_package_base_location_cached(self):
+        """Check that the base of a package is resolved once"""
+        dpkg = datapackage.DataPackage('tests/test.dpkg_local')
+        assert dpkg.base_location is dpkg.base_location
+        dpkg.base = 'http://example.com/'
+        assert not dpkg.base_location.is_local
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datapackage
+from datapackage import mediatypes
+from datapackage import compat
+
+if compat.is_py2 or compat.is_py32:
+    import mock as mocklib
+else:
+    from unittest import mock as mocklib
+
+
+class TestMediatypes(object):
+
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def test_data_formats(self):
+        """Check that data formats are guessed from the built-in table"""
+        assert mediatypes.guess_mediatype('foo.tsv') == \
+            'text/tab-separated-values'
+        assert mediatypes.guess_mediatype('data/foo.GEOJSON') == \
+            'application/geo+json'
+        assert mediatypes.guess_mediatype('foo.parquet') == \
+            'application/vnd.apache.parquet'
+        assert mediatypes.guess_format('application/x-ndjson') == 'ndjson'
+        assert mediatypes.guess_format('image/jpeg') == 'jpg'
+
+    def test_compressed(self):
+        """Check that compressed files get the mediatype of their contents"""
+        assert mediatypes.guess_mediatype('foo.csv.gz') == 'text/csv'
+        assert mediatypes.guess_mediatype('foo.gz') == 'application/gzip'
+
+    def test_unknown(self):
+        """Check that unknown extensions have no mediatype"""
+        assert mediatypes.guess_mediatype('foo.qqq') == ''
+        assert mediatypes.guess_mediatype('foo') == ''
+        assert mediatypes.guess_format('foo/bar') == ''
+        resource = datapackage.Resource(path='foo.qqq')
+        assert resource.mediatype == ''
+        assert resource.format == 'qqq'
+
+    def test_table_before_mimetypes(self):
+        """Check that mimetypes isn't used for extensions in the table"""
+        with mocklib.patch('mimetypes.guess_type') as mock_guess:
+            mediatypes.guess_mediatype('foo.xlsx')
+            assert not mock_guess.called
+
+    def test_memo(self):
+        """Check that guesses are memoized by suffix"""
+        mediatypes.guess_mediatype('foo.xyz')
+        with mocklib.patch('mimetypes.guess_type') as mock_guess:
+            assert mediatypes.guess_mediatype('bar.xyz') == \
+                mediatypes._mediatype_memo['xyz']
+            assert not mock_guess.called
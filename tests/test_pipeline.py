@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import datapackage
+from datapackage.pipeline import (Pipeline, CSVSink, NDJSONSink,
+                                  ResourceSink)
+from nose.tools import raises
+
+
+def upper_name(row):
+    """Module-level so it can be pickled for process pools"""
+    return dict(row, name=row['name'].upper())
+
+
+def fail(row):
+    raise RuntimeError("stage failed")
+
+
+class ListSink(object):
+
+    def __init__(self):
+        self.rows = []
+        self.finished = False
+        self.closed = False
+
+    def write(self, batch):
+        self.rows.extend(batch)
+
+    def finish(self):
+        self.finished = True
+
+    def close(self):
+        self.closed = True
+
+
+class TestPipeline(object):
+
+    def setup(self):
+        self.dpkg = datapackage.DataPackage('tests/test.dpkg_local')
+        self.resource = self.dpkg.resources[0]
+        self.rows = list(self.dpkg.get_data(self.resource))
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def pipeline(self, **kwargs):
+        return Pipeline.from_resource(self.dpkg, self.resource,
+                                      batch_size=50, **kwargs)
+
+    def test_stages(self):
+        """Check that rows go through map, filter and transform stages"""
+        sink = ListSink()
+        self.pipeline().filter(lambda row: row['is_independent'] == 'Yes') \
+            .map(lambda row: row['name']) \
+            .transform(lambda batch: sorted(batch)).run(sink)
+        names = [row['name'] for row in self.rows
+                 if row['is_independent'] == 'Yes']
+        assert sink.finished and sink.closed
+        assert sorted(sink.rows) == sorted(names)
+        assert len(sink.rows) == len(names)
+
+    def test_thread_pool(self):
+        """Check that stages with a thread pool keep the order of rows"""
+        batches = self.pipeline(queue_size=1).map(
+            upper_name, workers=4).iter_batches()
+        rows = [row for batch in batches for row in batch]
+        assert [row['name'] for row in rows] == \
+            [row['name'].upper() for row in self.rows]
+
+    def test_process_pool(self):
+        """Check that stages can run in a process pool"""
+        sink = ListSink()
+        self.pipeline().map(upper_name, workers=2, pool='process').run(sink)
+        assert [row['name'] for row in sink.rows] == \
+            [row['name'].upper() for row in self.rows]
+
+    def test_stats(self):
+        """Check that each stage reports its throughput"""
+        stats = self.pipeline().filter(
+            lambda row: row['is_independent'] == 'Yes',
+            name='independent').run(
+                ListSink())
+        assert [stage.name for stage in stats] == \
+            ['source', 'independent', 'sink']
+        source, independent, sink = stats
+        assert source.rows_out == len(self.rows)
+        assert independent.rows_in == len(self.rows)
+        assert independent.rows_out == sink.rows_in < len(self.rows)
+        assert independent.batches == source.batches == \
+            -(-len(self.rows) // 50)
+
+    def test_error(self):
+        """Check that errors in stages are raised by run"""
+        sink = ListSink()
+        try:
+            self.pipeline().map(fail, workers=2).map(upper_name).run(sink)
+        except RuntimeError:
+            pass
+        else:
+            assert False, "the error wasn't raised"
+        assert sink.closed and not sink.finished
+
+    def test_close_early(self):
+        """Check that the pipeline stops when its output is closed"""
+        pipeline = Pipeline.from_resource(self.dpkg, self.resource,
+                                          batch_size=5, queue_size=1)
+        batches = pipeline.map(upper_name).iter_batches()
+        next(batches)
+        batches.close()
+        assert pipeline.stats[0].batches < -(-len(self.rows) // 5)
+
+    @raises(ValueError)
+    def test_invalid_pool(self):
+        """Check that unknown pools are an error"""
+        self.pipeline().map(upper_name, pool='fiber')
+
+    def test_csv_sink(self):
+        """Check that rows can be written to CSV files"""
+        path = os.path.join(self.tmpdir, 'out.csv')
+        self.pipeline().run(CSVSink(path, fields=['name', 'GAUL']))
+        resource = datapackage.Resource(path=path, schema={
+            'fields': [{'name': 'name', 'type': 'string'},
+                       {'name': 'GAUL', 'type': 'integer'}]})
+        rows = list(self.dpkg.get_data(resource))
+        assert rows == [{'name': row['name'], 'GAUL': row['GAUL']}
+                        for row in self.rows]
+
+    def test_ndjson_sink(self):
+        """Check that rows can be written as newline delimited JSON"""
+        path = os.path.join(self.tmpdir, 'out.ndjson')
+        self.pipeline().map(lambda row: {'name': row['name']}).run(
+            NDJSONSink(path))
+        with io.open(path, encoding='utf-8') as fh:
+            rows = [json.loads(line) for line in fh]
+        assert rows == [{'name': row['name']} for row in self.rows]
+
+    def test_csv_sink_no_rows(self):
+        """Check that CSV files get a header when no rows are written"""
+        path = os.path.join(self.tmpdir, 'out.csv')
+        self.pipeline().filter(lambda row: False).run(
+            CSVSink(path, fields=['name', 'GAUL']))
+        with io.open(path, 'rb') as fh:
+            assert fh.read() == b'name,GAUL\r\n'
+
+    def package(self):
+        base = os.path.join(self.tmpdir, 'pkg')
+        shutil.copytree('tests/test.dpkg_local', base)
+        return datapackage.DataPackage(base)
+
+    def test_resource_sink(self):
+        """Check that rows can be written to a new resource"""
+        dpkg = self.package()
+        pipeline = Pipeline.from_resource(dpkg, dpkg.resources[0])
+        pipeline.map(lambda row: {'name': row['name'],
+                                  'independent':
+                                      row['is_independent'] == 'Yes',
+                                  'gaul': row['GAUL'],
+                                  'codes': [row['ISO3166-1-Alpha-2']]})
+        sink = ResourceSink(dpkg, 'names.csv', name='names')
+        pipeline.run(sink)
+        assert len(dpkg.resources) == 2
+        resource = dpkg.get_resource('names')
+        assert dict((field['name'], field['type'])
+                    for field in resource.schema['fields']) == \
+            {'name': 'string', 'independent': 'string', 'gaul': 'integer',
+             'codes': 'object'}
+        rows = list(dpkg.get_data(resource))
+        assert rows == [{'name': row['name'],
+                         'independent':
+                             'True' if row['is_independent'] == 'Yes'
+                             else 'False',
+                         'gaul': row['GAUL'],
+                         'codes': [row['ISO3166-1-Alpha-2']]}
+                        for row in self.rows]
+
+    def test_resource_sink_error(self):
+        """Check that no resource is added when the pipeline fails"""
+        dpkg = self.package()
+        pipeline = Pipeline.from_resource(dpkg, dpkg.resources[0],
+                                          batch_size=50)
+        pipeline.transform(
+            lambda batch: map(fail, batch) if batch[0]['GAUL'] > 100
+            else batch)
+        try:
+            pipeline.run(ResourceSink(dpkg, 'out.csv', name='out'))
+        except RuntimeError:
+            pass
+        else:
+            assert False, "the error wasn't raised"
+        assert [resource.name for resource in dpkg.resources] == \
+            ['country-codes']
+        assert not os.path.exists(os.path.join(dpkg.base, 'out.csv'))
+
+    def test_resource_sink_no_rows(self):
+        """Check that resources without rows need a schema"""
+        dpkg = self.package()
+        schema = {'fields': [{'name': 'name', 'type': 'string'}]}
+        Pipeline.from_resource(dpkg, dpkg.resources[0]).filter(
+            lambda row: False).run(
+                ResourceSink(dpkg, 'names.csv', name='names', schema=schema))
+        assert list(dpkg.get_data(dpkg.get_resource('names'))) == []
+
+    @raises(ValueError)
+    def test_resource_sink_no_schema(self):
+        """Check that resources without rows or schema are an error"""
+        dpkg = self.package()
+        Pipeline.from_resource(dpkg, dpkg.resources[0]).filter(
+            lambda row: False).run(ResourceSink(dpkg, 'out.csv'))
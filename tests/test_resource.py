@@ -4,6 +4,12 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
+import os
+import shutil
+import json
+import hashlib
+import tempfile
 import datapackage
 import datapackage.schema
 from datapackage import compat
@@ -69,6 +75,11 @@ class TestDatapackage(object):
         assert 1 in self.resource.data, self.resource.data
         assert self.resource.data[1] == 2
 
+    @raises(TypeError)
+    def test_set_unserializable_data(self):
+        """Check that data which isn't json serializable is rejected"""
+        self.resource.data = {"foo": object()}
+
     def test_get_path(self):
         """Try reading the resource path"""
         path = self.resource.path
@@ -290,6 +301,121 @@ class TestDatapackage(object):
         self.patch_urlopen_size(mock_urlopen, '14')
         assert self.resource._url_bytes() == self.resource.bytes
 
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_bytes_from_header(self, mock_urlopen):
+        """Checks that the size is read from headers without getheaders"""
+        mock_site = mocklib.Mock()
+        mock_site.info.return_value = {'Content-Length': '14'}
+        mock_urlopen.return_value = mock_site
+        assert self.resource._url_bytes() == 14
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_bytes_streamed(self, mock_urlopen):
+        """Checks that the url is streamed when there is no Content-Length"""
+        mock_site = mocklib.Mock()
+        mock_site.info.return_value = {}
+        mock_site.read.side_effect = [b'{"foo": "bar"}', b'']
+        mock_urlopen.return_value = mock_site
+        assert self.resource._url_bytes() == 14
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_bytes_and_hash_one_download(self, mock_urlopen):
+        """Checks that a url counted without Content-Length is hashed from
+        the same download"""
+        head = mocklib.Mock()
+        head.info.return_value = {}
+        get = mocklib.Mock()
+        get.info.return_value = {}
+        get.read.side_effect = [b'{"foo": "bar"}', b'']
+        mock_urlopen.side_effect = [head, get]
+        resource = datapackage.Resource(url="http://foobar.com/foobar.json")
+        resource.update_bytes()
+        resource.update_hash()
+        assert resource.bytes == 14
+        assert resource.hash == hashlib.md5(b'{"foo": "bar"}').hexdigest()
+        assert mock_urlopen.call_count == 2
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_hash(self, mock_urlopen):
+        """Checks that the hash is computed by streaming the url"""
+        mock_urlopen.return_value = io.BytesIO(b'{"foo": "bar"}')
+        resource = datapackage.Resource(url="http://foobar.com/foobar.json")
+        resource.update_hash()
+        assert resource.hash == hashlib.md5(b'{"foo": "bar"}').hexdigest()
+        assert resource.local_copy is None
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_hash_local_copy(self, mock_urlopen):
+        """Checks that the url can be copied to a local file while hashing"""
+        mock_urlopen.return_value = io.BytesIO(b'{"foo": "bar"}')
+        resource = datapackage.Resource(url="http://foobar.com/foobar.json")
+        cache_dir = tempfile.mkdtemp()
+        try:
+            resource.update_hash(algorithm='sha256', cache_dir=cache_dir)
+            assert resource.hash == \
+                'sha256:' + hashlib.sha256(b'{"foo": "bar"}').hexdigest()
+            assert resource.local_copy.endswith('.json')
+            with io.open(resource.local_copy, 'rb') as fh:
+                assert fh.read() == b'{"foo": "bar"}'
+            assert os.listdir(cache_dir) == \
+                [os.path.basename(resource.local_copy)]
+            assert 'local_copy' not in resource.as_dict()
+        finally:
+            shutil.rmtree(cache_dir)
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_hash_and_bytes_one_download(self, mock_urlopen):
+        """Checks that the size measured while hashing a url is reused"""
+        mock_urlopen.return_value = io.BytesIO(b'{"foo": "bar"}')
+        resource = datapackage.Resource(url="http://foobar.com/foobar.json")
+        resource.update_hash()
+        resource.update_bytes()
+        assert resource.bytes == 14
+        assert mock_urlopen.call_count == 1
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_hash_local_copy_mismatch(self, mock_urlopen):
+        """Checks that copies of urls which don't match aren't kept"""
+        mock_urlopen.side_effect = lambda url: io.BytesIO(b'{"foo": "bar"}')
+        resource = datapackage.Resource(url="http://foobar.com/foobar.json",
+                                        hash='sha1:' + '0' * 40)
+        cache_dir = tempfile.mkdtemp()
+        try:
+            try:
+                resource.update_hash(algorithm='sha256', cache_dir=cache_dir)
+            except RuntimeError:
+                pass
+            else:
+                assert False, "the mismatch wasn't raised"
+            assert resource.local_copy is None
+            assert os.listdir(cache_dir) == []
+        finally:
+            shutil.rmtree(cache_dir)
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_url_hash_local_copy_new_algorithm(self, mock_urlopen):
+        """Checks that the copy is kept when the old hash is verified"""
+        mock_urlopen.side_effect = lambda url: io.BytesIO(b'{"foo": "bar"}')
+        resource = datapackage.Resource(
+            url="http://foobar.com/foobar.json",
+            hash=compat.str(hashlib.md5(b'{"foo": "bar"}').hexdigest()))
+        cache_dir = tempfile.mkdtemp()
+        try:
+            resource.update_hash(algorithm='sha256', cache_dir=cache_dir)
+            assert os.listdir(cache_dir) == \
+                [os.path.basename(resource.local_copy)]
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_url_change_resets_local_copy(self):
+        """Checks that the copy of the old url isn't used for a new url"""
+        resource = datapackage.Resource(url="http://foobar.com/foobar.json")
+        resource.local_copy = 'foobar.json'
+        resource.url = "http://foobar.com/foobar.json"
+        assert resource.local_copy == 'foobar.json'
+        resource.url = "http://foobar.com/other.json"
+        assert resource.local_copy is None
+
     @raises(ValueError)
     def test_url_bytes_no_url(self):
         """Check that an error is raised when _url_bytes is called but there
@@ -299,6 +425,37 @@ class TestDatapackage(object):
         self.resource.url = None
         self.resource._url_bytes()
 
+    def test_data_modified_in_place(self):
+        """Check that the size and hash follow data modified in place"""
+        self.resource.data = [{"foo": "bar"}]
+        self.resource.update_bytes(verify=False)
+        self.resource.update_hash(verify=False)
+        self.resource.data.append({"foo": "baz"})
+        self.resource.update_bytes(verify=False)
+        self.resource.update_hash(verify=False)
+        serialized = json.dumps(self.resource.data).encode('utf-8')
+        assert self.resource.bytes == len(serialized)
+        assert self.resource.hash == hashlib.md5(serialized).hexdigest()
+
+    def test_data_json_grouped(self):
+        """Check that long lists serialize like json.dumps"""
+        data = [{"foo": index} for index in range(2500)]
+        assert ''.join(datapackage.resource.iter_data_json(data)) == \
+            json.dumps(data)
+        data = {"foo": data, "bar": "baz"}
+        assert ''.join(datapackage.resource.iter_data_json(data)) == \
+            json.dumps(data)
+
+    def test_data_size_follows_data(self):
+        """Check that the size follows changes of data and encoding"""
+        self.resource.update_bytes()
+        self.resource.data = {"foo": "barbaz"}
+        self.resource.update_bytes(verify=False)
+        assert self.resource.bytes == 17
+        self.resource.encoding = 'utf-16'
+        self.resource.update_bytes(verify=False)
+        assert self.resource.bytes == 36
+
     def test_compute_bytes_from_data(self):
         """Test computing the size from inline data"""
         del self.resource['bytes']
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import io
+import json
+import shutil
+import zipfile
+import tempfile
+import datapackage
+from datapackage import compat
+from datapackage import storage
+from datapackage.location import resolve
+from nose.tools import raises
+
+if compat.is_py2 or compat.is_py32:
+    import mock as mocklib
+else:
+    from unittest import mock as mocklib
+
+
+class TestStorage(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'data.csv')
+        with io.open(self.path, 'wb') as fh:
+            fh.write(b'0123456789')
+        storage.memory.clear()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+        storage.memory.clear()
+
+    def test_backends(self):
+        """Check that locations get the backend of their scheme"""
+        assert resolve(self.path).backend is storage.get_backend('')
+        assert resolve('file://' + self.path).backend is \
+            storage.get_backend('')
+        assert resolve('http://example.com/a.csv').backend is \
+            storage.get_backend('http')
+        assert resolve('memory://bucket/a.csv').backend is storage.memory
+        assert resolve('foo://example.com/a.csv').backend is None
+
+    @raises(ValueError)
+    def test_unknown_scheme(self):
+        """Check that locations without a backend can't be opened"""
+        resolve('foo://example.com/a.csv').open()
+
+    def test_register_backend(self):
+        """Check that schemes of registered backends aren't local paths"""
+        assert resolve('custom:a.csv').is_local
+        backend = storage.MemoryBackend()
+        storage.register_backend('custom', backend)
+        try:
+            location = resolve('custom:a.csv')
+            assert not location.is_local
+            assert location.backend is backend
+        finally:
+            del storage.BACKENDS['custom']
+
+    def test_local(self):
+        """Check the local file system backend"""
+        location = resolve(self.path)
+        with location.open() as fh:
+            assert fh.read() == b'0123456789'
+        stat = location.stat()
+        assert stat.size == 10
+        assert stat.mtime == os.path.getmtime(self.path)
+        assert stat.etag is None
+        assert location.read_range(2, 3) == b'234'
+        assert location.read_range(7) == b'789'
+        assert resolve(self.tmpdir).list() == ['data.csv']
+
+    def test_memory(self):
+        """Check the in-memory backend"""
+        location = resolve('memory://bucket/dir/a.csv')
+        with location.open('wb') as fh:
+            fh.write(b'0123456789')
+        storage.memory.put('bucket/dir/b.csv', b'')
+        storage.memory.put('bucket/dir/sub/c.csv', b'')
+        with location.open() as fh:
+            assert fh.read() == b'0123456789'
+        assert location.stat().size == 10
+        assert location.read_range(2, 3) == b'234'
+        assert resolve('memory://bucket/dir').list() == \
+            ['a.csv', 'b.csv', 'sub']
+
+    @raises(IOError)
+    def test_memory_missing(self):
+        """Check that missing in-memory files can't be opened"""
+        resolve('memory://bucket/missing.csv').open()
+
+    def test_memory_join(self):
+        """Check that relative paths are joined to memory: bases"""
+        location = resolve('data/a.csv', 'memory://bucket/pkg')
+        assert location.url == 'memory://bucket/pkg/data/a.csv'
+
+    def test_memory_datapackage(self):
+        """Check that data packages can be read from memory"""
+        storage.memory.put('bucket/datapackage.json', json.dumps({
+            'name': 'test',
+            'resources': [{'path': 'data.csv', 'schema': {'fields': [
+                {'name': 'foo', 'type': 'integer'},
+                {'name': 'bar', 'type': 'integer'}]}}]}).encode('utf-8'))
+        storage.memory.put('bucket/data.csv', b'foo,bar\n1,2\n')
+        dpkg = datapackage.DataPackage('memory://bucket')
+        assert dpkg.name == 'test'
+        dpkg.resources[0].update_bytes()
+        assert dpkg.resources[0].bytes == 12
+        assert list(dpkg.data) == [{'foo': 1, 'bar': 2}]
+
+    def test_zip(self):
+        """Check the zip member backend"""
+        archive = os.path.join(self.tmpdir, 'package.zip')
+        with zipfile.ZipFile(archive, 'w') as zipped:
+            zipped.write(self.path, 'pkg/data.csv')
+            zipped.writestr('pkg/datapackage.json', b'{}')
+        base = resolve('zip://' + archive + '!/pkg')
+        location = base.join('data.csv')
+        assert location.url == 'zip://' + archive + '!/pkg/data.csv'
+        with location.open() as fh:
+            assert fh.read() == b'0123456789'
+        stat = location.stat()
+        assert stat.size == 10
+        assert stat.etag is not None
+        assert location.read_range(2, 3) == b'234'
+        assert base.list() == ['data.csv', 'datapackage.json']
+
+    def zip_package(self, directory=''):
+        """Zip tests/test.dpkg_local (CSV files are stored uncompressed)"""
+        archive = os.path.join(self.tmpdir, 'package.zip')
+        source = 'tests/test.dpkg_local'
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zipped:
+            for name in sorted(os.listdir(source)):
+                compression = zipfile.ZIP_STORED if name.endswith('.csv') \
+                    else zipfile.ZIP_DEFLATED
+                zipped.write(os.path.join(source, name), directory + name,
+                             compression)
+        return archive
+
+    def test_zip_package(self):
+        """Check that data packages are read straight out of zip archives"""
+        archive = self.zip_package()
+        dpkg = datapackage.DataPackage(archive)
+        local = datapackage.DataPackage('tests/test.dpkg_local')
+        assert dpkg.base == storage.ZipBackend.uri(archive)
+        assert dpkg.name == local.name
+        assert list(dpkg.get_data(dpkg.resources[0])) == \
+            list(local.get_data(local.resources[0]))
+
+    def test_zip_package_directory(self):
+        """Check that data packages can be zipped with their directory"""
+        archive = self.zip_package('pkg/')
+        dpkg = datapackage.DataPackage(archive)
+        assert dpkg.base == storage.ZipBackend.uri(archive, 'pkg/')
+        assert dpkg.resources[0].location.url.endswith(
+            '!/pkg/country-codes.csv')
+
+    def test_zip_package_quoted(self):
+        """Check that archive paths are quoted in zip: URIs"""
+        directory = os.path.join(self.tmpdir, 'with space')
+        os.mkdir(directory)
+        archive = os.path.join(directory, 'package.zip')
+        os.rename(self.zip_package(), archive)
+        dpkg = datapackage.DataPackage(archive)
+        assert '/with%20space/package.zip!/' in dpkg.base
+        assert list(dpkg.get_data(dpkg.resources[0]))
+
+    @raises(IOError)
+    def test_zip_package_missing(self):
+        """Check that archives without datapackage.json can't be loaded"""
+        archive = os.path.join(self.tmpdir, 'package.zip')
+        with zipfile.ZipFile(archive, 'w') as zipped:
+            zipped.writestr('a/datapackage.json', b'{}')
+            zipped.writestr('b/data.csv', b'')
+        datapackage.DataPackage(archive)
+
+    def test_zip_stored_members(self):
+        """Check that stored members are read from a memory map"""
+        archive = self.zip_package()
+        uri = storage.ZipBackend.uri(archive, 'country-codes.csv')
+        location = resolve(uri)
+        with io.open('tests/test.dpkg_local/country-codes.csv', 'rb') as fh:
+            expected = fh.read()
+        with location.open() as fh:
+            assert isinstance(fh, storage.MappedFile)
+            assert fh.readline() == expected[:expected.index(b'\n') + 1]
+            fh.seek(10)
+            assert fh.read(5) == expected[10:15]
+            fh.seek(-5, io.SEEK_END)
+            assert fh.read() == expected[-5:]
+        assert location.read_range(100, 50) == expected[100:150]
+        assert location.stat().size == len(expected)
+
+        # Compressed members are opened with zipfile
+        location = resolve(storage.ZipBackend.uri(archive,
+                                                  'datapackage.json'))
+        with location.open() as fh:
+            assert not isinstance(fh, storage.MappedFile)
+            assert json.loads(fh.read().decode('utf-8'))
+
+    def test_zip_index(self):
+        """Check that the index of an archive is kept until it changes"""
+        archive = self.zip_package()
+        backend = storage.get_backend('zip')
+        index = backend.index(archive)
+        assert backend.index(archive) is index
+        with zipfile.ZipFile(archive, 'a') as zipped:
+            zipped.writestr('extra.txt', b'extra')
+        os.utime(archive, (0, 0))
+        assert backend.index(archive) is not index
+        assert index.zipfile.fp is None
+        assert 'extra.txt' in backend.index(archive).names()
+
+    def test_zip_index_bounded(self):
+        """Check that the least recently used indexes are closed"""
+        backend = storage.ZipBackend()
+        backend.MAX_INDEXES = 2
+        archives = []
+        for name in ('a', 'b', 'c'):
+            archives.append(os.path.join(self.tmpdir, name + '.zip'))
+            shutil.copy(self.zip_package(), archives[-1])
+        first = backend.index(archives[0])
+        second = backend.index(archives[1])
+        with backend.open(resolve(backend.uri(archives[1],
+                                              'country-codes.csv'))) as fh:
+            backend.index(archives[0])
+            backend.index(archives[2])
+            # Files opened from a closed index can still be read
+            assert fh.read(4) == b'name'
+        assert second.zipfile.fp is None
+        assert first.zipfile.fp is not None
+        assert len(backend._indexes) == 2
+
+    def test_map_local(self):
+        """Check that local files are memory mapped"""
+        with resolve(self.path).map() as fh:
+            assert isinstance(fh, storage.MappedFile)
+            assert fh.read() == b'0123456789'
+        assert fh.closed
+
+    def test_map_empty(self):
+        """Check that files which can't be mapped are opened instead"""
+        path = os.path.join(self.tmpdir, 'empty.csv')
+        io.open(path, 'wb').close()
+        with resolve(path).map() as fh:
+            assert not isinstance(fh, storage.MappedFile)
+            assert fh.read() == b''
+
+    def test_mapped_lines(self):
+        """Check that lines are split like in binary files"""
+        data = 'a,b\r\n"x\ry",\u00e9\n\nlast'.encode('utf-8')
+        path = os.path.join(self.tmpdir, 'lines.csv')
+        with io.open(path, 'wb') as fh:
+            fh.write(data)
+        expected = io.BytesIO(data).readlines()
+        with resolve(path).map() as fh:
+            assert list(fh) == expected
+        for block_size in (1, 4, 1024):
+            with resolve(path).map() as fh:
+                assert list(fh.iter_text('utf-8', block_size)) == \
+                    [line.decode('utf-8') for line in expected]
+
+    def test_mapped_text_utf16(self):
+        """Check that encodings where \\n isn't 0x0A are decoded by line"""
+        path = os.path.join(self.tmpdir, 'utf16.csv')
+        with io.open(path, 'wb') as fh:
+            fh.write('a\nb'.encode('utf-16-le'))
+        with resolve(path).map() as fh:
+            assert ''.join(fh.iter_text('utf-16-le')) == 'a\nb'
+
+    def test_get_data_mapped(self):
+        """Check that get_data reads local resources from a memory map"""
+        dpkg = datapackage.DataPackage('tests/test.dpkg_local')
+        with mocklib.patch.object(storage.MappedFile, 'iter_text',
+                                  autospec=True,
+                                  side_effect=storage.MappedFile.iter_text) \
+                as iter_text:
+            rows = list(dpkg.get_data(dpkg.resources[0]))
+        assert iter_text.called
+        assert rows[2]['name_fr'] == 'Alg\xe9rie'
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_http_stat(self, mock_urlopen):
+        """Check that http files are stat'ed from HEAD response headers"""
+        site = mocklib.Mock()
+        site.info.return_value = {
+            'Content-Length': '42',
+            'Last-Modified': 'Thu, 01 Jan 1970 00:01:00 GMT',
+            'ETag': '"abc"'}
+        mock_urlopen.return_value = site
+        stat = resolve('http://example.com/a.csv').stat()
+        assert stat == storage.StatResult(42, 60, '"abc"')
+        assert mock_urlopen.call_args[0][0].get_method() == 'HEAD'
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_http_read_range(self, mock_urlopen):
+        """Check that ranges of http files are read with Range requests"""
+        site = mocklib.Mock()
+        site.getcode.return_value = 206
+        site.read.return_value = b'234'
+        mock_urlopen.return_value = site
+        location = resolve('http://example.com/a.csv')
+        assert location.read_range(2, 3) == b'234'
+        request = mock_urlopen.call_args[0][0]
+        assert request.get_header('Range') == 'bytes=2-4'
+
+    @mocklib.patch('datapackage.compat.urlopen')
+    def test_http_read_range_ignored(self, mock_urlopen):
+        """Check that the start is skipped if Range is ignored"""
+        mock_urlopen.return_value = io.BytesIO(b'0123456789')
+        mock_urlopen.return_value.getcode = lambda: 200
+        location = resolve('http://example.com/a.csv')
+        assert location.read_range(2, 3) == b'234'
+
+    @raises(NotImplementedError)
+    def test_http_list(self):
+        """Check that http directories can't be listed"""
+        resolve('http://example.com/').list()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import json
+import hashlib
+import tarfile
+import datapackage
+from datapackage.tarstream import TarStreamReader
+from nose.tools import raises
+
+
+class NonSeekable(io.RawIOBase):
+    """Binary stream which can only be read front to back (like a pipe)"""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class TestTarStream(object):
+
+    def setup(self):
+        self.source = 'tests/test.dpkg_local'
+        self.dpkg = datapackage.DataPackage(self.source)
+        self.rows = list(self.dpkg.get_data(self.dpkg.resources[0]))
+
+    def teardown(self):
+        pass
+
+    def tar(self, names, directory='', mode='w', descriptor=None):
+        """Tar the files of the test data package in the given order (the
+        descriptor replaces the contents of datapackage.json if given)
+
+        """
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode=mode) as tar:
+            for name in names:
+                if name == 'datapackage.json' and descriptor is not None:
+                    contents = json.dumps(descriptor).encode('utf-8')
+                    info = tarfile.TarInfo(directory + name)
+                    info.size = len(contents)
+                    tar.addfile(info, io.BytesIO(contents))
+                else:
+                    tar.add(os.path.join(self.source, name),
+                            directory + name)
+        return NonSeekable(data.getvalue())
+
+    def read(self, stream, **kwargs):
+        reader = TarStreamReader(stream, **kwargs)
+        return reader, [(resource['path'], list(rows))
+                        for resource, rows in reader]
+
+    def test_descriptor_first(self):
+        """Check that resources after datapackage.json are streamed"""
+        reader, resources = self.read(
+            self.tar(['datapackage.json', 'country-codes.csv']))
+        assert reader.datapackage.name == self.dpkg.name
+        assert resources == [('country-codes.csv', self.rows)]
+
+    def test_descriptor_last(self):
+        """Check that resources before datapackage.json are buffered"""
+        reader, resources = self.read(
+            self.tar(['country-codes.csv', 'datapackage.json']))
+        assert resources == [('country-codes.csv', self.rows)]
+
+    def test_spill(self):
+        """Check that buffered resources are spilled beyond the bound"""
+        reader, resources = self.read(
+            self.tar(['country-codes.csv', 'datapackage.json']),
+            buffer_size=0)
+        assert resources == [('country-codes.csv', self.rows)]
+
+    def test_directory(self):
+        """Check that packages can be tarred with their directory"""
+        reader, resources = self.read(self.tar(
+            ['country-codes.csv', 'datapackage.json'], directory='./pkg/',
+            mode='w:gz'))
+        assert resources == [('country-codes.csv', self.rows)]
+
+    def test_verify(self):
+        """Check that streamed resources can be verified"""
+        with io.open(os.path.join(self.source, 'country-codes.csv'),
+                     'rb') as fh:
+            contents = fh.read()
+        descriptor = self.dpkg.as_dict()
+        descriptor['resources'][0]['bytes'] = len(contents)
+        descriptor['resources'][0]['hash'] = \
+            hashlib.md5(contents).hexdigest()
+        reader, resources = self.read(
+            self.tar(['datapackage.json', 'country-codes.csv'],
+                     descriptor=descriptor), verify=True)
+        assert resources == [('country-codes.csv', self.rows)]
+
+    @raises(RuntimeError)
+    def test_verify_mismatch(self):
+        """Check that streamed resources which don't match fail"""
+        descriptor = self.dpkg.as_dict()
+        descriptor['resources'][0]['bytes'] = 1
+        self.read(self.tar(['datapackage.json', 'country-codes.csv'],
+                           descriptor=descriptor), verify=True)
+
+    @raises(ValueError)
+    def test_missing_descriptor(self):
+        """Check that streams without datapackage.json are an error"""
+        self.read(self.tar(['country-codes.csv']))
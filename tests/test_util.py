@@ -4,8 +4,12 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import sys
+import subprocess
+import datapackage
 import datapackage.util as util
 from nose.tools import raises
+from nose.plugins.skip import SkipTest
 
 
 def test_parse_version():
@@ -70,3 +74,104 @@ def test_verify_version():
 
     for version in versions:
         assert util.verify_version(version) == version
+
+
+def test_specification_compiled_types():
+    """Check that the specification types are compiled into tuples"""
+    class Foo(util.Specification):
+        SPECIFICATION = {'bar': int, 'baz': (int, float), 'qux': None}
+
+    assert Foo._COMPILED_TYPES == {'bar': (int,), 'baz': (int, float),
+                                   'qux': None}
+    foo = Foo(bar=1, baz=1.0, qux='anything')
+    assert foo.bar == 1
+    assert foo.baz == 1.0
+
+
+def test_specification_recompiled_on_change():
+    """Check that changes to class attributes are picked up"""
+    class Foo(util.Specification):
+        SPECIFICATION = {'bar': int}
+
+    class Bar(Foo):
+        pass
+
+    Foo.SPECIFICATION = {'bar': int, 'baz': int}
+    assert Bar(baz=1).baz == 1
+
+    @raises(TypeError)
+    def set_bad_type():
+        Bar(baz='1')
+    set_bad_type()
+
+
+@raises(AttributeError)
+def test_specification_unknown_attribute():
+    """Check that unknown attributes are not allowed"""
+    class Foo(util.Specification):
+        SPECIFICATION = {'bar': int}
+
+    Foo(baz=1)
+
+
+def test_check_serializable():
+    """Check that JSON serializable values pass the check"""
+    util.check_serializable({"foo": [1, 2.5, None, True, "bar"],
+                             1: {"baz": (1, 2)}, None: [], 2.5: {}})
+    shared = [1, 2]
+    util.check_serializable([shared, shared])
+    shared = {"foo": [shared, shared]}
+    util.check_serializable([{"bar": shared}, [shared, {"baz": shared}]])
+
+
+@raises(TypeError)
+def test_check_serializable_bad_value():
+    """Check that an error is raised for values that can't be serialized"""
+    util.check_serializable({"foo": [1, set([2])]})
+
+
+@raises(TypeError)
+def test_check_serializable_bad_key():
+    """Check that an error is raised for keys that can't be serialized"""
+    util.check_serializable({(1, 2): "foo"})
+
+
+@raises(ValueError)
+def test_check_serializable_circular():
+    """Check that an error is raised for circular references"""
+    value = {"foo": []}
+    value["foo"].append(value)
+    util.check_serializable(value)
+
+
+@raises(ValueError)
+def test_check_serializable_circular_shared():
+    """Check that circular references are found in shared containers"""
+    shared = {"foo": []}
+    shared["foo"].append([shared])
+    util.check_serializable([shared, shared])
+
+
+def test_lazy_imports():
+    """Check that importing the package doesn't import heavy modules"""
+    if sys.version_info < (3, 7):
+        raise SkipTest("lazy imports need Python 3.7")
+    modules = ['datapackage.datapackage', 'datapackage.resource',
+               'multiprocessing.pool', 'urllib.request', 'hashlib',
+               'mimetypes', 'base64']
+    code = ('import sys, datapackage\n'
+            'print(",".join(m for m in {0!r} if m in sys.modules))').format(
+                modules)
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.strip() == b''
+
+
+def test_lazy_attributes():
+    """Check that lazily imported names are the real ones"""
+    from datapackage.datapackage import DataPackage
+    from datapackage.resource import Resource
+    assert datapackage.DataPackage is DataPackage
+    assert datapackage.Resource is Resource
+    assert 'DataPackage' in dir(datapackage)
+    assert callable(datapackage.compat.urlopen)
+    assert issubclass(datapackage.compat.HTTPError, Exception)